@@ -0,0 +1,26 @@
+"""Add classified_by to Email model
+
+Revision ID: 5c1e8f3a9d42
+Revises: 20dd999afa43
+Create Date: 2026-10-18 10:12:44.318207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1e8f3a9d42'
+down_revision: Union[str, None] = '20dd999afa43'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('email', sa.Column('classified_by', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('email', 'classified_by')
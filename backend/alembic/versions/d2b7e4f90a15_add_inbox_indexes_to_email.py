@@ -0,0 +1,35 @@
+"""Add composite and partial indexes for inbox queries
+
+Revision ID: d2b7e4f90a15
+Revises: c6f1a8d3b924
+Create Date: 2026-10-18 19:26:55.081637
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2b7e4f90a15'
+down_revision: Union[str, None] = 'c6f1a8d3b924'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction, and keeps the table writable while it builds.
+    with op.get_context().autocommit_block():
+        op.create_index('ix_email_user_id_received_at', 'email', ['user_id', sa.text('received_at DESC')], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_email_user_id_priority_received_at', 'email', ['user_id', 'priority', 'received_at'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_email_user_id_intent_received_at', 'email', ['user_id', 'intent', 'received_at'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_email_user_id_unread_received_at', 'email', ['user_id', sa.text('received_at DESC')], unique=False, postgresql_where=sa.text('is_read = false'), postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_email_user_id_unread_received_at', table_name='email', postgresql_concurrently=True)
+        op.drop_index('ix_email_user_id_intent_received_at', table_name='email', postgresql_concurrently=True)
+        op.drop_index('ix_email_user_id_priority_received_at', table_name='email', postgresql_concurrently=True)
+        op.drop_index('ix_email_user_id_received_at', table_name='email', postgresql_concurrently=True)
@@ -0,0 +1,46 @@
+"""Add id to the inbox indexes for keyset pagination
+
+Revision ID: e5a3c9b71d48
+Revises: d2b7e4f90a15
+Create Date: 2026-10-18 21:03:14.772310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a3c9b71d48'
+down_revision: Union[str, None] = 'd2b7e4f90a15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = {
+    'ix_email_user_id_received_at': (['user_id', sa.text('received_at DESC')], ['user_id', sa.text('received_at DESC'), sa.text('id DESC')], {}),
+    'ix_email_user_id_priority_received_at': (['user_id', 'priority', 'received_at'], ['user_id', 'priority', 'received_at', 'id'], {}),
+    'ix_email_user_id_intent_received_at': (['user_id', 'intent', 'received_at'], ['user_id', 'intent', 'received_at', 'id'], {}),
+    'ix_email_user_id_unread_received_at': (
+        ['user_id', sa.text('received_at DESC')], ['user_id', sa.text('received_at DESC'), sa.text('id DESC')],
+        {'postgresql_where': sa.text('is_read = false')}
+    ),
+}
+
+
+def _recreate(columns_index: int) -> None:
+    # Build each replacement under a temporary name first, so queries never run without an index.
+    with op.get_context().autocommit_block():
+        for name, definition in INDEXES.items():
+            columns, options = definition[columns_index], definition[2]
+            op.create_index(f'{name}_new', 'email', columns, unique=False, postgresql_concurrently=True, **options)
+            op.drop_index(name, table_name='email', postgresql_concurrently=True)
+            op.execute(f'ALTER INDEX {name}_new RENAME TO {name}')
+
+
+def upgrade() -> None:
+    _recreate(1)
+
+
+def downgrade() -> None:
+    _recreate(0)
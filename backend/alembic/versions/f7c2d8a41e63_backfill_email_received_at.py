@@ -0,0 +1,28 @@
+"""Backfill email.received_at and make it required
+
+Revision ID: f7c2d8a41e63
+Revises: e5a3c9b71d48
+Create Date: 2026-10-18 23:41:09.518274
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f7c2d8a41e63'
+down_revision: Union[str, None] = 'e5a3c9b71d48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # List cursors are (received_at, id); rows without a date could not be paged past.
+    op.execute('UPDATE email SET received_at = COALESCE(created_at, processed_at, now()) WHERE received_at IS NULL')
+    op.alter_column('email', 'received_at', existing_type=sa.DateTime(timezone=True), nullable=False)
+
+
+def downgrade() -> None:
+    op.alter_column('email', 'received_at', existing_type=sa.DateTime(timezone=True), nullable=True)
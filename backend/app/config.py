@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, Optional
 import os
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -24,14 +24,97 @@ class Settings(BaseSettings):
     GOOGLE_CLIENT_SECRET: Optional[str] = None
     GOOGLE_REDIRECT_URI: str = "http://localhost:8000/auth/callback"
 
+    #Gmail API
+    GMAIL_API_ROOT_URL: Optional[str] = None  # e.g. a local fake Gmail server for tests
+    GMAIL_BATCH_SIZE: int = 50
+    GMAIL_QUOTA_UNITS_PER_SECOND: float = 250
+    GMAIL_FETCH_WORKERS: int = 8
+    GMAIL_BATCH_RETRIES: int = 2
+    GMAIL_RETRY_BACKOFF_SECONDS: float = 1.0
+    GMAIL_RESYNC_MAX_MESSAGES: int = 200  # cap on the full resync when the stored historyId has expired
+    GMAIL_FETCH_MODE: str = "full"  # full | two_phase (metadata first, bodies only for mail needing AI analysis)
+    EMAIL_BODY_MAX_CHARS: int = 500
+    EMAIL_BODY_MAX_BYTES: int = 65536  # most part data decoded per message; HTML needs more than the text it yields
+    EMAIL_INSERT_CHUNK_SIZE: int = 500  # rows per multi-row INSERT when saving fetched emails
+    EMAIL_STATS_COUNTERS_ENABLED: bool = False  # serve statistics from user_email_stats instead of counting emails
+
+    #Mailbox backfill
+    BACKFILL_PAGE_SIZE: int = 500
+    BACKFILL_CHUNK_SIZE: int = 50
+    BACKFILL_WORKERS: int = 4
+    BACKFILL_MAX_MESSAGES: Optional[int] = None
+
+    #Mail import (import_mail.py)
+    IMPORT_WORKERS: int = 4
+    IMPORT_BATCH_SIZE: int = 200
+    IMPORT_BATCH_MAX_BYTES: int = 16777216
+    IMPORT_MAX_MESSAGE_BYTES: int = 1048576  # the rest of a larger message (usually attachments) is skipped
+
+    #Google API clients
+    GOOGLE_CLIENT_CACHE_TTL_SECONDS: int = 3600
+    GOOGLE_TOKEN_REFRESH_MARGIN_SECONDS: int = 600  # refresh in the background this long before token_expiry
+    GOOGLE_TOKEN_REFRESH_CHECK_SECONDS: int = 60
+
+    #Fake LLM (LLM_PROVIDER=fake)
+    FAKE_LLM_LATENCY_MS: float = 300.0
+    FAKE_LLM_LATENCY_JITTER_MS: float = 100.0
+    FAKE_LLM_LATENCY_DISTRIBUTION: str = "lognormal"  # fixed | uniform | normal | lognormal
+    FAKE_LLM_TOKENS_PER_SECOND: float = 0.0
+    FAKE_LLM_PROMPT_TOKENS: int = 0  # reported per call; 0 counts the prompt with the tokenizer
+    FAKE_LLM_COMPLETION_TOKENS: int = 0  # reported per call (and used for tokens_per_second); 0 counts the answer
+    FAKE_LLM_ERROR_RATE: float = 0.0
+    FAKE_LLM_SEED: int = 0
+
     #AI API Keys
     GROQ_API_KEY: Optional[str] = None
     GOOGLE_AI_API_KEY: Optional[str] = None
 
     #AI Settings
+    LLM_PROVIDER: str = "groq"  # groq | fake (offline, for load tests)
     AI_MODEL: str = "llama-3.3-70b-versatile"
+    AI_SMALL_MODEL: str = "llama-3.1-8b-instant"
+    # Per-operation overrides of model, max_tokens and temperature (defaults: AI_MODEL, 1024, 0.3;
+    # intent, intent_batch and entities default to AI_SMALL_MODEL)
+    AI_MODEL_ROUTES: Dict[str, Dict] = {
+        "intent": {"max_tokens": 120, "temperature": 0.0},
+        "intent_batch": {"max_tokens": 1200, "temperature": 0.0},
+        "entities": {"max_tokens": 300, "temperature": 0.0},
+        "summarize": {"max_tokens": 200},
+        "replies": {"max_tokens": 350},
+        "analyze": {"max_tokens": 900},
+    }
+    AI_LARGE_MODEL_HIGH_PRIORITY_ONLY: bool = False
     EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
+    EMBEDDING_CLASSIFIER_ENABLED: bool = True
+    EMBEDDING_KNN_K: int = 7
+    EMBEDDING_MIN_AGREEMENT: float = 0.8
+    EMBEDDING_MIN_INDEX_SIZE: int = 50
+    EMBEDDING_INDEX_MAX_ROWS: int = 50000
+    EMBEDDING_BATCH_SIZE: int = 64
+    EMBEDDING_MAX_CHARS: int = 1000
+    EMBEDDING_RETRY_SECONDS: int = 300
     MAX_EMAIL_LENGTH: int = 4000
+    AI_SINGLE_CALL_ANALYSIS: bool = True
+    AI_MAX_CONCURRENCY: int = 8
+    AI_STAGE_TIMEOUT_SECONDS: float = 30.0
+    AI_CACHE_TTL_SECONDS: int = 86400
+    AI_SINGLE_FLIGHT_LOCK_SECONDS: int = 120
+    AI_SINGLE_FLIGHT_WAIT_SECONDS: float = 60.0
+    AI_SINGLE_FLIGHT_POLL_SECONDS: float = 0.25
+    AI_INTENT_BATCH_SIZE: int = 10
+    AI_INTENT_BATCH_TOKEN_BUDGET: int = 6000
+    AI_REPLY_SUGGESTIONS_POLICY: str = "lazy"  # lazy | priority (high priority or unread) | eager
+    AI_HEURISTICS_ENABLED: bool = True
+    AI_HEURISTIC_CONFIDENCE_THRESHOLD: float = 0.75
+    AI_TOKENIZER_ENCODING: str = "cl100k_base"
+    AI_DEFAULT_TOKEN_BUDGET: int = 1000
+    AI_TOKEN_BUDGETS: Dict[str, int] = {
+        "summarize": 1000,
+        "intent": 600,
+        "entities": 1000,
+        "replies": 500,
+        "analyze": 1200
+    }
 
     #Telegram Bot
     TELEGRAM_BOT_TOKEN: Optional[str] = None
@@ -1,17 +1,24 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 from app.config import settings
 from app.database import get_db, engine, Base
 from app.models.models import User
 from datetime import datetime
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, StreamingResponse
 from app.services.gmail_auth import get_google_auth_url, exchange_code_for_token
 from app.services.gmail_service import fetch_emails, get_user_profile
+from app.services.google_clients import google_clients
 from sqlalchemy import text
+import json
 import logging
 
 from app.services.ai.email_processor import email_processor
+from app.services.ai.llm_service import llm_service
+from app.services.ai.cache import llm_cache
+from app.services.ai.preprocessing import prompt_preparer
+from app.services.ai.heuristics import heuristic_classifier
+from app.services.ai.embedding_classifier import embedding_classifier
 from app.redis_client import redis_client
 
 from app.services.notifications.telegram_bot import telegram_bot_handler
@@ -19,9 +26,16 @@ from app.services.notifications.telegram_bot import telegram_bot_handler
 from pydantic import BaseModel
 
 from app.services.email_service import (
-    fetch_and_save_emails,
-    get_user_emails, 
-    get_email_statistics
+    sync_mailbox,
+    run_backfill_job,
+    backfill_running,
+    get_backfill_progress,
+    get_user_emails_page,
+    EMAIL_LIST_COLUMNS,
+    get_email_statistics,
+    mark_email_read,
+    ensure_reply_suggestions,
+    ensure_email_body
 )
 from app.models.models import Email
 
@@ -31,6 +45,8 @@ from app.services.calendar_service import calendar_service
 
 Base.metadata.create_all(bind=engine)
 
+logger = logging.getLogger(__name__)
+
 app = FastAPI(
     title=settings.APP_NAME, 
     debug=settings.DEBUG
@@ -44,6 +60,11 @@ app.add_middleware(
     allow_headers=["*"]
 )
 
+@app.on_event("startup")
+def start_embedding_index():
+    # Built in the background; until it is ready every email goes to the LLM.
+    embedding_classifier.start_loading()
+
 @app.get("/")
 def root():
     return {
@@ -125,7 +146,7 @@ def fetch_user_emails(db: Session = Depends(get_db)):
         raise HTTPException(status_code=401, detail = "User not Authenticated")
     
     try:
-        emails = fetch_emails(user.google_access_token, max_results=5)
+        emails = fetch_emails(user.google_access_token, max_results=5, user=user)
         return {
             "status": "success",
             "count": len(emails),
@@ -164,6 +185,10 @@ def process_email_ai(
         }
 
         result = email_processor.process_email(email_data)
+        if result["reply_suggestions"] is None:
+            # This email is not stored, so there is no later first access to generate them on.
+            replies = email_processor.get_reply_suggestions({**email_data, "priority": result["priority"]})
+            result = {**result, "reply_suggestions": replies or []}
 
         return {
             "status": "success",
@@ -177,7 +202,6 @@ def process_email_ai(
 def summarize_email(subject: str, body: str):
     try:
         email_data = {
-            "message_id": "quick",
             "subject": subject, 
             "body": body
         }
@@ -190,6 +214,48 @@ def summarize_email(subject: str, body: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/ai/summarize/stream")
+async def summarize_email_stream(subject: str, body: str):
+    email_data = {
+        "subject": subject,
+        "body": body
+    }
+
+    async def events():
+        chunks = []
+        try:
+            async for text in email_processor.astream_summary(email_data):
+                chunks.append(text)
+                yield sse_event("summary", {"text": text})
+
+            yield sse_event("done", {"summary": "".join(chunks).strip() or "Unable to generate summary"})
+        except Exception as e:
+            logger.error(f"Streaming summary error: {e}")
+            yield sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+    
+@app.get("/ai/metrics")
+def llm_metrics():
+    return {
+        "status": "success",
+        "single_call_analysis": settings.AI_SINGLE_CALL_ANALYSIS,
+        "operations": llm_service.get_metrics(),
+        "routes": llm_service.get_route_metrics(),
+        "preprocessing": prompt_preparer.stats(),
+        "heuristics": heuristic_classifier.stats(),
+        "embedding_classifier": embedding_classifier.stats(),
+        "single_flight": email_processor.single_flight.stats(),
+        "google_clients": google_clients.stats()
+    }
+
 @app.get("/emails/fetch-and-process")
 def fetch_and_process_emails(db: Session = Depends(get_db)):
     user = db.query(User).first()
@@ -198,7 +264,7 @@ def fetch_and_process_emails(db: Session = Depends(get_db)):
         raise HTTPException(status_code=401, detail="User not authenticated")
     
     try: 
-        emails = fetch_emails(user.google_access_token, max_results=5)
+        emails = fetch_emails(user.google_access_token, max_results=5, user=user)
         processed = email_processor.batch_process_emails(emails)
 
         return {
@@ -218,7 +284,8 @@ def cache_statistics():
             "connected": True,
             "used_memory_human": info.get("used_memory_human"),
             "total_keys": redis_client.redis.dbsize(),
-            "connected_clients": info.get("connected_clients")
+            "connected_clients": info.get("connected_clients"),
+            "llm_cache": llm_cache.stats()
         }
     except Exception as e:
         return {
@@ -240,37 +307,84 @@ def clear_cache():
     
 
 @app.post("/emails/sync")
-def sync_emails(max_results: int=10, db: Session = Depends(get_db)):
+def sync_emails(max_results: int=10, full: bool = False, db: Session = Depends(get_db)):
     user = db.query(User).first()
 
     if not user or not user.google_access_token:
         raise HTTPException(status_code=401, detail="User not Authorized")
     
     try:
-        emails = fetch_and_save_emails(db, user, max_results)
+        result = sync_mailbox(db, user, max_results, full=full)
+        emails = result["emails"]
 
         return {
             "status": "success",
             "message": f"Synced and processed {len(emails)} emails",
-            "count": len(emails)
+            "count": len(emails),
+            "mode": result["mode"],
+            "fetch_mode": result["fetch_mode"],
+            "label_updates": result["label_updates"],
+            "metadata_only": result["metadata_only"],
+            "bytes_received": result["bytes_received"],
+            "elapsed_ms": result["elapsed_ms"]
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/emails/backfill")
+def start_backfill(
+    background_tasks: BackgroundTasks,
+    restart: bool = False,
+    max_messages: int = None,
+    db: Session = Depends(get_db)
+):
+    """Import the whole mailbox in the background, resuming from the last checkpoint"""
+    user = db.query(User).first()
+
+    if not user or not user.google_access_token:
+        raise HTTPException(status_code=401, detail="User not Authorized")
+
+    if backfill_running(user.id):
+        return {"status": "running", "progress": get_backfill_progress(db, user.id)}
+
+    background_tasks.add_task(run_backfill_job, user.id, restart, max_messages)
+    return {"status": "started", "progress": get_backfill_progress(db, user.id)}
+
+
+@app.get("/emails/backfill")
+def backfill_progress(db: Session = Depends(get_db)):
+    user = db.query(User).first()
+
+    if not user:
+        raise HTTPException(status_code=404, detail="No user found")
+
+    return get_backfill_progress(db, user.id)
+
+
 @app.get("/emails/list")
 def list_emails(
     skip: int = 0,
     limit: int = 20, 
     priority: str = None,
     intent: str = None,
+    cursor: str = None,
     db: Session = Depends(get_db)
 ):
+    """Newest first. Pass the previous response's next_cursor for the next page; skip is the old offset paging.
+
+    Only the list columns are read; entities and reply suggestions come from /emails/{email_id}.
+    """
     user = db.query(User).first()
 
     if not user:
         raise HTTPException(status_code=401, detail="User not authenticated")
     
-    emails = get_user_emails(db, user.id, skip, limit, priority, intent)
+    try:
+        emails, next_cursor = get_user_emails_page(
+            db, user.id, limit, priority, intent, cursor=cursor, skip=skip, columns=EMAIL_LIST_COLUMNS
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     email_list = []
     for email in emails:
@@ -282,8 +396,6 @@ def list_emails(
             "summary": email.summary,
             "intent": email.intent,
             "priority": email.priority,
-            "entities": email.entities,
-            "reply_suggestions": email.reply_suggestions,
             "is_read": email.is_read,
             "is_important": email.is_important,
             "received_at": email.received_at,
@@ -293,7 +405,8 @@ def list_emails(
     return {
         "status": "success",
         "count": len(email_list),
-        "emails": email_list
+        "emails": email_list,
+        "next_cursor": next_cursor
     }
 
 @app.get("/emails/statistics")
@@ -326,8 +439,7 @@ def mark_email_as_read(email_id: int, db: Session = Depends(get_db)):
     if not email:
         raise HTTPException(status_code=404, detail="Email not found")
     
-    email.is_read = True
-    db.commit()
+    mark_email_read(db, email)
 
     return{
         "status": "success",
@@ -335,16 +447,16 @@ def mark_email_as_read(email_id: int, db: Session = Depends(get_db)):
     }
 
 @app.get("/emails/filter/high-priority")
-def get_high_priority_emails(db: Session = Depends(get_db)):
-    return list_emails(priority="high", db=db)
+def get_high_priority_emails(cursor: str = None, limit: int = 20, db: Session = Depends(get_db)):
+    return list_emails(limit=limit, priority="high", cursor=cursor, db=db)
 
 @app.get("/emails/filter/meetings")
-def get_meeting_emails(db: Session = Depends(get_db)):
-    return list_emails(intent="meeting", db=db)
+def get_meeting_emails(cursor: str = None, limit: int = 20, db: Session = Depends(get_db)):
+    return list_emails(limit=limit, intent="meeting", cursor=cursor, db=db)
 
 @app.get("/emails/filter/urgent")
-def get_urgent_emails(db: Session = Depends(get_db)):
-    return list_emails(intent="urgent", db=db)
+def get_urgent_emails(cursor: str = None, limit: int = 20, db: Session = Depends(get_db)):
+    return list_emails(limit=limit, intent="urgent", cursor=cursor, db=db)
 
 
 @app.get("/emails/{email_id}")
@@ -361,6 +473,9 @@ def get_email_details(email_id: int, db: Session = Depends(get_db)):
 
     if not email:
         raise HTTPException(status_code=404, detail="Email not found")
+
+    ensure_email_body(db, email)
+    reply_suggestions = ensure_reply_suggestions(db, email)
     
     return {
         "status": "success",
@@ -375,7 +490,7 @@ def get_email_details(email_id: int, db: Session = Depends(get_db)):
             "intent": email.intent,
             "priority": email.priority,
             "entities": email.entities,
-            "reply_suggestions": email.reply_suggestions,
+            "reply_suggestions": reply_suggestions,
             "is_read": email.is_read,
             "is_important": email.is_important,
             "received_at": email.received_at,
@@ -383,6 +498,27 @@ def get_email_details(email_id: int, db: Session = Depends(get_db)):
         }
     }
 
+
+@app.get("/emails/{email_id}/reply-suggestions")
+def get_email_reply_suggestions(email_id: int, db: Session = Depends(get_db)):
+    user = db.query(User).first()
+
+    if not user:
+        raise HTTPException(status_code=401, detail="User not authenticated")
+    
+    email = db.query(Email).filter(
+        Email.id == email_id, 
+        Email.user_id == user.id
+    ).first()
+
+    if not email:
+        raise HTTPException(status_code=404, detail="Email not found")
+
+    return {
+        "status": "success",
+        "reply_suggestions": ensure_reply_suggestions(db, email)
+    }
+
 @app.get("/notifications/test")
 def test_telegram():
     result = telegram_service.test_connection()
@@ -420,7 +556,7 @@ def list_calendar_events(max_results: int = 10, db: Session = Depends(get_db)):
     if not user or not user.google_access_token:
         raise HTTPException(status_code=401, detail="User not authenticated")
     
-    if not calendar_service.initialize_service(user.google_access_token):
+    if not calendar_service.initialize_service(user.google_access_token, user.google_refresh_token, user.id, user.token_expiry):
         raise HTTPException(status_code=500, detail="Failed to initialize calendar")
     
     events = calendar_service.list_upcoming_events(max_results)
@@ -448,7 +584,7 @@ def create_calendar_event(
     if not user or not user.google_access_token:
         raise HTTPException(status_code=401, detail="User not authenticated")
     
-    if not calendar_service.initialize_service(user.google_access_token, user.google_refresh_token):
+    if not calendar_service.initialize_service(user.google_access_token, user.google_refresh_token, user.id, user.token_expiry):
         raise HTTPException(status_code=500, detail="Failed to initialize calendar")
     
     try:
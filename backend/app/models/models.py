@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, JSON
-from sqlalchemy.orm import relationship 
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, JSON, Index, false
+from sqlalchemy.orm import deferred, relationship 
 from sqlalchemy.sql import func
 from app.database import Base
 
@@ -17,6 +17,7 @@ class User(Base):
     token_expiry = Column(DateTime(timezone=True), nullable=True)
 
     emails = relationship("Email", back_populates="user")
+    sync_state = relationship("SyncState", back_populates="user", uselist=False)
 
 
 class Email(Base):
@@ -31,8 +32,8 @@ class Email(Base):
     subject = Column(String)
     sender = Column(String)
     recipient = Column(String)
-    body_text = Column(Text)
-    received_at = Column(DateTime(timezone=True))
+    body_text = deferred(Column(Text))  # loaded on first access; list queries never need it
+    received_at = Column(DateTime(timezone=True), nullable=False)  # part of every list cursor
 
     #AI Processing
     summary = Column(Text, nullable=True)
@@ -40,6 +41,7 @@ class Email(Base):
     priority = Column(String, nullable=True)
     entities = Column(JSON, nullable=True)
     reply_suggestions = Column(JSON, nullable=True)
+    classified_by = Column(String, nullable=True)
     is_processed = Column(Boolean, default=False)
     processed_at = Column(DateTime(timezone=True), nullable=True)
 
@@ -51,4 +53,62 @@ class Email(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     #Foreign
-    user = relationship("User", back_populates="emails")
\ No newline at end of file
+    user = relationship("User", back_populates="emails")
+
+    # Inbox access paths: a user's mail newest first, optionally by priority, intent or unread.
+    # id breaks received_at ties, so cursor pages are read in index order too.
+    __table_args__ = (
+        Index("ix_email_user_id_received_at", user_id, received_at.desc(), id.desc()),
+        Index("ix_email_user_id_priority_received_at", user_id, priority, received_at, id),
+        Index("ix_email_user_id_intent_received_at", user_id, intent, received_at, id),
+        Index(
+            "ix_email_user_id_unread_received_at", user_id, received_at.desc(), id.desc(),
+            postgresql_where=(is_read == false()), sqlite_where=(is_read == false())
+        ),
+    )
+
+
+class SyncState(Base):
+    __tablename__ = "sync_state"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), unique=True, nullable=False)
+
+    #Gmail history cursor
+    history_id = Column(String, nullable=True)
+    last_synced_at = Column(DateTime(timezone=True), nullable=True)
+    last_full_sync_at = Column(DateTime(timezone=True), nullable=True)
+
+    #Mailbox backfill checkpoint
+    backfill_status = Column(String, nullable=True)
+    backfill_page_token = Column(String, nullable=True)
+    backfill_pages = Column(Integer, default=0)
+    backfill_processed = Column(Integer, default=0)
+    backfill_saved = Column(Integer, default=0)
+    backfill_total_estimate = Column(Integer, nullable=True)
+    backfill_error = Column(Text, nullable=True)
+    backfill_started_at = Column(DateTime(timezone=True), nullable=True)
+    backfill_finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    #Foreign
+    user = relationship("User", back_populates="sync_state")
+
+
+class UserEmailStats(Base):
+    """Email counters per user, kept up to date as emails are saved and read (EMAIL_STATS_COUNTERS_ENABLED)."""
+    __tablename__ = "user_email_stats"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), unique=True, nullable=False)
+
+    total = Column(Integer, nullable=False, default=0)
+    processed = Column(Integer, nullable=False, default=0)
+    high_priority = Column(Integer, nullable=False, default=0)
+    unread = Column(Integer, nullable=False, default=0)
+    by_intent = Column(JSON, nullable=False, default=dict)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
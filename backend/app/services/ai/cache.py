@@ -0,0 +1,68 @@
+from app.redis_client import redis_client
+from app.services.ai.llm_service import llm_service
+from app.config import settings
+from typing import Any, Dict, Optional
+import hashlib
+import threading
+import unicodedata
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(subject: str, body: str) -> str:
+    """Hash of the email text with unicode and whitespace differences normalized away."""
+    normalized = []
+    for text in (subject or "", body or ""):
+        text = unicodedata.normalize("NFC", text)
+        normalized.append(" ".join(text.split()))
+    return hashlib.sha256("\x00".join(normalized).encode("utf-8")).hexdigest()
+
+
+class LLMResultCache:
+    """Redis cache of LLM results keyed by email content, model and prompt version.
+
+    Identical mail (newsletters, notifications sent to many recipients) is
+    analysed once, whatever its message id.
+    """
+
+    def __init__(self):
+        self.cache = redis_client
+        self.llm = llm_service
+        self.counters: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def make_key(self, operation: str, subject: str, body: str) -> str:
+        namespace = self.llm.cache_namespace(operation)
+        return f"llm:{operation}:{namespace}:{content_hash(subject, body)}"
+
+    def _count(self, operation: str, outcome: str):
+        with self._lock:
+            counters = self.counters.setdefault(operation, {"hits": 0, "misses": 0})
+            counters[outcome] += 1
+
+    def get(self, operation: str, subject: str, body: str) -> Optional[Any]:
+        value = self.cache.get(self.make_key(operation, subject, body))
+        self._count(operation, "misses" if value is None else "hits")
+        return value
+
+    def set(self, operation: str, subject: str, body: str, value: Any) -> bool:
+        return self.cache.set(
+            self.make_key(operation, subject, body),
+            value,
+            ttl=settings.AI_CACHE_TTL_SECONDS
+        )
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = {}
+            for operation, counters in self.counters.items():
+                lookups = counters["hits"] + counters["misses"]
+                stats[operation] = {
+                    **counters,
+                    "hit_rate": round(counters["hits"] / lookups, 3) if lookups else 0.0
+                }
+            return stats
+
+
+llm_cache = LLMResultCache()
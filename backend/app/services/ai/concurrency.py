@@ -0,0 +1,48 @@
+from app.config import settings
+import asyncio
+import threading
+import weakref
+
+_semaphores = weakref.WeakKeyDictionary()
+_semaphores_lock = threading.Lock()
+
+_background_loop = None
+_background_loop_lock = threading.Lock()
+
+
+def llm_semaphore() -> asyncio.Semaphore:
+    """Semaphore capping in-flight LLM requests on the running event loop."""
+    loop = asyncio.get_running_loop()
+    with _semaphores_lock:
+        semaphore = _semaphores.get(loop)
+        if semaphore is None:
+            semaphore = _semaphores[loop] = asyncio.Semaphore(settings.AI_MAX_CONCURRENCY)
+        return semaphore
+
+
+def _get_background_loop() -> asyncio.AbstractEventLoop:
+    global _background_loop
+    with _background_loop_lock:
+        if _background_loop is None:
+            _background_loop = asyncio.new_event_loop()
+            threading.Thread(target=_background_loop.run_forever, name="ai-event-loop", daemon=True).start()
+        return _background_loop
+
+
+def run_sync(coro):
+    """Run a coroutine on the shared AI event loop and block until it finishes.
+
+    Every sync caller (API worker threads, the Telegram bot, scripts) goes
+    through the same loop, so llm_semaphore() limits the whole process.
+    """
+    loop = _get_background_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+
+    if running is loop:
+        coro.close()
+        raise RuntimeError("run_sync() called from the AI event loop, await the coroutine instead")
+
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
@@ -1,47 +1,165 @@
-from app.services.ai.llm_service import llm_service
-from app.redis_client import redis_client
+from app.services.ai.llm_service import llm_service, ANALYSIS_SECTIONS, analysis_cache_operation
+from app.services.ai.heuristics import heuristic_classifier
+from app.services.ai.embedding_classifier import embedding_classifier
+from app.services.ai.cache import llm_cache, content_hash
+from app.services.ai.singleflight import SingleFlight
 from app.services.notifications.telegram_service import telegram_service
 from app.services.calendar_service import calendar_service
+from app.services.ai.concurrency import run_sync
 from app.config import settings
-from typing import Dict, Optional
-import hashlib
+from typing import AsyncIterator, Dict, Optional
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Content-derived fields shared by every copy of the same email; this is what gets cached.
+ANALYSIS_FIELDS = ("summary", "intent", "priority", "reasoning", "entities", "reply_suggestions")
+
 class EmailProcessor:
     def __init__(self):
         self.llm = llm_service
-        self.cache = redis_client
+        self.cache = llm_cache
         self.telegram = telegram_service
         self.calendar = calendar_service
+        self.heuristics = heuristic_classifier
+        self.embeddings = embedding_classifier
+        self.single_flight = SingleFlight("process_email")
 
-    def _generate_cache_key(self, email_id: str, operation: str) -> str:
-        return f"email: {email_id}:{operation}"
-    
     def process_email(self, email_data: Dict, send_notification: bool = True, user_access_token: str = None) -> Dict:
+        return run_sync(self.aprocess_email(email_data, send_notification, user_access_token))
+
+    async def aprocess_email(self, email_data: Dict, send_notification: bool = True, user_access_token: str = None) -> Dict:
+        async def compute() -> Dict:
+            classification = (await self._classify([email_data]))[0]
+            return await self._process(email_data, classification, send_notification, user_access_token)
+
+        return await self.single_flight.run(self._flight_key(email_data), compute)
+
+    def _flight_key(self, email_data: Dict) -> str:
+        """Concurrent triggers (API sync, Telegram /sync, fetch-and-process) share one analysis per email."""
+        content = content_hash(email_data.get("subject", ""), email_data.get("body", ""))
+        return f"{email_data.get('message_id') or ''}:{content[:16]}"
+
+    async def _classify(self, emails: list) -> list:
+        """Local intent/priority for each email (rules first, then embeddings), or None."""
+        results = []
+        for email in emails:
+            triage = self.heuristics.triage(email)
+            results.append({**triage, "source": "heuristic"} if triage else None)
+
+        pending = [index for index, result in enumerate(results) if result is None]
+        if pending:
+            predictions = await asyncio.to_thread(
+                self.embeddings.classify_batch, [emails[index] for index in pending]
+            )
+            for index, prediction in zip(pending, predictions):
+                if prediction:
+                    results[index] = {**prediction, "source": "embedding"}
+
+        return results
+
+    async def _process(self, email_data: Dict, classification: Optional[Dict], send_notification: bool = True, user_access_token: str = None) -> Dict:
         message_id = email_data.get("message_id", "")
         subject = email_data.get("subject", "")
         body = email_data.get("body", "")
 
-        cache_key = self._generate_cache_key(message_id, "full_analysis")
-        cached = self.cache.get(cache_key)
+        triage = classification and classification["source"] == "heuristic"
+        sections = self._sections(email_data, classification)
+        cache_operation = analysis_cache_operation(sections)
 
-        if cached:
-            logger.info("Cache hit for email {message_id}")
-            return cached
-        
-        logger.info(f"Processing email {message_id}")
-        summary = self.llm.summarize_email(body, subject)
-        intent_data = self.llm.detect_intent(body, subject)
-        entities = self.llm.extract_entities(body)
-        replies = self.llm.generate_reply_suggestions(body, subject)
+        failed = []
+        with self.llm.track_usage() as usage:
+            analysis = await asyncio.to_thread(self.cache.get, cache_operation, subject, body)
+
+            if analysis:
+                logger.info(f"Cache hit for email {message_id}")
+            else:
+                logger.info(f"Processing email {message_id}")
+                if triage:
+                    skipped = len(ANALYSIS_SECTIONS) - len(sections)
+                    self.heuristics.record_skipped(skipped, 0 if settings.AI_SINGLE_CALL_ANALYSIS else skipped)
+                analysis, failed = await self._analyze(body, subject, sections, classification and classification["priority"])
+                # Sections left at their defaults would be replayed for every copy of this email.
+                if analysis and not failed:
+                    await asyncio.to_thread(self.cache.set, cache_operation, subject, body, analysis)
+
+            # Priority is only known now for emails the local classifiers could not label.
+            if not classification and "replies" not in sections and self._precompute_replies(email_data, analysis.get("priority")):
+                analysis = {**analysis, "reply_suggestions": await self.aget_reply_suggestions({**email_data, "priority": analysis.get("priority")})}
 
-        meeting_info = None
-        calendar_event = None
+        if classification:
+            analysis = {
+                **analysis,
+                "intent": classification["intent"],
+                "priority": classification["priority"],
+                "reasoning": classification["reasoning"]
+            }
 
-        if intent_data.get("intent") == "meeting":
-            meeting_info = self.calendar.extract_meeting_info(body, entities)
+        if triage:
+            replies = []
+        else:
+            # None until generated on first access (or when generation failed), see get_reply_suggestions.
+            replies = analysis.get("reply_suggestions")
+
+        result = {
+            "message_id": message_id,
+            "summary": analysis.get("summary") or "unable to generate summary",
+            "intent": analysis.get("intent", "information"),
+            "priority": analysis.get("priority", "medium"),
+            "reasoning": analysis.get("reasoning", ""),
+            "entities": analysis.get("entities") or {}, 
+            "reply_suggestions": replies,
+            "meeting_info": None,
+            "calendar_event": None,
+            # "default": the intent call failed, so intent and priority are placeholders rather than LLM labels.
+            "classified_by": classification["source"] if classification else ("default" if "intent" in failed else "llm"),
+            "failed_sections": failed,
+            "llm_usage": usage.as_dict(),
+            "processed": True 
+        }
+
+        await asyncio.to_thread(self._finalize, result, email_data, send_notification, user_access_token)
+
+        return result
+
+    def _sections(self, email_data: Dict, classification: Optional[Dict]) -> list:
+        """Analysis sections the LLM still has to produce for an email."""
+        sections = list(ANALYSIS_SECTIONS)
+        if classification and classification["source"] == "heuristic":
+            # Bulk mail: intent and priority are known and nobody replies to it.
+            sections = [section for section in sections if section not in ("intent", "replies")]
+        elif classification:
+            sections.remove("intent")
+        if "replies" in sections and not self._precompute_replies(email_data, classification and classification["priority"]):
+            sections.remove("replies")
+        return sections
+
+    def _precompute_replies(self, email_data: Dict, priority: Optional[str]) -> bool:
+        policy = settings.AI_REPLY_SUGGESTIONS_POLICY
+        if policy == "eager":
+            return True
+        if policy == "priority":
+            return priority == "high" or "UNREAD" in (email_data.get("labels") or [])
+        return False
+
+    async def _analyze(self, body: str, subject: str, sections: list, priority: Optional[str] = None) -> tuple:
+        """The analysis fields, and the sections that fell back to defaults because their call failed."""
+        if settings.AI_SINGLE_CALL_ANALYSIS:
+            analysis = await self.llm.aanalyze_email(body, subject, sections, priority) or {}
+            failed = analysis.get("failed", [])
+        else:
+            analysis, failed = await self.llm.aanalyze_sections(sections, body, subject, priority)
+
+        return {key: analysis.get(key) for key in ANALYSIS_FIELDS if key in analysis}, failed
+
+    def _finalize(self, result: Dict, email_data: Dict, send_notification: bool, user_access_token: str = None):
+        message_id = result["message_id"]
+        body = email_data.get("body", "")
+
+        if result["intent"] == "meeting":
+            meeting_info = self.calendar.extract_meeting_info(body, result["entities"])
+            result["meeting_info"] = meeting_info
             
             if meeting_info and settings.GOOGLE_CALENDAR_ENABLED and user_access_token:
                 if self.calendar.initialize_service(user_access_token):
@@ -49,71 +167,130 @@ class EmailProcessor:
                         email_data,
                         meeting_info
                     )
+                    result["calendar_event"] = calendar_event
 
                     if calendar_event:
                         logger.info(f"Calendar event created for email {message_id}")
 
                         if send_notification:
                             self.telegram.notify_meeting_detected(email_data, meeting_info)
-        result = {
-            "message_id": message_id,
-            "summary": summary or "unable to generate summary",
-            "intent": intent_data.get("intent", "information"),
-            "priority": intent_data.get("priority", "medium"),
-            "reasoning": intent_data.get("reasoning", ""),
-            "entities": entities or {}, 
-            "reply_suggestions": replies or [],
-            "meeting_info": meeting_info,
-            "calendar_event": calendar_event,
-            "processed": True 
-        }
 
         if send_notification and settings.TELEGRAM_ENABLED:
             if result["priority"] == "high":
                 self.telegram.notify_new_email(result)
             else:
                 self.telegram.notify_new_email(result)
+    
+    def _cached_summary(self, subject: str, body: str) -> Optional[str]:
+        cached = self.cache.get("summary", subject, body)
+        if cached:
+            return cached
 
-        self.cache.set(cache_key, result, ttl=3600)
+        analysis = self.cache.get(analysis_cache_operation(ANALYSIS_SECTIONS), subject, body)
+        if analysis and analysis.get("summary"):
+            return analysis["summary"]
+        return None
 
-        return result
-    
     def get_summary_only(self, email_data: Dict) -> str:
-        message_id = email_data.get("message_id", "")
-        cache_key = self._generate_cache_key(message_id, "summary")
+        subject = email_data.get("subject", "")
+        body = email_data.get("body", "")
 
-        cached = self.cache.get(cache_key)
+        cached = self._cached_summary(subject, body)
         if cached:
             return cached
         
-        summary = self.llm.summarize_email(
-            email_data.get("body", ""),
-            email_data.get("subject", "")
-        )
+        summary = self.llm.summarize_email(body, subject)
 
         if summary:
-            self.cache.set(cache_key, summary, ttl=3600)
+            self.cache.set("summary", subject, body, summary)
         
         return summary or "Unable to generate summary"
     
+    async def astream_summary(self, email_data: Dict) -> AsyncIterator[str]:
+        """Summary text as it is generated; a cached summary is yielded in one piece."""
+        subject = email_data.get("subject", "")
+        body = email_data.get("body", "")
+
+        cached = await asyncio.to_thread(self._cached_summary, subject, body)
+        if cached:
+            yield cached
+            return
+
+        chunks = []
+        async for text in self.llm.astream_summary(body, subject):
+            chunks.append(text)
+            yield text
+
+        summary = "".join(chunks).strip()
+        if summary:
+            await asyncio.to_thread(self.cache.set, "summary", subject, body, summary)
+
+    def get_reply_suggestions(self, email_data: Dict) -> Optional[list]:
+        return run_sync(self.aget_reply_suggestions(email_data))
+
+    async def aget_reply_suggestions(self, email_data: Dict) -> Optional[list]:
+        """Reply suggestions for an email, or None if they could not be generated."""
+        subject = email_data.get("subject", "")
+        body = email_data.get("body", "")
+
+        cached = await asyncio.to_thread(self.cache.get, "replies", subject, body)
+        if cached is not None:
+            return cached
+
+        analysis = await asyncio.to_thread(self.cache.get, analysis_cache_operation(ANALYSIS_SECTIONS), subject, body)
+        if analysis and analysis.get("reply_suggestions"):
+            return analysis["reply_suggestions"]
+
+        with self.llm.track_usage() as usage:
+            replies = await self.llm.agenerate_reply_suggestions(body, subject, email_data.get("priority"))
+
+        if replies is None or usage.errors:
+            return None
+
+        await asyncio.to_thread(self.cache.set, "replies", subject, body, replies)
+        return replies
+
     def batch_process_emails(self, emails: list, send_notifications: bool = True, user_access_token: str = None) -> list:
-        results = []
+        return run_sync(self.abatch_process_emails(emails, send_notifications, user_access_token))
 
-        for email in emails:
+    async def abatch_process_emails(self, emails: list, send_notifications: bool = True, user_access_token: str = None) -> list:
+        classifications = await self._classify(emails)
+
+        # In fan-out mode intent is its own request per email, so emails still needing the LLM
+        # share batched intent requests instead (unless their analysis is already cached).
+        # A single-call analysis already carries intent at no extra request.
+        pending = []
+        for index, (email, classification) in enumerate(zip(emails, classifications)):
+            if classification is None and not settings.AI_SINGLE_CALL_ANALYSIS and not self.single_flight.in_flight(self._flight_key(email)):
+                operation = analysis_cache_operation(self._sections(email, None))
+                cached = await asyncio.to_thread(self.cache.get, operation, email.get("subject", ""), email.get("body", ""))
+                if not cached:
+                    pending.append(index)
+
+        if len(pending) > 1:
+            intents = await self.llm.adetect_intents([emails[index] for index in pending])
+            for index, intent in zip(pending, intents):
+                if intent:
+                    classifications[index] = {**intent, "source": "llm"}
+
+        async def process(email: Dict, classification: Optional[Dict]) -> Dict:
             try:
-                result = self.process_email(
+                return await self.single_flight.run(self._flight_key(email), lambda: self._process(
                     email,
+                    classification,
                     send_notification=send_notifications,
                     user_access_token=user_access_token
-                )
-                results.append(result)
+                ))
             except Exception as e:
                 logger.error(f"Error processing email {email.get('message_id')}: {e}")
-                results.append({
+                return {
                     "message_id": email.get("message_id"),
                     "error": str(e),
                     "processed": False
-                })
-            return results
+                }
+
+        return list(await asyncio.gather(*(
+            process(email, classification) for email, classification in zip(emails, classifications)
+        )))
         
 email_processor = EmailProcessor()
\ No newline at end of file
@@ -0,0 +1,207 @@
+from app.config import settings
+from app.database import SessionLocal
+from app.models.models import Email
+from app.services.ai.preprocessing import clean_email_text
+from collections import Counter
+from typing import Dict, List, Optional
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def embedding_text(subject: str, body: str) -> str:
+    return f"{subject or ''}\n{clean_email_text(body or '')[:settings.EMBEDDING_MAX_CHARS]}"
+
+
+class EmbeddingClassifier:
+    """kNN intent/priority classifier over embeddings of already-labelled emails.
+
+    The index is built from LLM-labelled rows of the email table in a
+    background thread (started at app startup, or on first use) and grows as
+    new LLM-labelled emails are saved. Until it is ready, and wherever the
+    neighbours do not agree strongly enough, emails go to the LLM.
+    """
+
+    def __init__(self):
+        self.model = None
+        self.index = None
+        self.labels: Dict[int, tuple] = {}
+        self.disabled = False
+        self.loading = False
+        self.retry_at = 0.0
+        self.counters = {"classified": 0, "confident": 0, "indexed": 0}
+        self._pending: List[tuple] = []
+        self._lock = threading.RLock()
+
+    def start_loading(self):
+        """Build the index in a background thread unless it is built, building or disabled."""
+        if self.index is not None or self.loading:
+            return
+        with self._lock:
+            if self.index is not None or self.loading:
+                return
+            if self.disabled or not settings.EMBEDDING_CLASSIFIER_ENABLED or time.monotonic() < self.retry_at:
+                return
+            self.loading = True
+        threading.Thread(target=self._load, name="embedding-index", daemon=True).start()
+
+    def _ensure_loaded(self) -> bool:
+        if self.index is None:
+            self.start_loading()
+        return self.index is not None
+
+    def _load(self):
+        try:
+            import faiss
+            import numpy as np
+            from sentence_transformers import SentenceTransformer
+
+            started = time.perf_counter()
+            model = SentenceTransformer(settings.EMBEDDING_MODEL, device="cpu")
+            index = faiss.IndexIDMap(faiss.IndexFlatIP(model.get_sentence_embedding_dimension()))
+            labels = {}
+
+            rows = self._labelled_emails()
+            batch_size = settings.EMBEDDING_BATCH_SIZE * 8
+            for start in range(0, len(rows), batch_size):
+                chunk = rows[start:start + batch_size]
+                vectors = self._embed([embedding_text(row.subject, row.body_text) for row in chunk], model)
+                index.add_with_ids(vectors, np.asarray([row.id for row in chunk], dtype="int64"))
+                labels.update((row.id, (row.intent, row.priority)) for row in chunk)
+
+            with self._lock:
+                self.model, self.index, self.labels = model, index, labels
+                self.counters["indexed"] = len(labels)
+                pending, self._pending = self._pending, []
+            # Emails saved while the index was being built.
+            for email in pending:
+                self.add(*email)
+            logger.info(f"Embedding index built with {len(self.labels)} emails in {time.perf_counter() - started:.1f}s")
+        except ImportError as e:
+            logger.error(f"Embedding classifier unavailable: {e}")
+            self.disabled = True
+        except Exception as e:
+            # e.g. the model download or the database failed; try again later.
+            logger.error(f"Embedding index build failed, retrying in {settings.EMBEDDING_RETRY_SECONDS}s: {e}")
+            self.retry_at = time.monotonic() + settings.EMBEDDING_RETRY_SECONDS
+        finally:
+            with self._lock:
+                self.loading = False
+                if self.index is None:
+                    self._pending = []
+
+    def _labelled_emails(self) -> list:
+        db = SessionLocal()
+        try:
+            return db.query(
+                Email.id, Email.subject, Email.body_text, Email.intent, Email.priority
+            ).filter(
+                Email.intent.isnot(None),
+                Email.priority.isnot(None),
+                # Only real LLM labels; heuristic, embedding and default labels would feed back into the index.
+                Email.classified_by == "llm"
+            ).order_by(Email.id.desc()).limit(settings.EMBEDDING_INDEX_MAX_ROWS).all()
+        finally:
+            db.close()
+
+    def _embed(self, texts: List[str], model=None):
+        return (model or self.model).encode(
+            texts,
+            batch_size=settings.EMBEDDING_BATCH_SIZE,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        ).astype("float32")
+
+    def _add_rows(self, ids: List[int], texts: List[str], labels: List[tuple]):
+        import numpy as np
+
+        vectors = self._embed(texts)
+        with self._lock:
+            self.index.add_with_ids(vectors, np.asarray(ids, dtype="int64"))
+            for email_id, label in zip(ids, labels):
+                self.labels[email_id] = label
+            self.counters["indexed"] = len(self.labels)
+
+    def add(self, email_id: int, subject: str, body: str, intent: str, priority: str):
+        """Add a newly saved, LLM-labelled email to the index."""
+        if not intent or not priority:
+            return
+        with self._lock:
+            if self.index is None:
+                if self.loading:
+                    self._pending.append((email_id, subject, body, intent, priority))
+                return
+            if email_id in self.labels:
+                return
+        try:
+            self._add_rows([email_id], [embedding_text(subject, body)], [(intent, priority)])
+        except Exception as e:
+            logger.error(f"Failed to index email {email_id}: {e}")
+
+    def classify_batch(self, emails: List[Dict]) -> List[Optional[Dict]]:
+        """Predict intent and priority for each email, or None where neighbours disagree."""
+        if not emails or not self._ensure_loaded():
+            return [None] * len(emails)
+
+        with self._lock:
+            if len(self.labels) < settings.EMBEDDING_MIN_INDEX_SIZE:
+                return [None] * len(emails)
+
+        vectors = self._embed([embedding_text(e.get("subject"), e.get("body")) for e in emails])
+        with self._lock:
+            scores, ids = self.index.search(vectors, settings.EMBEDDING_KNN_K)
+            neighbours = [
+                [(self.labels[int(i)], float(score)) for i, score in zip(row_ids, row_scores) if int(i) in self.labels]
+                for row_ids, row_scores in zip(ids, scores)
+            ]
+
+        predictions = [self._vote(row) for row in neighbours]
+
+        with self._lock:
+            self.counters["classified"] += len(predictions)
+            self.counters["confident"] += sum(1 for p in predictions if p)
+
+        return predictions
+
+    def _vote(self, neighbours: List[tuple]) -> Optional[Dict]:
+        if not neighbours:
+            return None
+
+        intent_votes, priority_votes = Counter(), Counter()
+        for (intent, priority), score in neighbours:
+            weight = max(score, 0.0)
+            intent_votes[intent] += weight
+            priority_votes[priority] += weight
+
+        total = sum(intent_votes.values())
+        if total <= 0:
+            return None
+
+        intent, intent_weight = intent_votes.most_common(1)[0]
+        priority, priority_weight = priority_votes.most_common(1)[0]
+        agreement = min(intent_weight, priority_weight) / total
+
+        if agreement < settings.EMBEDDING_MIN_AGREEMENT:
+            return None
+
+        return {
+            "intent": intent,
+            "priority": priority,
+            "reasoning": f"Matched {len(neighbours)} similar emails ({agreement:.0%} agreement)",
+            "confidence": round(agreement, 2)
+        }
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                **self.counters,
+                "enabled": settings.EMBEDDING_CLASSIFIER_ENABLED and not self.disabled,
+                "loaded": self.index is not None,
+                "loading": self.loading
+            }
+
+
+embedding_classifier = EmbeddingClassifier()
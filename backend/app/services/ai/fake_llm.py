@@ -0,0 +1,242 @@
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.pydantic_v1 import PrivateAttr
+from app.services.ai.preprocessing import count_tokens
+from app.services.ai.schemas import INTENTS
+from typing import Any, Dict, Iterator, AsyncIterator, List, Optional
+import asyncio
+import json
+import math
+import random
+import re
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+INTENT_KEYWORDS = [
+    ("urgent", re.compile(r"\b(urgent|asap|immediately|critical|emergency|outage|down)\b", re.IGNORECASE)),
+    ("meeting", re.compile(r"\b(meet|meeting|call|sync|schedule|calendar|invite|zoom|standup)\b", re.IGNORECASE)),
+    ("follow-up", re.compile(r"\b(follow(ing)?[ -]up|checking in|any update|reminder|circling back)\b", re.IGNORECASE)),
+    ("task", re.compile(r"\b(please|could you|can you|deadline|due|review|todo|action required)\b", re.IGNORECASE)),
+    ("social", re.compile(r"\b(liked|commented|follower|birthday|congrat\w*|party|invited you)\b", re.IGNORECASE)),
+]
+
+PRIORITY_BY_INTENT = {
+    "urgent": "high",
+    "meeting": "medium",
+    "follow-up": "medium",
+    "task": "medium",
+    "information": "low",
+    "social": "low",
+}
+
+DATE_PATTERN = re.compile(
+    r"\b((mon|tues|wednes|thurs|fri|satur|sun)day|tomorrow|today|next week|"
+    r"\d{1,2}(:\d{2})?\s?(am|pm)|\d{1,2}/\d{1,2}(/\d{2,4})?|"
+    r"(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.? \d{1,2})\b",
+    re.IGNORECASE
+)
+PERSON_PATTERN = re.compile(r"^(?:hi|hello|dear|thanks|regards|best|cheers),?\s+([A-Z][a-z]+)", re.IGNORECASE | re.MULTILINE)
+ORGANIZATION_PATTERN = re.compile(r"\b([A-Z][\w&]*(?: [A-Z][\w&]*)* (?:Inc|LLC|Ltd|Corp|GmbH|Team))\b")
+LOCATION_PATTERN = re.compile(r"\b(?:at|in) ((?:Room|Building|Floor|Office) \w+|[A-Z][a-z]+ (?:Room|Office|Cafe|Hall))\b")
+ACTION_PATTERN = re.compile(r"[^.!?\n]*\b(please|could you|can you|need to|make sure)\b[^.!?\n]*[.!?]?", re.IGNORECASE)
+
+REPLIES_BY_INTENT = {
+    "meeting": ["That time works for me, I'll be there.", "Sounds good, see you then!", "Confirmed."],
+    "urgent": ["I'm on it and will update you shortly.", "Thanks for flagging, looking into it now!", "On it."],
+    "follow-up": ["Thanks for the reminder, I'll get back to you by end of day.", "Sorry for the delay, update coming soon!", "Will follow up today."],
+    "task": ["Thanks, I'll take care of this and confirm once done.", "Sure, happy to help with that!", "Will do."],
+    "social": ["Thank you, much appreciated.", "Thanks so much!", "Thanks!"],
+    "information": ["Thanks for the update.", "Good to know, thanks!", "Noted."],
+}
+TONES = ["professional", "friendly", "brief"]
+
+
+def _split_prompt(messages: List[BaseMessage]) -> tuple:
+    system = "\n".join(str(m.content) for m in messages if m.type == "system")
+    user = "\n".join(str(m.content) for m in messages if m.type != "system")
+    return system, user
+
+
+def _email_parts(text: str) -> tuple:
+    match = re.match(r"Subject: (.*?)\n\nContent:\n(.*)", text, re.DOTALL)
+    if match:
+        return match.group(1), match.group(2)
+    return "", text
+
+
+def classify_intent(subject: str, content: str) -> Dict:
+    text = f"{subject}\n{content}"
+    for intent, pattern in INTENT_KEYWORDS:
+        match = pattern.search(text)
+        if match:
+            return {
+                "intent": intent,
+                "priority": PRIORITY_BY_INTENT[intent],
+                "reasoning": f"Mentions '{match.group(0)}'"
+            }
+    return {"intent": "information", "priority": "low", "reasoning": "No action requested"}
+
+
+def summarize(subject: str, content: str) -> str:
+    sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+", " ".join(content.split())) if s.strip()]
+    summary = " ".join(sentences[:2]) or subject or "Empty email."
+    return summary if not subject or subject.lower() in summary.lower() else f"{subject}: {summary}"
+
+
+def extract_entities(content: str) -> Dict:
+    def unique(values):
+        return list(dict.fromkeys(v.strip() for v in values if v.strip()))
+
+    return {
+        "people": unique(PERSON_PATTERN.findall(content)),
+        "organizations": unique(ORGANIZATION_PATTERN.findall(content)),
+        "dates": unique(m.group(0) for m in DATE_PATTERN.finditer(content)),
+        "locations": unique(LOCATION_PATTERN.findall(content)),
+        "action_items": unique(m.group(0) for m in ACTION_PATTERN.finditer(content))[:5],
+    }
+
+
+def suggest_replies(subject: str, content: str) -> List[Dict]:
+    intent = classify_intent(subject, content)["intent"]
+    return [{"text": text, "tone": tone} for text, tone in zip(REPLIES_BY_INTENT[intent], TONES)]
+
+
+def respond(system: str, user: str) -> str:
+    """Deterministic, schema-valid answer for whichever prompt this is."""
+    if '<email id="' in user:
+        return json.dumps([
+            {"id": email_id, **classify_intent(subject, content)}
+            for email_id, subject, content in re.findall(
+                r'<email id="([^"]*)">\nSubject: (.*?)\n\n(.*?)\n</email>', user, re.DOTALL
+            )
+        ])
+
+    subject, content = _email_parts(user)
+
+    if "single JSON object" in system:
+        result = {}
+        if '"summary"' in system:
+            result["summary"] = summarize(subject, content)
+        if '"intent"' in system:
+            result.update(classify_intent(subject, content))
+        if '"entities"' in system:
+            result["entities"] = extract_entities(content)
+        if '"reply_suggestions"' in system:
+            result["reply_suggestions"] = suggest_replies(subject, content)
+        return json.dumps(result)
+    if "Extract entities" in system:
+        return json.dumps(extract_entities(content))
+    if "reply options" in system:
+        return json.dumps(suggest_replies(subject, content))
+    if "intent" in system and all(intent in system for intent in INTENTS):
+        return json.dumps(classify_intent(subject, content))
+    return summarize(subject, content)
+
+
+class FakeChatModel(BaseChatModel):
+    """Offline chat model for load tests: rule-based answers, simulated latency, errors and token counts.
+
+    Latency is `latency_ms` sampled from `latency_distribution` (fixed,
+    uniform, normal or lognormal, spread by `latency_jitter_ms`) plus the
+    completion length at `tokens_per_second`. Random draws come from one
+    generator seeded with `seed`, so runs are reproducible. Token usage is
+    counted from the prompt and answer unless `prompt_tokens` or
+    `completion_tokens` fix it per call.
+    """
+
+    model_name: str = "fake-llm"
+    latency_ms: float = 300.0
+    latency_jitter_ms: float = 100.0
+    latency_distribution: str = "lognormal"
+    tokens_per_second: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    error_rate: float = 0.0
+    seed: int = 0
+
+    _random: Any = PrivateAttr(default=None)
+    _lock: Any = PrivateAttr(default=None)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._random = random.Random(self.seed)
+        self._lock = threading.Lock()
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def _sample_latency(self, completion_tokens: int) -> tuple:
+        with self._lock:
+            failed = self._random.random() < self.error_rate
+            mean, jitter = self.latency_ms, self.latency_jitter_ms
+            if self.latency_distribution == "uniform":
+                latency = self._random.uniform(mean - jitter, mean + jitter)
+            elif self.latency_distribution == "normal":
+                latency = self._random.gauss(mean, jitter)
+            elif self.latency_distribution == "lognormal" and mean > 0:
+                sigma = math.sqrt(math.log(1 + (jitter / mean) ** 2))
+                latency = self._random.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma)
+            else:
+                latency = mean
+
+        if self.tokens_per_second > 0:
+            latency += completion_tokens / self.tokens_per_second * 1000
+        return max(latency, 0.0) / 1000, failed
+
+    def _answer(self, messages: List[BaseMessage]) -> tuple:
+        system, user = _split_prompt(messages)
+        content = respond(system, user)
+        usage = {
+            "input_tokens": self.prompt_tokens or count_tokens(system + user),
+            "output_tokens": self.completion_tokens or count_tokens(content),
+        }
+        usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+        delay, failed = self._sample_latency(usage["output_tokens"])
+        return content, usage, delay, failed
+
+    def _message(self, content: str, usage: Dict) -> AIMessage:
+        return AIMessage(content=content, usage_metadata=usage, response_metadata={"model_name": self.model_name})
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> ChatResult:
+        content, usage, delay, failed = self._answer(messages)
+        time.sleep(delay)
+        if failed:
+            raise RuntimeError("Fake LLM injected error")
+        return ChatResult(generations=[ChatGeneration(message=self._message(content, usage))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> ChatResult:
+        content, usage, delay, failed = self._answer(messages)
+        await asyncio.sleep(delay)
+        if failed:
+            raise RuntimeError("Fake LLM injected error")
+        return ChatResult(generations=[ChatGeneration(message=self._message(content, usage))])
+
+    def _chunks(self, content: str, usage: Dict) -> List[ChatGenerationChunk]:
+        words = re.findall(r"\S+\s*", content) or [content]
+        chunks = [ChatGenerationChunk(message=AIMessageChunk(content=word)) for word in words]
+        chunks[-1] = ChatGenerationChunk(message=AIMessageChunk(content=words[-1], usage_metadata=usage))
+        return chunks
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        content, usage, delay, failed = self._answer(messages)
+        chunks = self._chunks(content, usage)
+        for index, chunk in enumerate(chunks):
+            # The sampled latency becomes time to first token; the rest is spread over the stream.
+            time.sleep(delay if index == 0 else 0.005)
+            if failed:
+                raise RuntimeError("Fake LLM injected error")
+            yield chunk
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        content, usage, delay, failed = self._answer(messages)
+        chunks = self._chunks(content, usage)
+        for index, chunk in enumerate(chunks):
+            await asyncio.sleep(delay if index == 0 else 0.005)
+            if failed:
+                raise RuntimeError("Fake LLM injected error")
+            yield chunk
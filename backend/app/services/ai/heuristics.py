@@ -0,0 +1,124 @@
+from app.config import settings
+from typing import Dict, Optional
+import re
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+NO_REPLY_SENDER = re.compile(
+    r"(no-?reply|do-?not-?reply|donotreply|notifications?|mailer-daemon|alerts?|newsletters?|updates|info|news|marketing)@",
+    re.IGNORECASE
+)
+
+# Gmail category labels and what they say about the email.
+CATEGORY_SCORES = {
+    "CATEGORY_PROMOTIONS": ("information", 0.45),
+    "CATEGORY_SOCIAL": ("social", 0.45),
+    "CATEGORY_FORUMS": ("information", 0.35),
+    "CATEGORY_UPDATES": ("information", 0.25),
+}
+
+KEYWORD_SCORES = [
+    ("information", 0.25, re.compile(r"\b(receipt|order (confirmation|#)|your order|invoice|payment (received|confirmation)|has shipped|delivery update)\b", re.IGNORECASE)),
+    ("information", 0.25, re.compile(r"\b(newsletter|weekly digest|daily digest|view (this email )?in (your )?browser|unsubscribe)\b", re.IGNORECASE)),
+    ("social", 0.3, re.compile(r"\b(liked your|commented on|mentioned you|new follower|started following|connection request|tagged you)\b", re.IGNORECASE)),
+]
+
+# Mail that looks automated but may still need attention goes to the LLM.
+ATTENTION_PATTERN = re.compile(
+    r"\b(urgent|asap|action required|immediately|security alert|suspicious|password|verify|verification code|"
+    r"payment failed|overdue|final notice|deadline|invitation|meeting|interview|calendar)\b",
+    re.IGNORECASE
+)
+
+
+class HeuristicClassifier:
+    """Rule-based triage of bulk and automated mail that does not need the LLM.
+
+    Scores list/bulk headers, no-reply senders, Gmail categories and keywords.
+    Only results at or above AI_HEURISTIC_CONFIDENCE_THRESHOLD are used.
+    """
+
+    def __init__(self):
+        self.counters = {
+            "classified": 0,
+            "confident": 0,
+            "llm_calls_avoided": 0,
+            "sections_skipped": 0
+        }
+        self._lock = threading.Lock()
+
+    def classify(self, email_data: Dict) -> Dict:
+        headers = {name.lower(): value for name, value in (email_data.get("headers") or {}).items()}
+        labels = set(email_data.get("labels") or [])
+        sender = email_data.get("sender") or ""
+        text = f"{email_data.get('subject') or ''}\n{(email_data.get('body') or '')[:2000]}"
+
+        scores = {"information": 0.0, "social": 0.0}
+        reasons = []
+
+        if "list-unsubscribe" in headers or "list-id" in headers:
+            scores["information"] += 0.35
+            reasons.append("mailing list headers")
+        if headers.get("precedence", "").strip().lower() in ("bulk", "list", "junk"):
+            scores["information"] += 0.3
+            reasons.append(f"Precedence: {headers['precedence'].strip()}")
+        if headers.get("auto-submitted", "no").strip().lower() != "no":
+            scores["information"] += 0.3
+            reasons.append("auto-submitted")
+        if NO_REPLY_SENDER.search(sender):
+            scores["information"] += 0.35
+            reasons.append("no-reply sender")
+
+        for label in labels:
+            if label in CATEGORY_SCORES:
+                intent, score = CATEGORY_SCORES[label]
+                scores[intent] += score
+                reasons.append(label.replace("CATEGORY_", "").lower() + " category")
+
+        for intent, score, pattern in KEYWORD_SCORES:
+            if pattern.search(text):
+                scores[intent] += score
+                reasons.append(f"{intent} keywords")
+
+        intent = "social" if scores["social"] >= 0.3 else "information"
+        confidence = min(1.0, scores["information"] + scores["social"])
+
+        attention = ATTENTION_PATTERN.search(text)
+        if attention or "IMPORTANT" in labels or "STARRED" in labels:
+            confidence *= 0.4
+            reasons.append(f"needs attention ({attention.group(0) if attention else 'important label'})")
+
+        with self._lock:
+            self.counters["classified"] += 1
+            self.counters["confident"] += int(confidence >= settings.AI_HEURISTIC_CONFIDENCE_THRESHOLD)
+
+        return {
+            "intent": intent,
+            "priority": "low",
+            "reasoning": "Heuristic: " + (", ".join(reasons) or "no signals"),
+            "confidence": round(confidence, 2)
+        }
+
+    def triage(self, email_data: Dict) -> Optional[Dict]:
+        """Intent and priority for confidently classified mail, otherwise None."""
+        if not settings.AI_HEURISTICS_ENABLED:
+            return None
+
+        result = self.classify(email_data)
+        if result["confidence"] < settings.AI_HEURISTIC_CONFIDENCE_THRESHOLD:
+            return None
+        return result
+
+    def record_skipped(self, sections: int, llm_calls: int):
+        with self._lock:
+            self.counters["sections_skipped"] += sections
+            self.counters["llm_calls_avoided"] += llm_calls
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self.counters)
+
+
+heuristic_classifier = HeuristicClassifier()
@@ -1,162 +1,728 @@
-from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser, JsonOutputParser
+from langchain_core.runnables import Runnable
 from app.config import settings
-from typing import Dict, Optional
+from app.services.ai.schemas import IntentAnalysis, EntityAnalysis, ReplySuggestion
+from app.services.ai.concurrency import llm_semaphore
+from app.services.ai.providers import create_chat_model
+from app.services.ai.preprocessing import prompt_preparer, count_tokens
+from pydantic import ValidationError
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+import asyncio
+import hashlib
+import threading
+import time
 import logging
 
 logger = logging.getLogger(__name__)
 
+ANALYSIS_SECTIONS = {
+    "summary": """- "summary": a 2-3 sentence summary focused on key points and action items. Highlight any meeting or deadline.""",
+    "intent": """- "intent": one of [meeting, follow-up, information, urgent, task, social]
+- "priority": one of [high, medium, low]
+- "reasoning": brief explanation of the intent and priority""",
+    "entities": """- "entities": object with lists "people", "organizations", "dates", "locations" and "action_items\"""",
+    "replies": """- "reply_suggestions": array of 3 objects with "text" (1-2 sentences) and "tone" (one of [professional, friendly, brief])""",
+}
+
+SUMMARY_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """
+You are an expert email assistant. Summarize emails concisely. 
+Rules:
+    - Create a 2-3 sentence summary
+    - Focus on key Points and action items
+    - Be clear and professional
+    - If there's a meeting or deadline, highlight it
+"""), 
+    ("user", "Subject: {subject}\n\nContent:\n{content}")
+])
+
+INTENT_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """Analyze the email and return JSON with:
+                 - intent: One of [meeting, follow-up, information, urgent, task, social]
+                 -priority: one of [high, medium, low]
+                 -reasoning: brief explanation
+                 
+                 Return ONLY valid JSON, no markdown.
+                 """),
+    ("user", "Subject: {subject}\n\nContent:\n{content}")
+])
+
+ENTITIES_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """Extract entities from the email and return JSON with:
+- people: list of person names
+- organizations: list of company/org names
+- dates: list of mentioned dates/times
+- locations: list of places
+- action_items: list of tasks/todos
+
+Return ONLY valid JSON."""),
+    ("user", "{content}")
+])
+
+REPLIES_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """Generate 3 quick reply options for this email.
+                 Return JSON array with objects containing:
+                 - text: the reply text (1-2 sectences)
+                 - tone: one of [Professional, friendly, brief]
+                 
+                 Return ONLY valid JSON array."""),
+    ("user", "Subject: {subject}\n\nContent:\n{content}")
+])
+
+BATCH_INTENT_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """Analyze each email below and return a JSON array with one object per email containing:
+- id: the email id exactly as given
+- intent: one of [meeting, follow-up, information, urgent, task, social]
+- priority: one of [high, medium, low]
+- reasoning: brief explanation
+
+Return ONLY valid JSON array, no markdown."""),
+    ("user", "{emails}")
+])
+
+ANALYSIS_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You are an expert email assistant. Analyze the email and return a single JSON object with these keys:
+{sections}
+
+Return ONLY valid JSON, no markdown."""),
+    ("user", "Subject: {subject}\n\nContent:\n{content}")
+])
+
+PROMPTS = {
+    "summarize": SUMMARY_PROMPT,
+    "intent": INTENT_PROMPT,
+    "entities": ENTITIES_PROMPT,
+    "replies": REPLIES_PROMPT,
+    "analyze": ANALYSIS_PROMPT,
+    "intent_batch": BATCH_INTENT_PROMPT,
+}
+
+PARSERS = {
+    "summarize": StrOutputParser(),
+    "intent": JsonOutputParser(),
+    "entities": JsonOutputParser(),
+    "replies": JsonOutputParser(),
+    "analyze": JsonOutputParser(),
+    "intent_batch": JsonOutputParser(),
+}
+
+
+def _prompt_version(operation: str) -> str:
+    digest = hashlib.sha256()
+    for message in PROMPTS[operation].messages:
+        digest.update(message.prompt.template.encode("utf-8"))
+    if operation == "analyze":
+        digest.update("".join(ANALYSIS_SECTIONS.values()).encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+PROMPT_VERSIONS = {operation: _prompt_version(operation) for operation in PROMPTS}
+
+# Single-purpose operation behind each analysis section, used for fan-out and fallbacks.
+SECTION_OPERATIONS = {
+    "summary": "summarize",
+    "intent": "intent",
+    "entities": "entities",
+    "replies": "replies",
+}
+
+
+def analysis_cache_operation(sections: Iterable[str]) -> str:
+    """Cache operation name for an analysis covering the given sections."""
+    return "analysis:" + "+".join(section for section in ANALYSIS_SECTIONS if section in set(sections))
+
+# Operations that stay on the large model; see AI_LARGE_MODEL_HIGH_PRIORITY_ONLY.
+LARGE_MODEL_OPERATIONS = ("summarize", "replies", "analyze")
+
+# Short structured outputs that run on AI_SMALL_MODEL unless AI_MODEL_ROUTES names a model.
+SMALL_MODEL_OPERATIONS = ("intent", "intent_batch", "entities")
+
+DEFAULT_INTENT = {
+    "intent": "information",
+    "priority": "medium",
+    "reasoning": "Error in Analysis"
+}
+
+DEFAULT_ENTITIES = {
+    "people": [],
+    "organizations": [],
+    "dates": [],
+    "locations": [],
+    "action_items": []
+}
+
+
+class LLMUsage:
+    """Token and latency totals for a group of LLM calls."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latency_ms = 0.0
+
+    def add(self, latency_ms: float, prompt_tokens: int, completion_tokens: int, failed: bool = False):
+        self.calls += 1
+        self.errors += int(failed)
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.latency_ms += latency_ms
+
+    def as_dict(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.prompt_tokens + self.completion_tokens,
+            "latency_ms": round(self.latency_ms, 1)
+        }
+
+
+_usage_scopes: ContextVar[tuple] = ContextVar("llm_usage_scopes", default=())
+
+
+def _token_usage(message) -> tuple:
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+
+    usage = (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+    return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+
+
 class LLMService:
     def __init__(self):
         self.llm = None
-        self._initialize_llm()
+        self.injected_llm = None
+        self.models: Dict[tuple, object] = {}
+        self.chains: Dict[tuple, Runnable] = {}
+        self.metrics: Dict[str, LLMUsage] = {}
+        self.route_metrics: Dict[tuple, LLMUsage] = {}
+        self._metrics_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._settings_fingerprint = None
+        self.reload()
+
+    def _current_settings_fingerprint(self) -> tuple:
+        return (
+            settings.LLM_PROVIDER,
+            settings.GROQ_API_KEY,
+            settings.AI_MODEL,
+            settings.AI_SMALL_MODEL,
+            repr(settings.AI_MODEL_ROUTES)
+        )
+
+    def reload(self, llm=None):
+        """(Re)create the LLM clients and compile every prompt chain against its route.
+
+        Called at startup and whenever the model settings change; pass `llm`
+        to swap in another chat model for every route (e.g. a stub in benchmarks).
+        """
+        with self._reload_lock:
+            self._settings_fingerprint = self._current_settings_fingerprint()
+            self.injected_llm = llm
+            self.models = {}
+            self.chains = {}
+            self.llm = llm if llm is not None else self._model({"model": settings.AI_MODEL, "max_tokens": 1024, "temperature": 0.3})
+
+            if self.llm:
+                for operation in PROMPTS:
+                    self._build_chain(operation, self.route(operation))
+
+    def route(self, operation: str, priority: Optional[str] = None) -> Dict:
+        """Model and generation parameters for an operation.
+
+        Intent and entity extraction default to AI_SMALL_MODEL, everything else
+        to AI_MODEL; AI_MODEL_ROUTES overrides either. With AI_LARGE_MODEL_HIGH_PRIORITY_ONLY, summaries, replies and full
+        analyses of mail known not to be high priority go to AI_SMALL_MODEL.
+        """
+        model = settings.AI_SMALL_MODEL if operation in SMALL_MODEL_OPERATIONS else settings.AI_MODEL
+        route = {"model": model, "max_tokens": 1024, "temperature": 0.3}
+        route.update(settings.AI_MODEL_ROUTES.get(operation, {}))
 
-    def _initialize_llm(self):
+        if settings.AI_LARGE_MODEL_HIGH_PRIORITY_ONLY and priority and priority != "high" and operation in LARGE_MODEL_OPERATIONS:
+            route["model"] = settings.AI_SMALL_MODEL
+        return route
+
+    def _model(self, route: Dict):
+        key = (route["model"], route["max_tokens"], route["temperature"])
+        if key not in self.models:
+            try:
+                self.models[key] = create_chat_model(settings.LLM_PROVIDER, **route)
+                if self.models[key]:
+                    logger.info(f"{settings.LLM_PROVIDER} LLM initialized: {route['model']} (max_tokens={route['max_tokens']})")
+            except Exception as e:
+                logger.error(f"LLM initialization failed: {e}")
+                self.models[key] = None
+        return self.models[key]
+
+    def _chain_key(self, operation: str, route: Dict) -> tuple:
+        return (operation, PROMPT_VERSIONS[operation], route["model"], route["max_tokens"], route["temperature"])
+
+    def _build_chain(self, operation: str, route: Dict) -> Optional[Runnable]:
+        key = self._chain_key(operation, route)
+        if key not in self.chains:
+            llm = self.injected_llm if self.injected_llm is not None else self._model(route)
+            if llm is None:
+                return None
+            self.chains[key] = PROMPTS[operation] | llm
+        return self.chains[key]
+
+    def _chain(self, operation: str, priority: Optional[str] = None) -> tuple:
+        if self._settings_fingerprint != self._current_settings_fingerprint():
+            logger.info("LLM settings changed, rebuilding prompt chains")
+            self.reload()
+
+        route = self.route(operation, priority)
+        chain = self.chains.get(self._chain_key(operation, route))
+        if chain is None:
+            with self._reload_lock:
+                chain = self._build_chain(operation, route)
+        if chain is None:
+            raise RuntimeError(f"No LLM available for {operation} on {route['model']}")
+        return chain, route["model"]
+
+    @contextmanager
+    def track_usage(self):
+        """Collect usage of every LLM call made inside the block, including nested tasks."""
+        usage = LLMUsage()
+        token = _usage_scopes.set(_usage_scopes.get() + (usage,))
         try:
-            if settings.GROQ_API_KEY:
-                self.llm = ChatGroq(
-                    groq_api_key=settings.GROQ_API_KEY,
-                    model_name=settings.AI_MODEL,
-                    temperature=0.3,
-                    max_tokens=1024
+            yield usage
+        finally:
+            _usage_scopes.reset(token)
+
+    def _record_call(self, operation: str, started: float, message=None, model: str = None, failed: bool = False):
+        latency_ms = (time.perf_counter() - started) * 1000
+        failed = failed or message is None
+        prompt_tokens, completion_tokens = (0, 0) if message is None else _token_usage(message)
+
+        with self._metrics_lock:
+            self.metrics.setdefault(operation, LLMUsage()).add(latency_ms, prompt_tokens, completion_tokens, failed)
+            if model:
+                self.route_metrics.setdefault((operation, model), LLMUsage()).add(latency_ms, prompt_tokens, completion_tokens, failed)
+
+        for scope in _usage_scopes.get():
+            scope.add(latency_ms, prompt_tokens, completion_tokens, failed)
+
+    def _invoke(self, operation: str, inputs: Dict, priority: Optional[str] = None):
+        started = time.perf_counter()
+        model = None
+        try:
+            chain, model = self._chain(operation, priority)
+            message = chain.invoke(inputs)
+        except Exception:
+            self._record_call(operation, started, model=model)
+            raise
+
+        return self._parse(operation, started, message, model)
+
+    async def _ainvoke(self, operation: str, inputs: Dict, priority: Optional[str] = None):
+        async with llm_semaphore():
+            started = time.perf_counter()
+            model = None
+            try:
+                chain, model = self._chain(operation, priority)
+                message = await asyncio.wait_for(
+                    chain.ainvoke(inputs),
+                    timeout=settings.AI_STAGE_TIMEOUT_SECONDS
                 )
-                logger.info("Groq LLM initialized")
-            else: 
-                logger.warning("No API key configured")
-        except Exception as e:
-            logger.error(f"LLM initialization failed: {e}")
+            except asyncio.TimeoutError:
+                self._record_call(operation, started, model=model)
+                raise TimeoutError(f"{operation} timed out after {settings.AI_STAGE_TIMEOUT_SECONDS}s")
+            except Exception:
+                self._record_call(operation, started, model=model)
+                raise
+
+        return self._parse(operation, started, message, model)
+
+    def _parse(self, operation: str, started: float, message, model: str):
+        # Output that does not parse counts as a failed call, so callers neither cache nor persist the fallback.
+        try:
+            result = PARSERS[operation].invoke(message)
+        except Exception:
+            self._record_call(operation, started, message, model, failed=True)
+            raise
+
+        self._record_call(operation, started, message, model)
+        return result
+
+    def cache_namespace(self, operation: str) -> str:
+        """Model and prompt version behind a cached result, so changing either invalidates it."""
+        if operation.startswith("analysis:"):
+            sections = operation.split(":", 1)[1].split("+")
+            names = ["analyze"] + [SECTION_OPERATIONS[section] for section in sections]
+        else:
+            names = [SECTION_OPERATIONS.get(operation, operation)]
+
+        digest = hashlib.sha256()
+        for name in names:
+            digest.update(PROMPT_VERSIONS[name].encode("utf-8"))
+            digest.update(repr(sorted(self.route(name).items())).encode("utf-8"))
+        if operation.startswith("analysis:"):
+            digest.update(b"single" if settings.AI_SINGLE_CALL_ANALYSIS else b"fan-out")
 
-    
+        model = getattr(self.injected_llm, "model_name", None) or self.route(names[0])["model"]
+        return f"{model}:{digest.hexdigest()[:12]}"
 
-    def summarize_email(self, email_content: str, subject: str = "") -> Optional[str]:
+    def get_metrics(self) -> Dict:
+        with self._metrics_lock:
+            metrics = {}
+            for operation, usage in self.metrics.items():
+                stats = usage.as_dict()
+                stats["avg_latency_ms"] = round(usage.latency_ms / usage.calls, 1) if usage.calls else 0.0
+                stats["avg_total_tokens"] = round(stats["total_tokens"] / usage.calls, 1) if usage.calls else 0.0
+                metrics[operation] = stats
+            return metrics
+
+    def get_route_metrics(self) -> Dict:
+        with self._metrics_lock:
+            metrics = {}
+            for (operation, model), usage in self.route_metrics.items():
+                stats = usage.as_dict()
+                stats["avg_latency_ms"] = round(usage.latency_ms / usage.calls, 1) if usage.calls else 0.0
+                stats["avg_total_tokens"] = round(stats["total_tokens"] / usage.calls, 1) if usage.calls else 0.0
+                metrics[f"{operation}@{model}"] = stats
+            return metrics
+
+    def summarize_email(self, email_content: str, subject: str = "", priority: Optional[str] = None) -> Optional[str]:
         if not self.llm:
             return None
         try:
-            prompt = ChatPromptTemplate.from_messages([
-                ("system", """
-You are an expert email assistant. Summarize emails concisely. 
-Rules:
-    - Create a 2-3 sentence summary
-    - Focus on key Points and action items
-    - Be clear and professional
-    - If there's a meeting or deadline, highlight it
-"""), 
-                ("user", "Subject: {subject}\n\nContent:\n{content}")
-            ])
-            chain = prompt | self.llm | StrOutputParser()
+            summary = self._invoke("summarize", {
+                "subject": subject,
+                "content": prompt_preparer.prepare(email_content, "summarize")
+            }, priority)
 
-            content = email_content[:settings.MAX_EMAIL_LENGTH]
+            return summary.strip()
+        
+        except Exception as e:
+            logger.error(f"Summarization error: {e}")
+            return None
 
-            summary = chain.invoke({
+    async def asummarize_email(self, email_content: str, subject: str = "", priority: Optional[str] = None) -> Optional[str]:
+        if not self.llm:
+            return None
+        try:
+            summary = await self._ainvoke("summarize", {
                 "subject": subject,
-                "content": content
-            })
+                "content": prompt_preparer.prepare(email_content, "summarize")
+            }, priority)
 
             return summary.strip()
-        
+
         except Exception as e:
             logger.error(f"Summarization error: {e}")
             return None
-        
 
+    async def astream_summary(self, email_content: str, subject: str = "") -> AsyncIterator[str]:
+        """Yield summary text as the model generates it."""
+        if not self.llm:
+            return
+
+        inputs = {
+            "subject": subject,
+            "content": prompt_preparer.prepare(email_content, "summarize")
+        }
+
+        async with llm_semaphore():
+            started = time.perf_counter()
+            message = None
+            model = None
+            try:
+                chain, model = self._chain("summarize")
+                async for chunk in chain.astream(inputs):
+                    if message is None:
+                        logger.info(f"Summary first token after {(time.perf_counter() - started) * 1000:.0f}ms")
+                    message = chunk if message is None else message + chunk
+                    if chunk.content:
+                        yield chunk.content
+            except Exception:
+                self._record_call("summarize", started, model=model)
+                raise
 
+        self._record_call("summarize", started, message, model)
 
     def detect_intent(self, email_content: str, subject: str = "") -> Optional[Dict]:
         if not self.llm:
             return None
         
         try: 
-            prompt = ChatPromptTemplate.from_messages([
-                ("system", """Analyze the email and return JSON with:
-                 - intent: One of [meeting, follow-up, information, urgent, task, social]
-                 -priority: one of [high, medium, low]
-                 -reasoning: brief explanation
-                 
-                 Return ONLY valid JSON, no markdown.
-                 """),
-                 ("user", "Subject: {subject}\n\nContent:\n{content}")
-            ])
-
-            chain = prompt | self.llm | JsonOutputParser()
-
-            content = email_content[:settings.MAX_EMAIL_LENGTH]
-
-            result = chain.invoke({
+            return self._invoke("intent", {
                 "subject": subject, 
-                "content": content
+                "content": prompt_preparer.prepare(email_content, "intent")
             })
-
-            return result
         
         except Exception as e:
             logger.error(f"Intent detection error: {e}")
-            return{
-                "intent":"information",
-                "priority": "medium",
-                "reasoning": "Error in Analysis"
-            }
-    def extract_entities(self, email_content: str) -> Optional[Dict]:
-       if not self.llm:
-           return None
-       try:
-            prompt = ChatPromptTemplate.from_messages([
-                ("system", """Extract entities from the email and return JSON with:
-- people: list of person names
-- organizations: list of company/org names
-- dates: list of mentioned dates/times
-- locations: list of places
-- action_items: list of tasks/todos
+            return dict(DEFAULT_INTENT)
 
-Return ONLY valid JSON."""),
-                ("user", "{content}")
-            ])
-            
-            chain = prompt | self.llm | JsonOutputParser()
-            
-            content = email_content[:settings.MAX_EMAIL_LENGTH]
-            
-            result = chain.invoke({"content": content})
-            
-            return result
-       except Exception as e:
-           logger.error(f"Entity extraction error: {e}")
-
-           return {
-               "people": [],
-               "organizations": [],
-               "dates": [],
-               "locations": [],
-               "action_items": []
-           }
-
-    def generate_reply_suggestions(self, email_content: str, subject: str = "") -> Optional[list]:
+    async def adetect_intent(self, email_content: str, subject: str = "") -> Optional[Dict]:
         if not self.llm:
             return None
 
         try:
-            prompt = ChatPromptTemplate.from_messages([
-                ("system", """Generate 3 quick reply options for this email.
-                 Return JSON array with objects containing:
-                 - text: the reply text (1-2 sectences)
-                 - tone: one of [Professional, friendly, brief]
-                 
-                 Return ONLY valid JSON array."""),
-                 ("user", "Subject: {subject}\n\nContent:\n{content}")
-            ])
-            chain = prompt | self.llm | JsonOutputParser()   
+            return await self._ainvoke("intent", {
+                "subject": subject,
+                "content": prompt_preparer.prepare(email_content, "intent")
+            })
 
-            content = email_content[:2000]
+        except Exception as e:
+            logger.error(f"Intent detection error: {e}")
+            return dict(DEFAULT_INTENT)
 
-            result = chain.invoke({
-                "subject": subject, 
-                "content": content
+    async def adetect_intents(self, emails: List[Dict]) -> List[Optional[Dict]]:
+        """Intent and priority for several emails, packed into as few requests as the batch limits allow.
+
+        Items missing or invalid in a batch response are retried one by one;
+        None marks an email whose individual retry failed too.
+        """
+        if not self.llm or not emails:
+            return [None] * len(emails)
+
+        ids = [str(email.get("message_id") or "") for email in emails]
+        if "" in ids or len(set(ids)) != len(ids):
+            ids = [f"email-{index + 1}" for index in range(len(emails))]
+        positions = {email_id: index for index, email_id in enumerate(ids)}
+
+        blocks = []
+        batches, current, current_tokens = [], [], 0
+        for index, email in enumerate(emails):
+            content = prompt_preparer.prepare(email.get("body") or "", "intent")
+            blocks.append(f"<email id=\"{ids[index]}\">\nSubject: {email.get('subject') or ''}\n\n{content}\n</email>")
+            tokens = count_tokens(blocks[-1])
+
+            if current and (len(current) >= settings.AI_INTENT_BATCH_SIZE or current_tokens + tokens > settings.AI_INTENT_BATCH_TOKEN_BUDGET):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(index)
+            current_tokens += tokens
+        batches.append(current)
+
+        results: List[Optional[Dict]] = [None] * len(emails)
+
+        async def run_batch(indices: List[int]):
+            if len(indices) < 2:
+                return
+            try:
+                raw = await self._ainvoke("intent_batch", {"emails": "\n\n".join(blocks[index] for index in indices)})
+            except Exception as e:
+                logger.error(f"Batch intent detection error for {len(indices)} emails: {e}")
+                return
+
+            if not isinstance(raw, list):
+                logger.error(f"Batch intent detection returned {type(raw).__name__}, expected JSON array")
+                return
+
+            for item in raw:
+                index = positions.get(str(item.get("id"))) if isinstance(item, dict) else None
+                if index not in indices:
+                    continue
+                try:
+                    results[index] = IntentAnalysis(**item).model_dump()
+                except (TypeError, ValidationError):
+                    continue
+
+        async def retry(index: int) -> Optional[Dict]:
+            with self.track_usage() as usage:
+                fragment = await self.adetect_intent(emails[index].get("body") or "", emails[index].get("subject") or "")
+            return None if usage.errors else fragment
+
+        await asyncio.gather(*(run_batch(indices) for indices in batches))
+
+        failed = [index for index, result in enumerate(results) if result is None]
+        if failed:
+            logger.info(f"Retrying intent detection individually for {len(failed)} of {len(emails)} emails")
+            for index, fragment in zip(failed, await asyncio.gather(*(retry(index) for index in failed))):
+                results[index] = fragment
+
+        return results
+
+    def extract_entities(self, email_content: str) -> Optional[Dict]:
+        if not self.llm:
+            return None
+        try:
+            return self._invoke("entities", {
+                "content": prompt_preparer.prepare(email_content, "entities")
             })
+        except Exception as e:
+            logger.error(f"Entity extraction error: {e}")
+            return {key: [] for key in DEFAULT_ENTITIES}
 
-            return result
+    async def aextract_entities(self, email_content: str) -> Optional[Dict]:
+        if not self.llm:
+            return None
+        try:
+            return await self._ainvoke("entities", {
+                "content": prompt_preparer.prepare(email_content, "entities")
+            })
+        except Exception as e:
+            logger.error(f"Entity extraction error: {e}")
+            return {key: [] for key in DEFAULT_ENTITIES}
+
+    def generate_reply_suggestions(self, email_content: str, subject: str = "", priority: Optional[str] = None) -> Optional[list]:
+        if not self.llm:
+            return None
+
+        try:
+            return self._invoke("replies", {
+                "subject": subject, 
+                "content": prompt_preparer.prepare(email_content, "replies")
+            }, priority)
         
         except Exception as e:
             logger.error(f"Reply generator error: {e}")
-            return []
-        
-llm_service = LLMService()
\ No newline at end of file
+            return None
+
+    async def agenerate_reply_suggestions(self, email_content: str, subject: str = "", priority: Optional[str] = None) -> Optional[list]:
+        if not self.llm:
+            return None
+
+        try:
+            return await self._ainvoke("replies", {
+                "subject": subject,
+                "content": prompt_preparer.prepare(email_content, "replies")
+            }, priority)
+
+        except Exception as e:
+            logger.error(f"Reply generator error: {e}")
+            return None
+
+    def analyze_email(self, email_content: str, subject: str = "", sections: Iterable[str] = tuple(ANALYSIS_SECTIONS), priority: Optional[str] = None) -> Optional[Dict]:
+        """Run summary, intent, entities and replies as one structured call.
+
+        Sections the model leaves out or gets wrong are recomputed with the
+        single-purpose method, and listed under "fallbacks" in the result.
+        """
+        if not self.llm:
+            return None
+
+        sections = [section for section in ANALYSIS_SECTIONS if section in set(sections)]
+
+        with self.track_usage() as usage:
+            try:
+                raw = self._invoke("analyze", self._analysis_inputs(email_content, subject, sections), priority)
+            except Exception as e:
+                logger.error(f"Full analysis error: {e}")
+                raw = {}
+
+            result, fallbacks = self._validate_analysis(raw, sections)
+
+            if fallbacks:
+                logger.warning(f"Full analysis sections {fallbacks} invalid, falling back")
+            fragment, failed = self.analyze_sections(fallbacks, email_content, subject, priority)
+            result.update(fragment)
+
+        result["fallbacks"] = fallbacks
+        result["failed"] = failed
+        result["usage"] = usage.as_dict()
+        return result
+
+    async def aanalyze_email(self, email_content: str, subject: str = "", sections: Iterable[str] = tuple(ANALYSIS_SECTIONS), priority: Optional[str] = None) -> Optional[Dict]:
+        if not self.llm:
+            return None
+
+        sections = [section for section in ANALYSIS_SECTIONS if section in set(sections)]
+
+        with self.track_usage() as usage:
+            try:
+                raw = await self._ainvoke("analyze", self._analysis_inputs(email_content, subject, sections), priority)
+            except Exception as e:
+                logger.error(f"Full analysis error: {e}")
+                raw = {}
+
+            result, fallbacks = self._validate_analysis(raw, sections)
+
+            if fallbacks:
+                logger.warning(f"Full analysis sections {fallbacks} invalid, falling back")
+            fragment, failed = await self.aanalyze_sections(fallbacks, email_content, subject, priority)
+            result.update(fragment)
+
+        result["fallbacks"] = fallbacks
+        result["failed"] = failed
+        result["usage"] = usage.as_dict()
+        return result
+
+    def _analysis_inputs(self, email_content: str, subject: str, sections: list) -> Dict:
+        return {
+            "sections": "\n".join(ANALYSIS_SECTIONS[section] for section in sections),
+            "subject": subject,
+            "content": prompt_preparer.prepare(email_content, "analyze")
+        }
+
+    def analyze_sections(self, sections: list, email_content: str, subject: str, priority: Optional[str] = None) -> tuple:
+        """Run each section as its own call; returns the merged fragments and the sections left at their defaults."""
+        result, failed = {}, []
+        for section in sections:
+            with self.track_usage() as usage:
+                result.update(self.analyze_section(section, email_content, subject, priority))
+            if usage.errors:
+                failed.append(section)
+        return result, failed
+
+    async def aanalyze_sections(self, sections: list, email_content: str, subject: str, priority: Optional[str] = None) -> tuple:
+        async def run(section: str) -> tuple:
+            with self.track_usage() as usage:
+                fragment = await self.aanalyze_section(section, email_content, subject, priority)
+            return fragment, usage.errors
+
+        result, failed = {}, []
+        for section, (fragment, errors) in zip(sections, await asyncio.gather(*(run(section) for section in sections))):
+            result.update(fragment)
+            if errors:
+                failed.append(section)
+        return result, failed
+
+    def analyze_section(self, section: str, email_content: str, subject: str, priority: Optional[str] = None) -> Dict:
+        if section == "summary":
+            return {"summary": self.summarize_email(email_content, subject, priority)}
+        if section == "intent":
+            return self.detect_intent(email_content, subject) or {}
+        if section == "entities":
+            return {"entities": self.extract_entities(email_content)}
+        return {"reply_suggestions": self.generate_reply_suggestions(email_content, subject, priority)}
+
+    async def aanalyze_section(self, section: str, email_content: str, subject: str, priority: Optional[str] = None) -> Dict:
+        if section == "summary":
+            return {"summary": await self.asummarize_email(email_content, subject, priority)}
+        if section == "intent":
+            return await self.adetect_intent(email_content, subject) or {}
+        if section == "entities":
+            return {"entities": await self.aextract_entities(email_content)}
+        return {"reply_suggestions": await self.agenerate_reply_suggestions(email_content, subject, priority)}
+
+    def _validate_analysis(self, raw: Dict, sections: list) -> tuple:
+        result = {}
+        fallbacks = []
+
+        if not isinstance(raw, dict):
+            logger.error(f"Full analysis returned {type(raw).__name__}, expected JSON object")
+            return result, list(sections)
+
+        for section in sections:
+            try:
+                if section == "summary":
+                    summary = raw["summary"]
+                    if not isinstance(summary, str) or not summary.strip():
+                        raise ValueError("empty summary")
+                    result["summary"] = summary.strip()
+                elif section == "intent":
+                    result.update(IntentAnalysis(**raw).model_dump())
+                elif section == "entities":
+                    result["entities"] = EntityAnalysis(**raw["entities"]).model_dump()
+                elif section == "replies":
+                    replies = raw["reply_suggestions"]
+                    if not isinstance(replies, list) or not replies:
+                        raise ValueError("no reply suggestions")
+                    result["reply_suggestions"] = [ReplySuggestion(**reply).model_dump() for reply in replies]
+            except (KeyError, TypeError, ValueError, ValidationError):
+                fallbacks.append(section)
+
+        return result, fallbacks
+
+llm_service = LLMService()
@@ -0,0 +1,155 @@
+from app.config import settings
+from functools import lru_cache
+from typing import Dict
+from urllib.parse import urlparse
+import re
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Everything after one of these lines is quoted history from earlier messages.
+QUOTE_HEADER_PATTERNS = [
+    # "On <date>, <name> wrote:"; clients may wrap the line only right before "wrote:".
+    re.compile(r"^On [^\n]{0,200}\d[^\n]{0,200}?\s+wrote:\s*$", re.IGNORECASE),
+    re.compile(r"^-{2,}\s*(Original|Forwarded) Message\s*-{2,}", re.IGNORECASE),
+    re.compile(r"^From: .+\n(Sent|Date): ", re.IGNORECASE),
+    re.compile(r"^_{10,}\s*$"),
+]
+
+SIGNATURE_PATTERNS = [
+    re.compile(r"^--\s*$"),
+    re.compile(r"^Sent from my \w+", re.IGNORECASE),
+    re.compile(r"^Get Outlook for \w+", re.IGNORECASE),
+]
+
+DISCLAIMER_PATTERN = re.compile(
+    r"(this (e-?mail|message|communication)( and any (files|attachments)[^.]*)? (is|are|may be|contains?) (strictly )?(confidential|privileged)"
+    r"|if you are not the intended recipient"
+    r"|you are receiving this (e-?mail|message) because"
+    r"|to unsubscribe|unsubscribe from this list|manage (your )?(email )?preferences"
+    r"|please consider the environment before printing)",
+    re.IGNORECASE
+)
+
+URL_PATTERN = re.compile(r"https?://[^\s<>\"')\]]+")
+LONG_URL_LENGTH = 60
+
+
+def _shorten_url(match: re.Match) -> str:
+    url = match.group(0)
+    if len(url) <= LONG_URL_LENGTH:
+        return url
+    return f"[link: {urlparse(url).netloc}]"
+
+
+@lru_cache(maxsize=64)
+def clean_email_text(text: str) -> str:
+    """Strip quoted replies, signatures, legal footers and tracking URLs from an email body."""
+    if not text:
+        return ""
+
+    lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    kept = []
+
+    for index, line in enumerate(lines):
+        stripped = line.strip()
+        two_lines = stripped + "\n" + (lines[index + 1].strip() if index + 1 < len(lines) else "")
+
+        if any(pattern.match(stripped) or pattern.match(two_lines) for pattern in QUOTE_HEADER_PATTERNS):
+            break
+        if any(pattern.match(stripped) for pattern in SIGNATURE_PATTERNS):
+            break
+        if stripped.startswith(">"):
+            continue
+        kept.append(line.rstrip())
+
+    paragraphs = "\n".join(kept).split("\n\n")
+    paragraphs = [p for p in paragraphs if p.strip() and not DISCLAIMER_PATTERN.search(p)]
+
+    cleaned = URL_PATTERN.sub(_shorten_url, "\n\n".join(paragraphs))
+    cleaned = re.sub(r"[ \t]{2,}", " ", cleaned)
+    cleaned = re.sub(r"\n{3,}", "\n\n", cleaned)
+    return cleaned.strip()
+
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(settings.AI_TOKENIZER_ENCODING)
+    except Exception as e:
+        logger.warning(f"tiktoken unavailable, estimating tokens from characters: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding is None:
+        return len(text) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def estimate_tokens(text: str, sample_chars: int) -> int:
+    """count_tokens, extrapolated from the first sample_chars characters of longer text."""
+    if len(text) <= sample_chars:
+        return count_tokens(text)
+    return round(count_tokens(text[:sample_chars]) * len(text) / sample_chars)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[:min(max_tokens * 4, settings.MAX_EMAIL_LENGTH)]
+
+    # Tokens average ~4 characters; an 8x prefix is plenty and bounds tokenizer work on huge bodies.
+    tokens = encoding.encode(text[:max_tokens * 8], disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text[:max_tokens * 8]
+    return encoding.decode(tokens[:max_tokens])
+
+
+class PromptPreparer:
+    """Cleans email bodies and trims them to each operation's token budget."""
+
+    def __init__(self):
+        self.stats_by_operation: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def prepare(self, email_content: str, operation: str) -> str:
+        budget = settings.AI_TOKEN_BUDGETS.get(operation, settings.AI_DEFAULT_TOKEN_BUDGET)
+        cleaned = clean_email_text(email_content or "")
+        prepared = truncate_to_tokens(cleaned, budget)
+
+        # Only for the stats; tokenizing a whole multi-megabyte body would undo the truncation's savings.
+        original_tokens = estimate_tokens(email_content or "", budget * 8)
+        prepared_tokens = count_tokens(prepared)
+
+        with self._lock:
+            stats = self.stats_by_operation.setdefault(operation, {
+                "emails": 0,
+                "original_tokens": 0,
+                "prepared_tokens": 0,
+                "truncated": 0
+            })
+            stats["emails"] += 1
+            stats["original_tokens"] += original_tokens
+            stats["prepared_tokens"] += prepared_tokens
+            stats["truncated"] += int(len(prepared) < len(cleaned))
+
+        return prepared
+
+    def stats(self) -> Dict:
+        with self._lock:
+            result = {}
+            for operation, stats in self.stats_by_operation.items():
+                saved = stats["original_tokens"] - stats["prepared_tokens"]
+                result[operation] = {
+                    **stats,
+                    "tokens_saved": saved,
+                    "avg_tokens_saved_per_email": round(saved / stats["emails"], 1) if stats["emails"] else 0.0
+                }
+            return result
+
+
+prompt_preparer = PromptPreparer()
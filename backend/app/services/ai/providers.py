@@ -0,0 +1,55 @@
+from app.config import settings
+from typing import Callable, Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _create_groq(model: str, max_tokens: int, temperature: float):
+    from langchain_groq import ChatGroq
+
+    if not settings.GROQ_API_KEY:
+        logger.warning("No API key configured")
+        return None
+
+    return ChatGroq(
+        groq_api_key=settings.GROQ_API_KEY,
+        model_name=model,
+        temperature=temperature,
+        max_tokens=max_tokens
+    )
+
+
+def _create_fake(model: str, max_tokens: int, temperature: float):
+    from app.services.ai.fake_llm import FakeChatModel
+
+    return FakeChatModel(
+        model_name=model,
+        latency_ms=settings.FAKE_LLM_LATENCY_MS,
+        latency_jitter_ms=settings.FAKE_LLM_LATENCY_JITTER_MS,
+        latency_distribution=settings.FAKE_LLM_LATENCY_DISTRIBUTION,
+        tokens_per_second=settings.FAKE_LLM_TOKENS_PER_SECOND,
+        prompt_tokens=settings.FAKE_LLM_PROMPT_TOKENS,
+        completion_tokens=settings.FAKE_LLM_COMPLETION_TOKENS,
+        error_rate=settings.FAKE_LLM_ERROR_RATE,
+        seed=settings.FAKE_LLM_SEED
+    )
+
+
+# LLM_PROVIDER name -> factory(model, max_tokens, temperature) returning a LangChain chat model,
+# or None if the provider is not configured.
+PROVIDERS: Dict[str, Callable] = {
+    "groq": _create_groq,
+    "fake": _create_fake,
+}
+
+
+def register_provider(name: str, factory: Callable):
+    PROVIDERS[name] = factory
+
+
+def create_chat_model(provider: str = None, model: str = None, max_tokens: int = 1024, temperature: float = 0.3) -> Optional[object]:
+    provider = provider or settings.LLM_PROVIDER
+    if provider not in PROVIDERS:
+        raise ValueError(f"Unknown LLM provider '{provider}', expected one of {sorted(PROVIDERS)}")
+    return PROVIDERS[provider](model or settings.AI_MODEL, max_tokens, temperature)
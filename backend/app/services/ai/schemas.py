@@ -0,0 +1,40 @@
+from pydantic import BaseModel, field_validator
+from typing import List
+
+INTENTS = ["meeting", "follow-up", "information", "urgent", "task", "social"]
+PRIORITIES = ["high", "medium", "low"]
+
+
+class IntentAnalysis(BaseModel):
+    intent: str
+    priority: str
+    reasoning: str = ""
+
+    @field_validator("intent")
+    @classmethod
+    def validate_intent(cls, value: str) -> str:
+        value = value.strip().lower().replace("_", "-")
+        if value not in INTENTS:
+            raise ValueError(f"unknown intent '{value}'")
+        return value
+
+    @field_validator("priority")
+    @classmethod
+    def validate_priority(cls, value: str) -> str:
+        value = value.strip().lower()
+        if value not in PRIORITIES:
+            raise ValueError(f"unknown priority '{value}'")
+        return value
+
+
+class EntityAnalysis(BaseModel):
+    people: List[str] = []
+    organizations: List[str] = []
+    dates: List[str] = []
+    locations: List[str] = []
+    action_items: List[str] = []
+
+
+class ReplySuggestion(BaseModel):
+    text: str
+    tone: str = "professional"
@@ -0,0 +1,128 @@
+from app.redis_client import redis_client
+from app.config import settings
+from typing import Any, Awaitable, Callable, Dict
+import asyncio
+import concurrent.futures
+import threading
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Delete the lock only if this worker still owns it.
+RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class SingleFlight:
+    """Lets one caller compute a key while concurrent callers wait for its result.
+
+    Callers in this process share a future. Other workers find a short-lived
+    Redis lock and poll for the result the owner publishes; if it does not
+    appear within AI_SINGLE_FLIGHT_WAIT_SECONDS they compute it themselves.
+    """
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self.cache = redis_client
+        self._inflight: Dict[str, concurrent.futures.Future] = {}
+        self._lock = threading.Lock()
+        self.counters = {"computed": 0, "coalesced": 0, "remote_results": 0, "wait_timeouts": 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def in_flight(self, key: str) -> bool:
+        with self._lock:
+            return key in self._inflight
+
+    async def run(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = concurrent.futures.Future()
+
+        if not owner:
+            self._count("coalesced")
+            return await asyncio.wrap_future(future)
+
+        try:
+            result = await self._run_across_workers(key, compute)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def _run_across_workers(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        lock_key = f"singleflight:{self.namespace}:lock:{key}"
+        result_key = f"singleflight:{self.namespace}:result:{key}"
+        token = uuid.uuid4().hex
+
+        result = await asyncio.to_thread(self.cache.get, result_key)
+        if result is not None:
+            self._count("remote_results")
+            return result
+
+        if await asyncio.to_thread(self._acquire, lock_key, token):
+            try:
+                return await self._compute_and_publish(result_key, compute)
+            finally:
+                await asyncio.to_thread(self._release, lock_key, token)
+
+        deadline = time.monotonic() + settings.AI_SINGLE_FLIGHT_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            await asyncio.sleep(settings.AI_SINGLE_FLIGHT_POLL_SECONDS)
+
+            result = await asyncio.to_thread(self.cache.get, result_key)
+            if result is not None:
+                self._count("remote_results")
+                return result
+
+            if not await asyncio.to_thread(self._locked, lock_key):
+                # The owner gave up without publishing a result.
+                break
+        else:
+            self._count("wait_timeouts")
+            logger.warning(f"Timed out waiting for another worker to finish {key}, computing it here")
+
+        return await self._compute_and_publish(result_key, compute)
+
+    async def _compute_and_publish(self, result_key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        self._count("computed")
+        result = await compute()
+        await asyncio.to_thread(self.cache.set, result_key, result, settings.AI_SINGLE_FLIGHT_LOCK_SECONDS)
+        return result
+
+    def _acquire(self, lock_key: str, token: str) -> bool:
+        try:
+            return bool(self.cache.redis.set(lock_key, token, nx=True, ex=settings.AI_SINGLE_FLIGHT_LOCK_SECONDS))
+        except Exception as e:
+            logger.error(f"Single-flight lock error, computing without it: {e}")
+            return True
+
+    def _release(self, lock_key: str, token: str):
+        try:
+            self.cache.redis.eval(RELEASE_SCRIPT, 1, lock_key, token)
+        except Exception as e:
+            logger.error(f"Single-flight unlock error: {e}")
+
+    def _locked(self, lock_key: str) -> bool:
+        try:
+            return bool(self.cache.redis.exists(lock_key))
+        except Exception:
+            return False
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {**self.counters, "in_flight": len(self._inflight)}
@@ -1,5 +1,4 @@
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+from app.services.google_clients import google_clients
 from datetime import datetime, timedelta
 from dateutil import parser
 import pytz
@@ -15,19 +14,14 @@ class CalendarService:
     def __init__(self):
         self.service = None
     
-    def initialize_service(self, access_token: str, refresh_token: str = None):
+    def initialize_service(self, access_token: str, refresh_token: str = None, user_id: int = None, token_expiry=None):
         try:
-            from app.config import settings
-            
-            credentials = Credentials(
-                token=access_token,
+            self.service = google_clients.get(
+                'calendar', 'v3', access_token,
                 refresh_token=refresh_token,
-                token_uri="https://oauth2.googleapis.com/token",
-                client_id=settings.GOOGLE_CLIENT_ID,
-                client_secret=settings.GOOGLE_CLIENT_SECRET
+                token_expiry=token_expiry,
+                user_id=user_id
             )
-            
-            self.service = build('calendar', 'v3', credentials=credentials)
             logger.info("Calendar service initialized")
             return True
         except Exception as e:
@@ -1,25 +1,26 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from app.models.models import Email, User
+from sqlalchemy import false, func, insert as sa_insert, tuple_
+from sqlalchemy.exc import IntegrityError
+from app.models.models import Email, SyncState, User, UserEmailStats
 from app.services.ai.email_processor import email_processor
+from app.services.ai.embedding_classifier import embedding_classifier
+from app.services.ai.heuristics import heuristic_classifier
+from app.config import settings
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict
+from functools import partial
+from types import SimpleNamespace
+from typing import List, Dict, Optional, Tuple
+import base64
+import json
+import threading
+import time
 import logging
 
 logger = logging.getLogger(__name__)
 
-def save_email_with_ai_analysis(db: Session, user_id: int, email_data: Dict, user_access_token: str = None) -> Email:
-    existing = db.query(Email).filter(
-        Email.message_id == email_data.get("message_id")
-    ).first()
-
-    if existing:
-        logger.info(f"Email {email_data.get('message_id')} already exists")
-        return existing
-    
-    ai_results = email_processor.process_email(email_data, send_notification=True, user_access_token=user_access_token)
-    
-    email = Email(
+def _email_values(user_id: int, email_data: Dict, ai_results: Dict) -> Dict:
+    return dict(
         user_id=user_id,
         message_id=email_data.get("message_id"),
         thread_id=email_data.get("thread_id"),
@@ -33,88 +34,736 @@ def save_email_with_ai_analysis(db: Session, user_id: int, email_data: Dict, use
         priority=ai_results.get("priority"),
         entities=ai_results.get("entities"),
         reply_suggestions=ai_results.get("reply_suggestions"),
-        is_processed=True,
-        processed_at=datetime.utcnow(),
+        classified_by=ai_results.get("classified_by"),
+        is_processed=bool(ai_results.get("processed")),
+        processed_at=datetime.utcnow() if ai_results.get("processed") else None,
         
         # Metadata
+        # Same rule as apply_label_changes, so read mail is not stored as unread.
+        is_read="UNREAD" not in (email_data.get("labels") or []),
         is_important=(ai_results.get("priority") == "high"),
-        received_at=datetime.utcnow()
+        labels=",".join(email_data.get("labels") or []) or None,
+        received_at=email_data.get("received_at") or datetime.utcnow()
     )
 
+
+def save_email_with_ai_analysis(db: Session, user_id: int, email_data: Dict, user_access_token: str = None, ai_results: Dict = None, send_notification: bool = True) -> Email:
+    existing = db.query(Email).filter(
+        Email.message_id == email_data.get("message_id")
+    ).first()
+
+    if existing:
+        logger.info(f"Email {email_data.get('message_id')} already exists")
+        return existing
+    
+    if not ai_results or not ai_results.get("processed"):
+        ai_results = email_processor.process_email(email_data, send_notification=send_notification, user_access_token=user_access_token)
+
+    return _save_email_row(db, user_id, email_data, ai_results)
+
+
+def _save_email_row(db: Session, user_id: int, email_data: Dict, ai_results: Dict) -> Email:
+    """Insert one email with ai_results as they are; unprocessed emails stay is_processed=False."""
+    email = Email(**_email_values(user_id, email_data, ai_results))
+
     db.add(email)
+    update_email_stats(db, user_id, added=[_stats_key(email)])
     db.commit()
     db.refresh(email)
 
+    if _indexable(ai_results):
+        embedding_classifier.add(email.id, email.subject, email_data.get("body"), email.intent, email.priority)
+
     logger.info(f"save email {email.message_id} with AI analysis")
     return email
 
 
+def _indexable(ai_results: Dict) -> bool:
+    """LLM labels the kNN classifier may learn from; sections that fell back to defaults would teach it wrong ones."""
+    return ai_results.get("classified_by") == "llm" and not ai_results.get("failed_sections")
+
+
+def ensure_reply_suggestions(db: Session, email: Email) -> List:
+    """Generate and store reply suggestions the first time an email is opened."""
+    if email.reply_suggestions is not None:
+        return email.reply_suggestions
+
+    replies = email_processor.get_reply_suggestions({
+        "subject": email.subject,
+        "body": email.body_text,
+        "priority": email.priority
+    })
+
+    if replies is None:
+        return []
+
+    email.reply_suggestions = replies
+    db.commit()
+
+    logger.info(f"Generated reply suggestions for email {email.message_id}")
+    return replies
+
+
+def triage_results(email_data: Dict) -> Dict:
+    """AI results for an email from its heuristic triage (email_data["triage"]), without the LLM."""
+    triage = email_data["triage"]
+    return {
+        "processed": True,
+        "summary": email_data.get("snippet") or None,
+        "intent": triage["intent"],
+        "priority": triage["priority"],
+        "entities": None,
+        "reply_suggestions": [],
+        "classified_by": "heuristic"
+    }
+
+
+def analyse_emails(emails: List[Dict], send_notifications: bool = True) -> Dict[str, Dict]:
+    """AI results by message_id. Emails triaged from metadata alone keep their heuristic result; the rest share batched LLM requests."""
+    ai_results = {
+        email_data["message_id"]: triage_results(email_data)
+        for email_data in emails if email_data.get("body") is None and email_data.get("triage")
+    }
+    pending = [email_data for email_data in emails if email_data["message_id"] not in ai_results]
+
+    if pending:
+        for email_data, results in zip(pending, email_processor.batch_process_emails(pending, send_notifications=send_notifications)):
+            ai_results[email_data["message_id"]] = results
+    return ai_results
+
+
+def fetch_for_analysis(token: str, message_ids: List[str], user=None, throttle=None) -> List[Dict]:
+    """Fetch messages in GMAIL_FETCH_MODE.
+
+    two_phase downloads metadata for every message first and full bodies only
+    for mail the heuristics cannot triage. Triaged mail is stored without a
+    body, which is fetched when the email is opened.
+    """
+    from app.services.gmail_service import fetch_messages
+
+    if settings.GMAIL_FETCH_MODE != "two_phase":
+        return fetch_messages(token, message_ids, user=user, throttle=throttle)
+
+    emails = fetch_messages(token, message_ids, user=user, throttle=throttle, format="metadata")
+    for email_data in emails:
+        email_data["triage"] = heuristic_classifier.triage({**email_data, "body": email_data.get("snippet")})
+
+    need_body = [email_data["message_id"] for email_data in emails if email_data["triage"] is None]
+    bodies = {
+        email_data["message_id"]: email_data
+        for email_data in (fetch_messages(token, need_body, user=user, throttle=throttle) if need_body else [])
+    }
+
+    # As in full mode, messages whose full fetch failed are left out.
+    return [
+        bodies.get(email_data["message_id"], email_data) for email_data in emails
+        if email_data["triage"] or email_data["message_id"] in bodies
+    ]
+
+
+def ensure_email_body(db: Session, email: Email):
+    """Fetch and store the body of an email that was saved from its metadata only."""
+    if email.body_text is not None:
+        return email.body_text
+
+    user = email.user
+    if not user or not user.google_access_token:
+        return None
+
+    from app.services.gmail_service import fetch_messages
+
+    try:
+        fetched = fetch_messages(user.google_access_token, [email.message_id], user=user)
+    except Exception as e:
+        logger.error(f"Failed to fetch body of email {email.message_id}: {e}")
+        return None
+
+    if not fetched:
+        return None
+
+    email.body_text = fetched[0]["body"]
+    db.commit()
+
+    logger.info(f"Fetched body of email {email.message_id} on demand")
+    return email.body_text
+
+
+def _retry_unprocessed(emails: List[Dict], ai_results: Dict[str, Dict], send_notifications: bool = True) -> Dict[str, Dict]:
+    """Give emails the batch could not analyse a second, individual attempt.
+
+    Emails that fail again keep {"processed": False} and are still saved, so a later pass can reprocess them.
+    """
+    for email_data in emails:
+        message_id = email_data["message_id"]
+        if ai_results[message_id].get("processed"):
+            continue
+        try:
+            ai_results[message_id] = email_processor.process_email(email_data, send_notification=send_notifications)
+        except Exception as e:
+            logger.error(f"Error analysing email {message_id}: {e}")
+            ai_results[message_id] = {"processed": False}
+    return ai_results
+
+
+def _conflict_insert(db: Session, model):
+    """The dialect's INSERT with ON CONFLICT support, or None where it has none."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert(model)
+
+
+def _insert_ignoring_duplicates(db: Session, rows: List[Dict]):
+    """One multi-row INSERT ... ON CONFLICT (message_id) DO NOTHING, returning (id, message_id) of inserted rows."""
+    statement = _conflict_insert(db, Email)
+    if statement is None:
+        # Rows are deduplicated before insert; only a concurrent insert can still conflict.
+        return sa_insert(Email).values(rows).returning(Email.id, Email.message_id)
+
+    return statement.values(rows).on_conflict_do_nothing(index_elements=["message_id"]).returning(Email.id, Email.message_id)
+
+
+def save_emails_batch(db: Session, user_id: int, emails: List[Dict], ai_results: Dict[str, Dict]) -> int:
+    """Insert analysed emails with one multi-row INSERT per EMAIL_INSERT_CHUNK_SIZE rows and a single commit.
+
+    Emails stored meanwhile (e.g. by a concurrent sync) are skipped by ON CONFLICT.
+    Returns how many were inserted.
+    """
+    if not emails:
+        return 0
+
+    rows = {
+        email_data["message_id"]: _email_values(user_id, email_data, ai_results[email_data["message_id"]])
+        for email_data in emails
+    }
+    values = list(rows.values())
+    chunk_size = max(1, settings.EMAIL_INSERT_CHUNK_SIZE)
+    inserted = []
+
+    try:
+        for start in range(0, len(values), chunk_size):
+            inserted.extend(db.execute(_insert_ignoring_duplicates(db, values[start:start + chunk_size])).all())
+        update_email_stats(db, user_id, added=[_stats_key(rows[message_id]) for _, message_id in inserted])
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Bulk insert of {len(values)} emails failed, saving one at a time: {e}")
+        saved = 0
+        for email_data in emails:
+            try:
+                # The results are final here (e.g. {} for --no-ai imports), so insert without analysing again.
+                if db.query(Email.id).filter(Email.message_id == email_data["message_id"]).first():
+                    continue
+                _save_email_row(db, user_id, email_data, ai_results[email_data["message_id"]])
+                saved += 1
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Error saving email {email_data.get('message_id')}: {e}")
+        return saved
+
+    for email_id, message_id in inserted:
+        row = rows[message_id]
+        if _indexable(ai_results[message_id]):
+            embedding_classifier.add(email_id, row["subject"], row["body_text"], row["intent"], row["priority"])
+
+    logger.info(f"Saved {len(inserted)} of {len(values)} emails for user {user_id}")
+    return len(inserted)
+
+
+def save_fetched_emails(db: Session, user: User, gmail_emails: List[Dict]) -> List[Email]:
+    """Store fetched emails with set-based queries: one lookup of known ids, analysis of new mail only, bulk insert."""
+    message_ids = list(dict.fromkeys(email_data.get("message_id") for email_data in gmail_emails))
+    existing = {
+        message_id for (message_id,) in db.query(Email.message_id).filter(
+            Email.message_id.in_(message_ids)
+        )
+    }
+    new_emails = list({
+        email_data["message_id"]: email_data for email_data in gmail_emails if email_data.get("message_id") not in existing
+    }.values())
+
+    ai_results = _retry_unprocessed(new_emails, analyse_emails(new_emails))
+    save_emails_batch(db, user.id, new_emails, ai_results)
+
+    stored = {
+        email.message_id: email for email in db.query(Email).filter(Email.message_id.in_(message_ids))
+    }
+    return [stored[message_id] for message_id in message_ids if message_id in stored]
+
+
 def fetch_and_save_emails(db: Session, user: User, max_results: int = 10) -> List[Email]:
     from app.services.gmail_service import fetch_emails
 
     if not user.google_access_token:
         raise ValueError("User not authenticated with Gmail")
     
-    gmail_emails = fetch_emails(user.google_access_token, max_results)
+    return save_fetched_emails(db, user, fetch_emails(user.google_access_token, max_results, user=user))
 
-    saved_emails = []
 
-    for email_data in gmail_emails:
-        try:
-            email = save_email_with_ai_analysis(db, user.id, email_data)
-            saved_emails.append(email)
+def apply_label_changes(db: Session, user_id: int, label_changes: Dict[str, List[str]]) -> int:
+    if not label_changes:
+        return 0
 
-        except Exception as e:
-            logger.error(f"Error saving email: {e}")
-            continue
-    return saved_emails
+    emails = db.query(Email).filter(
+        Email.user_id == user_id,
+        Email.message_id.in_(list(label_changes))
+    ).all()
 
-def get_user_emails(
+    before = [_stats_key(email) for email in emails]
+    for email in emails:
+        labels = label_changes[email.message_id]
+        email.labels = ",".join(labels) or None
+        email.is_read = "UNREAD" not in labels
+
+    update_email_stats(db, user_id, added=[_stats_key(email) for email in emails], removed=before)
+    db.commit()
+    return len(emails)
+
+
+def get_sync_state(db: Session, user_id: int) -> SyncState:
+    state = db.query(SyncState).filter(SyncState.user_id == user_id).first()
+    if not state:
+        state = SyncState(user_id=user_id)
+        db.add(state)
+    return state
+
+
+def sync_mailbox(db: Session, user: User, max_results: int = 10, full: bool = False) -> Dict:
+    """Sync the mailbox from the user's stored Gmail historyId.
+
+    Without a cursor (first sync, or full=True) the latest max_results emails
+    are fetched. When Gmail no longer has the stored historyId the sync falls
+    back to a full resync of at most GMAIL_RESYNC_MAX_MESSAGES emails.
+    """
+    from app.services.gmail_service import (
+        HistoryExpiredError, get_history_id, list_history_changes, list_message_ids
+    )
+    from app.services.google_clients import google_clients
+
+    if not user.google_access_token:
+        raise ValueError("User not authenticated with Gmail")
+
+    token = user.google_access_token
+    started = time.perf_counter()
+    # Counts responses received by worker threads too, e.g. the parallel fetch fallback.
+    with google_clients.measure_transfer() as transfer:
+        state = get_sync_state(db, user.id)
+        mode = "full" if full or not state.history_id else "incremental"
+
+        if mode == "incremental":
+            try:
+                changes = list_history_changes(token, state.history_id, user=user)
+            except HistoryExpiredError as e:
+                logger.warning(f"Gmail history expired for user {user.id}, running a full resync: {e}")
+                mode = "resync"
+
+        if mode == "incremental":
+            # Label changes can also bring a message we have never stored into the inbox.
+            candidates = changes["added"] + [
+                message_id for message_id, labels in changes["label_changes"].items() if "INBOX" in labels
+            ]
+            known = {
+                message_id for (message_id,) in db.query(Email.message_id).filter(
+                    Email.message_id.in_(candidates)
+                )
+            }
+            new_ids = [message_id for message_id in dict.fromkeys(candidates) if message_id not in known]
+
+            fetched = fetch_for_analysis(token, new_ids, user=user) if new_ids else []
+            emails = save_fetched_emails(db, user, fetched) if fetched else []
+            label_updates = apply_label_changes(db, user.id, changes["label_changes"])
+            history_id = changes["history_id"]
+        else:
+            # Read the cursor before listing so changes made during the sync are picked up next time.
+            history_id = get_history_id(token, user=user)
+            limit = max_results if mode == "full" else max(max_results, settings.GMAIL_RESYNC_MAX_MESSAGES)
+            fetched = fetch_for_analysis(token, list_message_ids(token, limit, user=user), user=user)
+            emails = save_fetched_emails(db, user, fetched)
+            label_updates = 0
+            state.last_full_sync_at = datetime.utcnow()
+
+        state.history_id = history_id
+        state.last_synced_at = datetime.utcnow()
+        db.commit()
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    bytes_received = transfer.bytes
+    # From the fetched data: body_text is deferred, so reading it from the saved emails costs a query each.
+    metadata_only = sum(1 for email_data in fetched if email_data.get("body") is None)
+
+    logger.info(
+        f"{mode} sync for user {user.id}: {len(emails)} emails ({metadata_only} metadata only), "
+        f"{label_updates} label updates, {bytes_received} bytes in {elapsed_ms:.0f}ms, historyId {history_id}"
+    )
+    return {
+        "mode": mode,
+        "fetch_mode": settings.GMAIL_FETCH_MODE,
+        "emails": emails,
+        "label_updates": label_updates,
+        "metadata_only": metadata_only,
+        "bytes_received": bytes_received,
+        "elapsed_ms": round(elapsed_ms, 1),
+        "history_id": history_id
+    }
+
+_active_backfills = set()
+_active_backfills_lock = threading.Lock()
+
+
+def backfill_running(user_id: int) -> bool:
+    with _active_backfills_lock:
+        return user_id in _active_backfills
+
+
+def _backfill_chunk(token: str, credentials_user, throttle, message_ids: List[str]) -> List[tuple]:
+    emails = fetch_for_analysis(token, message_ids, user=credentials_user, throttle=throttle)
+    ai_results = _retry_unprocessed(emails, analyse_emails(emails, send_notifications=False), send_notifications=False)
+    return [(email_data, ai_results[email_data["message_id"]]) for email_data in emails]
+
+
+def run_backfill(db: Session, user: User, restart: bool = False, max_messages: Optional[int] = None) -> SyncState:
+    """Import the whole mailbox page by page, checkpointing after every page.
+
+    Each page of ids is split into BACKFILL_CHUNK_SIZE chunks that
+    BACKFILL_WORKERS threads fetch and analyse; rows are written from this
+    thread. Running it again after a crash resumes from the last finished page.
+    """
+    if not user.google_access_token:
+        raise ValueError("User not authenticated with Gmail")
+
+    with _active_backfills_lock:
+        if user.id in _active_backfills:
+            raise RuntimeError(f"Backfill already running for user {user.id}")
+        _active_backfills.add(user.id)
+
+    try:
+        return _run_backfill(db, user, restart, max_messages or settings.BACKFILL_MAX_MESSAGES)
+    finally:
+        with _active_backfills_lock:
+            _active_backfills.discard(user.id)
+
+
+def _run_backfill(db: Session, user: User, restart: bool, max_messages: Optional[int]) -> SyncState:
+    from app.services.gmail_service import QuotaThrottle, get_history_id, iter_message_pages
+
+    state = get_sync_state(db, user.id)
+    if state.backfill_status == "completed" and not restart:
+        return state
+
+    if restart or not state.backfill_status:
+        state.backfill_page_token = None
+        state.backfill_pages = 0
+        state.backfill_processed = 0
+        state.backfill_saved = 0
+        state.backfill_started_at = datetime.utcnow()
+        state.backfill_finished_at = None
+    else:
+        logger.info(f"Resuming backfill for user {user.id} after {state.backfill_processed} messages")
+
+    token = user.google_access_token
+    # Worker threads must not touch the session-bound User row.
+    credentials_user = SimpleNamespace(id=user.id, google_refresh_token=user.google_refresh_token, token_expiry=user.token_expiry)
+
+    if not state.history_id:
+        # Mail arriving while the backfill runs is picked up by the next incremental sync.
+        state.history_id = get_history_id(token, user=credentials_user)
+
+    state.backfill_status = "running"
+    state.backfill_error = None
+    db.commit()
+
+    throttle = QuotaThrottle(settings.GMAIL_QUOTA_UNITS_PER_SECOND)
+    chunk_size = max(1, settings.BACKFILL_CHUNK_SIZE)
+    fetch_chunk = partial(_backfill_chunk, token, credentials_user, throttle)
+    status = "completed"
+
+    try:
+        with ThreadPoolExecutor(max_workers=settings.BACKFILL_WORKERS) as executor:
+            pages = iter_message_pages(
+                token, state.backfill_page_token, settings.BACKFILL_PAGE_SIZE, user=credentials_user, throttle=throttle
+            )
+            for message_ids, estimate, next_page_token in pages:
+                known = {
+                    message_id for (message_id,) in db.query(Email.message_id).filter(
+                        Email.message_id.in_(message_ids)
+                    )
+                }
+                new_ids = [message_id for message_id in message_ids if message_id not in known]
+                chunks = [new_ids[start:start + chunk_size] for start in range(0, len(new_ids), chunk_size)]
+
+                saved = 0
+                fetched_ids = []
+                for results in executor.map(fetch_chunk, chunks):
+                    fetched_ids.extend(email_data["message_id"] for email_data, _ in results)
+                    saved += save_emails_batch(
+                        db, user.id, [email_data for email_data, _ in results],
+                        {email_data["message_id"]: ai_results for email_data, ai_results in results}
+                    )
+
+                # The checkpoint only moves past a page once all of its messages are stored;
+                # fewer inserts can also mean a concurrent sync stored some, so check the table.
+                if saved < len(fetched_ids):
+                    stored = {
+                        message_id for (message_id,) in db.query(Email.message_id).filter(
+                            Email.message_id.in_(fetched_ids)
+                        )
+                    }
+                    missing = len(set(fetched_ids) - stored)
+                    if missing:
+                        state.backfill_saved = (state.backfill_saved or 0) + saved
+                        db.commit()
+                        raise RuntimeError(f"{missing} messages on page {(state.backfill_pages or 0) + 1} could not be saved")
+
+                state.backfill_page_token = next_page_token
+                state.backfill_pages = (state.backfill_pages or 0) + 1
+                state.backfill_processed = (state.backfill_processed or 0) + len(message_ids)
+                state.backfill_saved = (state.backfill_saved or 0) + saved
+                state.backfill_total_estimate = estimate
+                db.commit()
+
+                logger.info(f"Backfill user {user.id}: page {state.backfill_pages}, {state.backfill_processed} messages, {state.backfill_saved} saved")
+
+                if next_page_token and max_messages and state.backfill_processed >= max_messages:
+                    status = "paused"
+                    break
+
+        state.backfill_status = status
+        state.backfill_finished_at = datetime.utcnow() if status == "completed" else None
+        db.commit()
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Backfill failed for user {user.id}: {e}")
+        state.backfill_status = "failed"
+        state.backfill_error = str(e)
+        db.commit()
+
+    return state
+
+
+def run_backfill_job(user_id: int, restart: bool = False, max_messages: Optional[int] = None):
+    """Background task entry point; runs the backfill with its own session."""
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.id == user_id).first()
+        if user:
+            run_backfill(db, user, restart=restart, max_messages=max_messages)
+    except Exception as e:
+        logger.error(f"Backfill job for user {user_id} failed: {e}")
+    finally:
+        db.close()
+
+
+def get_backfill_progress(db: Session, user_id: int) -> Dict:
+    state = db.query(SyncState).filter(SyncState.user_id == user_id).first()
+    if not state or not state.backfill_status:
+        return {"status": "not_started", "running": backfill_running(user_id)}
+
+    elapsed = None
+    if state.backfill_started_at:
+        end = state.backfill_finished_at or datetime.utcnow()
+        elapsed = (end.replace(tzinfo=None) - state.backfill_started_at.replace(tzinfo=None)).total_seconds()
+
+    return {
+        "status": state.backfill_status,
+        "running": backfill_running(user_id),
+        "pages": state.backfill_pages,
+        "processed": state.backfill_processed,
+        "saved": state.backfill_saved,
+        "total_estimate": state.backfill_total_estimate,
+        "started_at": state.backfill_started_at,
+        "finished_at": state.backfill_finished_at,
+        "elapsed_seconds": round(elapsed, 1) if elapsed is not None else None,
+        "messages_per_second": round(state.backfill_processed / elapsed, 2) if elapsed and state.backfill_processed else None,
+        "error": state.backfill_error
+    }
+
+
+# What an email list shows; bodies, entities and reply suggestions are only needed for a single email.
+EMAIL_LIST_COLUMNS = (
+    Email.id, Email.message_id, Email.subject, Email.sender, Email.summary, Email.intent, Email.priority,
+    Email.is_read, Email.is_important, Email.received_at, Email.processed_at
+)
+
+
+def encode_cursor(email) -> str:
+    """Opaque position of an email in a newest-first listing."""
+    data = json.dumps([email.received_at.isoformat(), email.id]).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        received_at, email_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(received_at), int(email_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def get_user_emails_page(
     db: Session,
     user_id: int,
-    skip: int = 0,
     limit: int = 20,
     priority: str = None,
-    intent: str = None
-) -> List[Email]:    
-    query = db.query(Email).filter(Email.user_id == user_id)
-    
+    intent: str = None,
+    unread: bool = False,
+    cursor: str = None,
+    skip: int = 0,
+    columns: tuple = None
+) -> Tuple[List, Optional[str]]:
+    """A page of the user's emails, newest first, and the cursor of the next page (None on the last one).
+
+    Pages continue after the cursor's (received_at, id), so they cost the same at
+    any depth and do not shift when new mail arrives. skip is the older offset
+    paging, kept for compatibility.
+
+    With columns (e.g. EMAIL_LIST_COLUMNS) only those are selected and the page
+    holds read-only rows with the same attribute names instead of Email objects.
+    """
+    if columns:
+        keys = {column.key for column in columns}
+        query = db.query(*columns, *[column for column in (Email.received_at, Email.id) if column.key not in keys])
+    else:
+        query = db.query(Email)
+    query = query.filter(Email.user_id == user_id)
+
     if priority:
         query = query.filter(Email.priority == priority)
-    
+
     if intent:
         query = query.filter(Email.intent == intent)
-    
-    return query.order_by(Email.received_at.desc()).offset(skip).limit(limit).all()
+
+    if unread:
+        # A literal false, so the planner can match the partial unread index.
+        query = query.filter(Email.is_read == false())
+
+    query = query.order_by(Email.received_at.desc(), Email.id.desc())
+
+    if cursor:
+        query = query.filter(tuple_(Email.received_at, Email.id) < decode_cursor(cursor))
+    elif skip:
+        query = query.offset(skip)
+
+    emails = query.limit(limit + 1).all()
+    next_cursor = encode_cursor(emails[limit - 1]) if len(emails) > limit else None
+    return emails[:limit], next_cursor
+
+
+def get_user_emails(
+    db: Session,
+    user_id: int,
+    skip: int = 0,
+    limit: int = 20,
+    priority: str = None,
+    intent: str = None
+) -> List[Email]:    
+    return get_user_emails_page(db, user_id, limit, priority, intent, skip=skip)[0]
+
+
+def mark_email_read(db: Session, email: Email):
+    before = _stats_key(email)
+    email.is_read = True
+    update_email_stats(db, email.user_id, added=[_stats_key(email)], removed=[before])
+    db.commit()
+
+
+def _stats_key(email) -> tuple:
+    """(processed, high priority, unread, intent) of an Email, or of the values it is inserted with."""
+    get = email.get if isinstance(email, dict) else partial(getattr, email)
+    # is_read IS NULL counts as neither read nor unread, as in _count_email_statistics.
+    return bool(get("is_processed")), get("priority") == "high", get("is_read") is False, get("intent")
+
+
+def update_email_stats(db: Session, user_id: int, added: List[tuple] = (), removed: List[tuple] = ()):
+    """Apply emails added and removed (as _stats_key tuples) to the user's counters; the caller commits.
+
+    Changing an email counts as removing its old state and adding the new one.
+    """
+    if not settings.EMAIL_STATS_COUNTERS_ENABLED or not (added or removed):
+        return
+
+    stats = db.query(UserEmailStats).filter(UserEmailStats.user_id == user_id).with_for_update().first()
+    if stats is None:
+        # Count the emails as this transaction sees them, i.e. with this change already applied.
+        # If another transaction (or rebuild_email_stats) creates the row first, apply the change to it instead.
+        db.flush()
+        values = dict(user_id=user_id, **_count_email_statistics(db, user_id))
+        statement = _conflict_insert(db, UserEmailStats)
+        if statement is None:
+            db.execute(sa_insert(UserEmailStats).values(values))
+            return
+        if db.execute(statement.values(values).on_conflict_do_nothing(index_elements=["user_id"])).rowcount:
+            return
+        stats = db.query(UserEmailStats).filter(UserEmailStats.user_id == user_id).with_for_update().first()
+
+    by_intent = dict(stats.by_intent or {})
+    for sign, keys in ((1, added), (-1, removed)):
+        for processed, high_priority, unread, intent in keys:
+            stats.total += sign
+            stats.processed += sign * processed
+            stats.high_priority += sign * high_priority
+            stats.unread += sign * unread
+            if intent:
+                by_intent[intent] = by_intent.get(intent, 0) + sign
+
+    stats.by_intent = {intent: count for intent, count in by_intent.items() if count}
+
+
+def _count_email_statistics(db: Session, user_id: int) -> Dict:
+    """All statistics in one pass over the user's emails."""
+    rows = db.query(
+        Email.intent,
+        func.count(Email.id),
+        func.count(Email.id).filter(Email.is_processed == True),
+        func.count(Email.id).filter(Email.priority == "high"),
+        func.count(Email.id).filter(Email.is_read == False)
+    ).filter(Email.user_id == user_id).group_by(Email.intent).all()
+
+    return {
+        "total": sum(row[1] for row in rows),
+        "processed": sum(row[2] for row in rows),
+        "high_priority": sum(row[3] for row in rows),
+        "unread": sum(row[4] for row in rows),
+        "by_intent": {intent: count for intent, count, *_ in rows if intent}
+    }
+
+
+def rebuild_email_stats(db: Session, user_id: int) -> Dict:
+    """Recount the user's counters from their emails."""
+    counts = _count_email_statistics(db, user_id)
+    stats = db.query(UserEmailStats).filter(UserEmailStats.user_id == user_id).first()
+    if stats is None:
+        stats = UserEmailStats(user_id=user_id)
+        db.add(stats)
+    for name, value in counts.items():
+        setattr(stats, name, value)
+
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another request created the row first.
+        db.rollback()
+    return counts
 
 
 def get_email_statistics(db: Session, user_id: int) -> Dict:
-    from sqlalchemy import func
+    if not settings.EMAIL_STATS_COUNTERS_ENABLED:
+        return _count_email_statistics(db, user_id)
 
-    total = db.query(Email).filter(Email.user_id == user_id).count()
-    processed = db.query(Email).filter(
-        Email.user_id == user_id,
-        Email.is_processed == True
-    ).count()
-    
-    high_priority = db.query(Email).filter(
-        Email.user_id == user_id,
-        Email.priority == "high"
-    ).count()
-    
-    unread = db.query(Email).filter(
-        Email.user_id == user_id,
-        Email.is_read == False
-    ).count()
+    stats = db.query(UserEmailStats).filter(UserEmailStats.user_id == user_id).first()
+    if stats is None:
+        return rebuild_email_stats(db, user_id)
 
-    intents = db.query(Email.intent, func.count(Email.id)).filter(
-        Email.user_id == user_id
-    ).group_by(Email.intent).all()
-    
     return {
-        "total": total,
-        "processed": processed,
-        "high_priority": high_priority,
-        "unread": unread,
-        "by_intent": {intent: count for intent, count in intents if intent}
-    }
\ No newline at end of file
+        "total": stats.total,
+        "processed": stats.processed,
+        "high_priority": stats.high_priority,
+        "unread": stats.unread,
+        "by_intent": dict(stats.by_intent or {})
+    }
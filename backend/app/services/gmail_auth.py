@@ -1,6 +1,5 @@
 from google_auth_oauthlib.flow import Flow
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+from app.services.google_clients import google_clients
 from app.config import settings
 import os
 
@@ -62,6 +61,4 @@ def exchange_code_for_token(code: str):
     }
 
 def get_gmail_service(access_token: str):
-    credentials = Credentials(token=access_token)
-    service = build('gmail', 'v1', credentials=credentials)
-    return service
\ No newline at end of file
+    return google_clients.get('gmail', 'v1', access_token)
\ No newline at end of file
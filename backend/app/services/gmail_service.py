@@ -1,12 +1,195 @@
-from googleapiclient.discovery import build
-from google.oauth2.credentials import Credentials
+from googleapiclient.errors import HttpError
+from app.config import settings
+from app.services.google_clients import google_clients
+from app.services.mime_extractor import extract_body
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import base64
+from typing import Dict, List, Optional
+import contextvars
+import json
+import threading
+import time
+import logging
 from email.mime.text import MIMEText
 
-def fetch_emails(access_token: str, max_results: int = 10):
-    credentials = Credentials(token=access_token)
-    service = build('gmail', 'v1', credentials=credentials)
+logger = logging.getLogger(__name__)
+
+# Headers kept alongside the parsed email for triage (bulk/automated mail detection).
+TRIAGE_HEADERS = ['list-unsubscribe', 'list-id', 'precedence', 'auto-submitted']
+
+# Headers requested in the metadata phase of a two-phase fetch.
+METADATA_HEADERS = ['Subject', 'From', 'To', 'Date', 'List-Unsubscribe', 'List-Id', 'Precedence', 'Auto-Submitted']
+
+# Gmail accepts at most 100 calls per batch request; messages.get and messages.list cost 5 quota units.
+GMAIL_MAX_BATCH_SIZE = 100
+MESSAGES_GET_QUOTA_UNITS = 5
+MESSAGES_LIST_QUOTA_UNITS = 5
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+def build_gmail_service(credentials):
+    return google_clients.build('gmail', 'v1', credentials)
+
+
+def gmail_client(access_token: str, user=None):
+    """The cached Gmail client for this token; pass the User row so its token can be refreshed in the background."""
+    if user is None:
+        return google_clients.client('gmail', 'v1', access_token)
+    return google_clients.client(
+        'gmail', 'v1', access_token,
+        refresh_token=user.google_refresh_token,
+        token_expiry=user.token_expiry,
+        user_id=user.id
+    )
+
+
+class QuotaThrottle:
+    """Spaces out requests so a user stays under Gmail's per-user quota units per second."""
+
+    def __init__(self, units_per_second: float):
+        self.units_per_second = units_per_second
+        self.next_time = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self, units: int):
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_time - now
+            self.next_time = max(now, self.next_time) + units / self.units_per_second
+        if delay > 0:
+            time.sleep(delay)
+
+
+def _chunks(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _is_retryable(error: Exception) -> bool:
+    return isinstance(error, HttpError) and error.resp.status in RETRYABLE_STATUS
+
+
+def _get_request(service, message_id: str, format: str, metadata_headers: Optional[List[str]]):
+    kwargs = {'userId': 'me', 'id': message_id, 'format': format}
+    if metadata_headers:
+        kwargs['metadataHeaders'] = metadata_headers
+    return service.users().messages().get(**kwargs)
+
+
+def _execute_batch(service, message_ids: List[str], format: str, metadata_headers: Optional[List[str]]) -> tuple:
+    fetched, retry = {}, []
+
+    def callback(request_id, response, exception):
+        if exception is None:
+            fetched[request_id] = response
+        elif _is_retryable(exception):
+            retry.append(request_id)
+        else:
+            logger.error(f"Failed to fetch message {request_id}: {exception}")
+
+    batch = service.new_batch_http_request(callback=callback)
+    for message_id in message_ids:
+        batch.add(_get_request(service, message_id, format, metadata_headers), request_id=message_id)
+    batch.execute()
+
+    return fetched, retry
+
+
+def _execute_parallel(credentials, message_ids: List[str], format: str, metadata_headers: Optional[List[str]]) -> tuple:
+    fetched, retry = {}, []
+    local = threading.local()
+
+    def get(message_id):
+        # googleapiclient services are not thread-safe, so each worker builds its own.
+        if not hasattr(local, 'service'):
+            local.service = build_gmail_service(credentials)
+        try:
+            return message_id, _get_request(local.service, message_id, format, metadata_headers).execute(), None
+        except Exception as e:
+            return message_id, None, e
+
+    with ThreadPoolExecutor(max_workers=settings.GMAIL_FETCH_WORKERS) as executor:
+        # Each worker call runs in a copy of this context, so google_clients.measure_transfer counts its bytes.
+        futures = [executor.submit(contextvars.copy_context().run, get, message_id) for message_id in message_ids]
+        for message_id, response, error in (future.result() for future in futures):
+            if error is None:
+                fetched[message_id] = response
+            elif _is_retryable(error):
+                retry.append(message_id)
+            else:
+                logger.error(f"Failed to fetch message {message_id}: {error}")
+
+    return fetched, retry
+
+
+def get_messages(
+    service,
+    message_ids: List[str],
+    credentials=None,
+    format: str = 'full',
+    metadata_headers: Optional[List[str]] = None,
+    throttle: Optional[QuotaThrottle] = None
+) -> List[Dict]:
+    """Fetch messages through Gmail batch requests instead of one round trip each.
+
+    Rate-limited and 5xx items are retried with backoff; other failed items are
+    logged and skipped. If a whole batch fails, its messages are fetched with
+    parallel single requests instead. Results keep the order of message_ids.
+    """
+    throttle = throttle or QuotaThrottle(settings.GMAIL_QUOTA_UNITS_PER_SECOND)
+    batch_size = max(1, min(settings.GMAIL_BATCH_SIZE, GMAIL_MAX_BATCH_SIZE))
+    fetched = {}
+    pending = list(dict.fromkeys(message_ids))
+
+    for attempt in range(settings.GMAIL_BATCH_RETRIES + 1):
+        retry = []
+        for chunk in _chunks(pending, batch_size):
+            throttle.wait(len(chunk) * MESSAGES_GET_QUOTA_UNITS)
+            try:
+                chunk_fetched, chunk_retry = _execute_batch(service, chunk, format, metadata_headers)
+            except Exception as e:
+                if credentials is None:
+                    raise
+                logger.warning(f"Gmail batch of {len(chunk)} failed ({e}), fetching individually")
+                chunk_fetched, chunk_retry = _execute_parallel(credentials, chunk, format, metadata_headers)
+            fetched.update(chunk_fetched)
+            retry.extend(chunk_retry)
+
+        if not retry:
+            break
+        if attempt == settings.GMAIL_BATCH_RETRIES:
+            logger.error(f"Giving up on {len(retry)} messages after {attempt + 1} attempts")
+            break
+
+        logger.warning(f"Retrying {len(retry)} rate-limited messages")
+        time.sleep(settings.GMAIL_RETRY_BACKOFF_SECONDS * 2 ** attempt)
+        pending = retry
+
+    return [fetched[message_id] for message_id in message_ids if message_id in fetched]
+
+
+def parse_message(message: Dict) -> Dict:
+    headers = message['payload']['headers']
+    subject = next((h['value'] for h in headers if h['name'] == 'Subject'), 'No Subject')
+    sender = next((h['value'] for h in headers if h['name'] == 'From'), 'Unknown')
+    date = next((h['value'] for h in headers if h['name'] == 'Date'), '')
+
+    body = extract_body(message['payload'])
+
+    return {
+        'message_id' : message['id'],
+        'thread_id': message['threadId'],
+        'subject': subject,
+        'sender': sender, 
+        'body': body,
+        'snippet': message.get('snippet', ''),
+        'date': date,
+        'labels': message.get('labelIds', []),
+        'headers': {h['name']: h['value'] for h in headers if h['name'].lower() in TRIAGE_HEADERS}
+    }
+
+
+def list_message_ids(access_token: str, max_results: int = 10, user=None) -> List[str]:
+    service = gmail_client(access_token, user).service
 
     results = service.users().messages().list(    
         userId = 'me',
@@ -14,45 +197,129 @@ def fetch_emails(access_token: str, max_results: int = 10):
         labelIds=['INBOX']
     ).execute()
 
-    messages = results.get('messages', [])
-    emails =[]
-
-    for msg in messages:
-        message = service.users().messages().get(
-            userId = 'me',
-            id=msg['id'],
-            format='full'
-        ).execute()
-
-        headers = message['payload']['headers']
-        subject = next((h['value'] for h in headers if h['name'] == 'Subject'), 'No Subject')
-        sender = next((h['value'] for h in headers if h['name'] == 'From'), 'Unknown')
-        date = next((h['value'] for h in headers if h['name'] == 'Date'), '')
-
-        body =''
-        if 'parts' in message['payload']:
-            for part in message['payload']['parts']:
-                if part['mimeType'] == 'text/plain':
-                    body = base64.urlsafe_b64decode(part['body']['data']).decode('utf-8')
-                    break
-            
-        elif 'body' in message['payload']:
-            body = base64.urlsafe_b64decode(message['payload']['body']['data']).decode('utf-8')
-
-        emails.append({
-            'message_id' : message['id'],
-            'thread_id': message['threadId'],
-            'subject': subject,
-            'sender': sender, 
-            'body': body[:500],
-            'date': date
-        })
+    return [msg['id'] for msg in results.get('messages', [])]
+
+
+def fetch_emails(access_token: str, max_results: int = 10, user=None):
+    return fetch_messages(access_token, list_message_ids(access_token, max_results, user), user=user)
+
+class HistoryExpiredError(Exception):
+    """The stored historyId is too old for users.history.list; a full resync is needed."""
+
+
+def get_history_id(access_token: str, user=None) -> str:
+    service = gmail_client(access_token, user).service
+    return service.users().getProfile(userId='me').execute()['historyId']
+
+
+def list_history_changes(access_token: str, start_history_id: str, user=None) -> Dict:
+    """Inbox messages added and messages whose labels changed since start_history_id.
+
+    label_changes maps message ids to their current labels. history_id is the
+    cursor to store for the next sync.
+    """
+    service = gmail_client(access_token, user).service
+    added, label_changes = [], {}
+    history_id = start_history_id
+    page_token = None
 
+    while True:
+        kwargs = {
+            'userId': 'me',
+            'startHistoryId': start_history_id,
+            'historyTypes': ['messageAdded', 'labelAdded', 'labelRemoved'],
+            'maxResults': 500
+        }
+        if page_token:
+            kwargs['pageToken'] = page_token
+
+        try:
+            response = service.users().history().list(**kwargs).execute()
+        except HttpError as e:
+            if e.resp.status == 404:
+                raise HistoryExpiredError(f"historyId {start_history_id} is no longer available") from e
+            raise
+
+        for record in response.get('history', []):
+            for item in record.get('messagesAdded', []):
+                if 'INBOX' in item['message'].get('labelIds', ['INBOX']):
+                    added.append(item['message']['id'])
+            for item in record.get('labelsAdded', []) + record.get('labelsRemoved', []):
+                label_changes[item['message']['id']] = item['message'].get('labelIds', [])
+
+        history_id = response.get('historyId', history_id)
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            break
+
+    return {
+        'added': list(dict.fromkeys(added)),
+        'label_changes': label_changes,
+        'history_id': history_id
+    }
+
+
+def iter_message_pages(
+    access_token: str,
+    page_token: Optional[str] = None,
+    page_size: int = 500,
+    label_ids: Optional[List[str]] = None,
+    user=None,
+    throttle: Optional[QuotaThrottle] = None
+):
+    """Walk messages.list page by page, yielding (message_ids, result_size_estimate, next_page_token).
+
+    Only one page of ids is held at a time. Resume from a checkpoint by
+    passing the next_page_token of the last page that was fully handled.
+    """
+    client = gmail_client(access_token, user)
+
+    while True:
+        kwargs = {
+            'userId': 'me',
+            'maxResults': min(page_size, 500),
+            'labelIds': label_ids or ['INBOX']
+        }
+        if page_token:
+            kwargs['pageToken'] = page_token
+
+        if throttle:
+            throttle.wait(MESSAGES_LIST_QUOTA_UNITS)
+        response = client.service.users().messages().list(**kwargs).execute()
+
+        page_token = response.get('nextPageToken')
+        yield [message['id'] for message in response.get('messages', [])], response.get('resultSizeEstimate'), page_token
+
+        if not page_token:
+            break
+
+
+def fetch_messages(
+    access_token: str,
+    message_ids: List[str],
+    user=None,
+    throttle: Optional[QuotaThrottle] = None,
+    format: str = 'full'
+) -> List[Dict]:
+    """Fetch and parse messages; with format='metadata' only METADATA_HEADERS are downloaded and body is None."""
+    client = gmail_client(access_token, user)
+    metadata_headers = METADATA_HEADERS if format == 'metadata' else None
+
+    emails = []
+    for message in get_messages(client.service, message_ids, credentials=client.credentials,
+                                format=format, metadata_headers=metadata_headers, throttle=throttle):
+        try:
+            email = parse_message(message)
+            if format == 'metadata':
+                email['body'] = None
+            emails.append(email)
+        except Exception as e:
+            logger.error(f"Failed to parse message {message.get('id')}: {e}")
     return emails
 
+
 def get_user_profile(access_token: str):
-    credentials = Credentials(token=access_token)
-    service = build('gmail', 'v1', credentials=credentials)
+    service = gmail_client(access_token).service
 
     profile = service.users().getProfile(userId='me').execute()
     return {
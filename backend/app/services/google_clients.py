@@ -0,0 +1,279 @@
+from googleapiclient.discovery import build_from_document
+from googleapiclient import discovery_cache
+from googleapiclient.http import DEFAULT_HTTP_TIMEOUT_SEC
+from google.auth.transport.requests import Request
+from google_auth_httplib2 import AuthorizedHttp
+from google.oauth2.credentials import Credentials
+from app.config import settings
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+import httplib2
+import json
+import socket
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+TOKEN_URI = "https://oauth2.googleapis.com/token"
+
+
+def _utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    # google-auth compares expiry against naive UTC datetimes.
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class MeteredHttp(httplib2.Http):
+    """httplib2.Http that reports the size of every response body."""
+
+    def __init__(self, on_response, **kwargs):
+        super().__init__(**kwargs)
+        self.on_response = on_response
+        # Same as googleapiclient's build_http: 308 is a resumable upload status, not a redirect.
+        self.redirect_codes = self.redirect_codes - {308}
+
+    def request(self, *args, **kwargs):
+        response, content = super().request(*args, **kwargs)
+        self.on_response(len(content or b''))
+        return response, content
+
+
+class Transfer:
+    """Response bytes counted by measure_transfer."""
+
+    def __init__(self):
+        self.bytes = 0
+
+
+_transfers: ContextVar[tuple] = ContextVar("google_transfers", default=())
+
+
+class UserCredentials:
+    def __init__(self, credentials: Credentials, user_id: Optional[int]):
+        self.credentials = credentials
+        self.user_id = user_id
+        self.tokens = {credentials.token}
+        self.lock = threading.Lock()
+
+
+class CachedClient:
+    """One API client for one user; each thread gets its own service and HTTP connection."""
+
+    def __init__(self, cache, api: str, version: str, user: UserCredentials):
+        self.cache = cache
+        self.api = api
+        self.version = version
+        self.user = user
+        self.expires_at = time.monotonic() + settings.GOOGLE_CLIENT_CACHE_TTL_SECONDS
+        self.local = threading.local()
+
+    @property
+    def credentials(self) -> Credentials:
+        return self.user.credentials
+
+    @property
+    def service(self):
+        # googleapiclient services (and their httplib2 connections) are not thread-safe.
+        service = getattr(self.local, 'service', None)
+        if service is None:
+            service = self.local.service = self.cache.build(self.api, self.version, self.credentials)
+        return service
+
+
+class GoogleClientCache:
+    """Per-user Gmail/Calendar clients built from the bundled discovery documents.
+
+    Clients are reused for GOOGLE_CLIENT_CACHE_TTL_SECONDS so requests keep
+    their HTTP connections. Users with a refresh token get their access token
+    refreshed in a background thread before it expires, and the new token is
+    written back to the users table.
+    """
+
+    def __init__(self):
+        self.documents = {}
+        self.users: Dict[object, UserCredentials] = {}
+        self.clients: Dict[tuple, CachedClient] = {}
+        self.lock = threading.Lock()
+        self.refresher = None
+        self.metrics = {
+            "hits": 0, "misses": 0, "builds": 0, "evictions": 0, "refreshes": 0, "refresh_errors": 0,
+            "http_responses": 0, "bytes_received": 0
+        }
+
+    def _count(self, name: str, amount: int = 1):
+        self.metrics[name] += amount
+
+    def _root_url(self, api: str) -> Optional[str]:
+        return settings.GMAIL_API_ROOT_URL if api == 'gmail' else None
+
+    def _document(self, api: str, version: str) -> Dict:
+        key = (api, version, self._root_url(api))
+        document = self.documents.get(key)
+        if document is None:
+            document = json.loads(discovery_cache.get_static_doc(api, version))
+            if key[2]:
+                # Send every call, batch requests included, to another server such as a local fake.
+                document['rootUrl'] = key[2]
+            self.documents[key] = document
+        return document
+
+    def build(self, api: str, version: str, credentials: Credentials):
+        with self.lock:
+            self._count("builds")
+        http = MeteredHttp(self._record_response, timeout=socket.getdefaulttimeout() or DEFAULT_HTTP_TIMEOUT_SEC)
+        return build_from_document(self._document(api, version), http=AuthorizedHttp(credentials, http=http))
+
+    def _record_response(self, size: int):
+        with self.lock:
+            self._count("http_responses")
+            self._count("bytes_received", size)
+            for transfer in _transfers.get():
+                transfer.bytes += size
+
+    @contextmanager
+    def measure_transfer(self):
+        """Count response bytes of every API call made inside the block.
+
+        Calls on worker threads are included when the work runs in a copy of
+        this context (see gmail_service._execute_parallel).
+        """
+        transfer = Transfer()
+        token = _transfers.set(_transfers.get() + (transfer,))
+        try:
+            yield transfer
+        finally:
+            _transfers.reset(token)
+
+    def _credentials(self, access_token: str, refresh_token: Optional[str], token_expiry: Optional[datetime]) -> Credentials:
+        if not refresh_token:
+            return Credentials(token=access_token)
+        return Credentials(
+            token=access_token,
+            refresh_token=refresh_token,
+            token_uri=TOKEN_URI,
+            client_id=settings.GOOGLE_CLIENT_ID,
+            client_secret=settings.GOOGLE_CLIENT_SECRET,
+            expiry=_utc_naive(token_expiry)
+        )
+
+    def client(
+        self,
+        api: str,
+        version: str,
+        access_token: str,
+        refresh_token: Optional[str] = None,
+        token_expiry: Optional[datetime] = None,
+        user_id: Optional[int] = None
+    ) -> CachedClient:
+        user_key = user_id or refresh_token or access_token
+        key = (api, version, self._root_url(api), user_key)
+        now = time.monotonic()
+
+        with self.lock:
+            user = self.users.get(user_key)
+            # A token we have never seen means the user signed in again.
+            if user is None or access_token not in user.tokens:
+                user = self.users[user_key] = UserCredentials(
+                    self._credentials(access_token, refresh_token, token_expiry), user_id
+                )
+
+            client = self.clients.get(key)
+            if client is not None and (client.expires_at < now or client.user is not user):
+                del self.clients[key]
+                self._count("evictions")
+                client = None
+
+            if client is not None:
+                self._count("hits")
+                return client
+
+            self._count("misses")
+            self._evict_expired(now)
+            self.users[user_key] = user
+            client = self.clients[key] = CachedClient(self, api, version, user)
+            if user.credentials.refresh_token:
+                self._start_refresher()
+            return client
+
+    def get(self, api: str, version: str, access_token: str, **kwargs):
+        return self.client(api, version, access_token, **kwargs).service
+
+    def _evict_expired(self, now: float):
+        expired = [key for key, client in self.clients.items() if client.expires_at < now]
+        for key in expired:
+            del self.clients[key]
+        self._count("evictions", len(expired))
+
+        in_use = {id(client.user) for client in self.clients.values()}
+        for user_key in [k for k, user in self.users.items() if id(user) not in in_use]:
+            del self.users[user_key]
+
+    def _start_refresher(self):
+        if self.refresher is None or not self.refresher.is_alive():
+            self.refresher = threading.Thread(target=self._refresh_loop, name="google-token-refresh", daemon=True)
+            self.refresher.start()
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(settings.GOOGLE_TOKEN_REFRESH_CHECK_SECONDS)
+            try:
+                self.refresh_due()
+            except Exception as e:
+                logger.error(f"Token refresh loop error: {e}")
+
+    def refresh_due(self) -> int:
+        """Refresh tokens expiring within GOOGLE_TOKEN_REFRESH_MARGIN_SECONDS; returns how many were refreshed."""
+        deadline = datetime.utcnow() + timedelta(seconds=settings.GOOGLE_TOKEN_REFRESH_MARGIN_SECONDS)
+        with self.lock:
+            self._evict_expired(time.monotonic())
+            due = [
+                user for user in self.users.values()
+                if user.credentials.refresh_token and user.credentials.expiry and user.credentials.expiry <= deadline
+            ]
+
+        refreshed = 0
+        for user in due:
+            try:
+                with user.lock:
+                    user.credentials.refresh(Request())
+                    user.tokens.add(user.credentials.token)
+                self._save_token(user)
+                refreshed += 1
+            except Exception as e:
+                logger.error(f"Failed to refresh Google token for user {user.user_id}: {e}")
+                with self.lock:
+                    self._count("refresh_errors")
+
+        with self.lock:
+            self._count("refreshes", refreshed)
+        return refreshed
+
+    def _save_token(self, user: UserCredentials):
+        if not user.user_id:
+            return
+
+        from app.database import SessionLocal
+        from app.models.models import User
+
+        db = SessionLocal()
+        try:
+            db.query(User).filter(User.id == user.user_id).update({
+                User.google_access_token: user.credentials.token,
+                User.token_expiry: user.credentials.expiry.replace(tzinfo=timezone.utc) if user.credentials.expiry else None
+            })
+            db.commit()
+            logger.info(f"Refreshed Google token for user {user.user_id}")
+        finally:
+            db.close()
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {**self.metrics, "clients": len(self.clients), "users": len(self.users)}
+
+
+google_clients = GoogleClientCache()
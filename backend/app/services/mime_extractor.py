@@ -0,0 +1,232 @@
+from app.config import settings
+from email.message import Message
+from functools import partial
+from html.parser import HTMLParser
+from typing import Callable, Dict, List, Optional
+import base64
+import binascii
+import codecs
+import quopri
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+TEXT_TYPES = ("text/plain", "text/html")
+HTML_BYTES_PER_CHAR = 8
+SKIPPED_TAGS = {"script", "style", "head", "title", "noscript"}
+
+CHARSET_PATTERN = re.compile(r'charset\s*=\s*"?([^";\s]+)', re.IGNORECASE)
+WHITESPACE = re.compile(r"\s+")
+# A line break before these tags keeps paragraphs, rows and list items apart in the text.
+BLOCK_BREAK = re.compile(r"<(br|/p|/div|/tr|/li|/h[1-6]|/table|/blockquote|/section|/article)\b", re.IGNORECASE)
+
+
+def _header(part: Dict, name: str) -> str:
+    name = name.lower()
+    return next((h["value"] for h in part.get("headers") or [] if h["name"].lower() == name), "")
+
+
+def _codec(charset: Optional[str]) -> str:
+    if charset:
+        try:
+            return codecs.lookup(charset).name
+        except LookupError:
+            logger.warning(f"Unknown charset {charset}, decoding as utf-8")
+    return "utf-8"
+
+
+def _charset(part: Dict) -> str:
+    match = CHARSET_PATTERN.search(_header(part, "Content-Type"))
+    return _codec(match.group(1) if match else None)
+
+
+def _is_attachment(part: Dict) -> bool:
+    return bool(
+        part.get("filename")
+        or (part.get("body") or {}).get("attachmentId")
+        or _header(part, "Content-Disposition").lower().startswith("attachment")
+    )
+
+
+def decode_data(data: str, max_bytes: int) -> tuple:
+    """Base64url-decode at most max_bytes of part data, leaving the rest undecoded.
+
+    Returns (bytes, truncated).
+    """
+    encoded_length = (max_bytes + 2) // 3 * 4
+    chunk = data[:encoded_length]
+    raw = base64.urlsafe_b64decode(chunk + "=" * (-len(chunk) % 4))
+    return raw[:max_bytes], len(data.rstrip("=")) > encoded_length or len(raw) > max_bytes
+
+
+def decode_text(raw: bytes, charset: str, truncated: bool) -> str:
+    # The incremental decoder drops a multi-byte character cut off by the byte budget.
+    decoder = codecs.getincrementaldecoder(charset)(errors="replace")
+    return decoder.decode(raw, final=not truncated)
+
+
+class _TextExtractor(HTMLParser):
+    """Fallback HTML-to-text conversion when selectolax is not installed."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.pieces = []
+        self.skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self.skipping += 1
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS and self.skipping:
+            self.skipping -= 1
+
+    def handle_data(self, data):
+        if not self.skipping:
+            self.pieces.append(data)
+
+
+def html_to_text(html: str) -> str:
+    html = BLOCK_BREAK.sub(lambda m: "\n<" + m.group(1), WHITESPACE.sub(" ", html))
+
+    if LexborHTMLParser is not None:
+        tree = LexborHTMLParser(html)
+        for node in tree.css(", ".join(SKIPPED_TAGS)):
+            node.decompose()
+        root = tree.body or tree.root
+        text = root.text(separator="") if root else ""
+    else:
+        parser = _TextExtractor()
+        parser.feed(html)
+        parser.close()
+        text = "".join(parser.pieces)
+
+    lines = [line.strip() for line in text.replace("\xa0", " ").split("\n")]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def _text_parts(payload: Dict) -> List[Dict]:
+    """Inline text parts in document order, taking the text/plain alternative where there is one."""
+    parts, stack = [], [payload]
+
+    while stack:
+        part = stack.pop()
+        mime_type = (part.get("mimeType") or "").lower()
+        children = part.get("parts") or []
+
+        if mime_type.startswith("multipart/"):
+            if mime_type == "multipart/alternative":
+                plain = [child for child in children if (child.get("mimeType") or "").lower() == "text/plain"]
+                children = plain[:1] or children
+            stack.extend(reversed(children))
+        elif mime_type in TEXT_TYPES and not _is_attachment(part) and (part.get("body") or {}).get("data"):
+            parts.append(part)
+
+    return parts
+
+
+def _message_text_parts(message: Message) -> List[Message]:
+    """_text_parts for a parsed RFC 822 message (mbox/.eml imports)."""
+    parts, stack = [], [message]
+
+    while stack:
+        part = stack.pop()
+        mime_type = part.get_content_type()
+
+        if part.is_multipart():
+            children = part.get_payload()
+            if mime_type == "multipart/alternative":
+                plain = [child for child in children if child.get_content_type() == "text/plain"]
+                children = plain[:1] or children
+            stack.extend(reversed(children))
+        elif mime_type in TEXT_TYPES and part.get_content_disposition() != "attachment" and not part.get_filename():
+            parts.append(part)
+
+    return parts
+
+
+def _decode_transfer(part: Message, max_bytes: int) -> tuple:
+    """Undo the Content-Transfer-Encoding of a prefix of the part; returns (bytes, truncated)."""
+    payload = part.get_payload()
+    if not isinstance(payload, str):
+        return b"", False
+    encoding = (part.get("Content-Transfer-Encoding") or "").strip().lower()
+
+    if encoding == "base64":
+        # Allow for the line breaks between 76-character lines.
+        length = (max_bytes + 2) // 3 * 4 * 78 // 76 + 4
+        chunk = WHITESPACE.sub("", payload[:length])
+        raw = binascii.a2b_base64(chunk[:len(chunk) // 4 * 4])
+    elif encoding == "quoted-printable":
+        length = max_bytes * 3
+        raw = quopri.decodestring(payload[:length].encode("ascii", "surrogateescape"))
+    else:
+        length = max_bytes
+        raw = payload[:length].encode("ascii", "surrogateescape")
+
+    return raw[:max_bytes], len(payload) > length or len(raw) > max_bytes
+
+
+def _part_text(decode_prefix: Callable[[int], tuple], charset: str, is_html: bool, wanted: int, budget: int) -> tuple:
+    """Text of one part from as short a decoded prefix as possible; returns (text, bytes decoded)."""
+    if is_html:
+        # Markup-heavy HTML yields little text per byte: grow the decoded prefix until it yields enough.
+        limit = min(budget, wanted * HTML_BYTES_PER_CHAR)
+        while True:
+            raw, truncated = decode_prefix(limit)
+            text = html_to_text(decode_text(raw, charset, truncated))
+            if len(text) >= wanted or not truncated or limit >= budget:
+                break
+            limit = min(budget, limit * 4)
+    else:
+        # Plain text never needs more than 4 bytes per character.
+        raw, truncated = decode_prefix(min(budget, wanted * 4))
+        text = decode_text(raw, charset, truncated).strip()
+    return text, len(raw)
+
+
+def _join_parts(parts: list, describe: Callable, max_chars: Optional[int], max_bytes: Optional[int]) -> str:
+    max_chars = max_chars or settings.EMAIL_BODY_MAX_CHARS
+    budget = max_bytes or settings.EMAIL_BODY_MAX_BYTES
+    pieces, length = [], 0
+
+    for part in parts:
+        if budget <= 0 or length >= max_chars:
+            break
+
+        decode_prefix, charset, is_html = describe(part)
+        text, used = _part_text(decode_prefix, charset, is_html, max_chars - length, budget)
+        budget -= used
+        if text:
+            pieces.append(text)
+            length += len(text) + 2
+
+    return "\n\n".join(pieces)[:max_chars]
+
+
+def extract_body(payload: Dict, max_chars: Optional[int] = None, max_bytes: Optional[int] = None) -> str:
+    """Plain-text body of a Gmail API message payload.
+
+    Walks the MIME tree without recursion, converts HTML-only mail to text and
+    skips attachments without decoding them. At most max_bytes of part data
+    are decoded in total and the result is cut to max_chars.
+    """
+    def describe(part):
+        data = part["body"]["data"]
+        return partial(decode_data, data), _charset(part), part["mimeType"].lower() == "text/html"
+
+    return _join_parts(_text_parts(payload), describe, max_chars, max_bytes)
+
+
+def extract_message_body(message: Message, max_chars: Optional[int] = None, max_bytes: Optional[int] = None) -> str:
+    """extract_body for a parsed RFC 822 message, e.g. from an mbox archive."""
+    def describe(part):
+        return partial(_decode_transfer, part), _codec(part.get_content_charset()), part.get_content_type() == "text/html"
+
+    return _join_parts(_message_text_parts(message), describe, max_chars, max_bytes)
@@ -2,13 +2,15 @@ from telegram import Update, Bot
 from telegram.ext import Application, CommandHandler, ContextTypes
 from app.config import settings
 from app.database import SessionLocal
-from app.models.models import User, Email
-from app.services.email_service import get_email_statistics, get_user_emails
-from sqlalchemy import desc
+from app.models.models import Email, User
+from app.services.email_service import get_email_statistics, get_user_emails_page
 import logging
 
 logger = logging.getLogger(__name__)
 
+# The columns the command messages show, so listing never reads email bodies.
+LIST_COLUMNS = (Email.id, Email.subject, Email.sender, Email.summary, Email.priority, Email.intent, Email.received_at)
+
 
 class TelegramBotHandler:
     
@@ -36,6 +38,7 @@ Available commands:
 /meeting - List meeting invitations
 /unread - List unread emails
 /recent - Last 5 emails
+/more - Next page of the last list
 
 📅 <b>Calendar</b>
 /today - Today's meetings
@@ -93,7 +96,7 @@ Type any command to get started!
                 await update.message.reply_text("❌ No user authenticated")
                 return
             
-            emails = get_user_emails(db, user.id, limit=5)
+            emails, next_cursor = get_user_emails_page(db, user.id, limit=5, cursor=self._cursor(context), columns=LIST_COLUMNS)
             
             if not emails:
                 await update.message.reply_text("📭 No emails found")
@@ -112,6 +115,7 @@ Type any command to get started!
                 message += f"   From: {email.sender}\n"
                 message += f"   {email.summary[:150]}...\n\n"
             
+            message += self._more(context, "summary_command", next_cursor)
             await update.message.reply_text(message, parse_mode="HTML")
         finally:
             db.close()
@@ -124,7 +128,7 @@ Type any command to get started!
                 await update.message.reply_text("❌ No user authenticated")
                 return
             
-            emails = get_user_emails(db, user.id, intent="urgent", limit=10)
+            emails, next_cursor = get_user_emails_page(db, user.id, limit=10, intent="urgent", cursor=self._cursor(context), columns=LIST_COLUMNS)
             
             if not emails:
                 await update.message.reply_text("✅ No urgent emails!")
@@ -137,6 +141,7 @@ Type any command to get started!
                 message += f"   From: {email.sender}\n"
                 message += f"   📝 {email.summary[:120]}...\n\n"
             
+            message += self._more(context, "urgent_command", next_cursor)
             await update.message.reply_text(message, parse_mode="HTML")
         finally:
             db.close()
@@ -149,7 +154,7 @@ Type any command to get started!
                 await update.message.reply_text("❌ No user authenticated")
                 return
             
-            emails = get_user_emails(db, user.id, priority="high", limit=10)
+            emails, next_cursor = get_user_emails_page(db, user.id, limit=10, priority="high", cursor=self._cursor(context), columns=LIST_COLUMNS)
             
             if not emails:
                 await update.message.reply_text("✅ No high priority emails!")
@@ -163,6 +168,7 @@ Type any command to get started!
                 message += f"   Type: {email.intent}\n"
                 message += f"   📝 {email.summary[:100]}...\n\n"
             
+            message += self._more(context, "high_priority_command", next_cursor)
             await update.message.reply_text(message, parse_mode="HTML")
         finally:
             db.close()
@@ -175,7 +181,7 @@ Type any command to get started!
                 await update.message.reply_text("❌ No user authenticated")
                 return
             
-            emails = get_user_emails(db, user.id, intent="meeting", limit=10)
+            emails, next_cursor = get_user_emails_page(db, user.id, limit=10, intent="meeting", cursor=self._cursor(context), columns=(*LIST_COLUMNS, Email.entities))
             
             if not emails:
                 await update.message.reply_text("📅 No meeting invitations found")
@@ -198,6 +204,7 @@ Type any command to get started!
                 
                 message += f"   📝 {email.summary[:100]}...\n\n"
             
+            message += self._more(context, "meeting_command", next_cursor)
             await update.message.reply_text(message, parse_mode="HTML")
         finally:
             db.close()
@@ -210,10 +217,7 @@ Type any command to get started!
                 await update.message.reply_text("❌ No user authenticated")
                 return
             
-            emails = db.query(Email).filter(
-                Email.user_id == user.id,
-                Email.is_read == False
-            ).order_by(desc(Email.received_at)).limit(10).all()
+            emails, next_cursor = get_user_emails_page(db, user.id, limit=10, unread=True, cursor=self._cursor(context), columns=LIST_COLUMNS)
             
             if not emails:
                 await update.message.reply_text("✅ All emails read!")
@@ -232,6 +236,7 @@ Type any command to get started!
                 message += f"   From: {email.sender}\n"
                 message += f"   📝 {email.summary[:100] if email.summary else 'No summary'}...\n\n"
             
+            message += self._more(context, "unread_command", next_cursor)
             await update.message.reply_text(message, parse_mode="HTML")
         finally:
             db.close()
@@ -244,7 +249,7 @@ Type any command to get started!
                 await update.message.reply_text("❌ No user authenticated")
                 return
             
-            emails = get_user_emails(db, user.id, limit=5)
+            emails, next_cursor = get_user_emails_page(db, user.id, limit=5, cursor=self._cursor(context), columns=LIST_COLUMNS)
             
             if not emails:
                 await update.message.reply_text("📭 No emails found")
@@ -272,26 +277,49 @@ Type any command to get started!
                 message += f"   From: {email.sender}\n"
                 message += f"   {email.summary[:120] if email.summary else 'No summary'}...\n\n"
             
+            message += self._more(context, "recent_command", next_cursor)
             await update.message.reply_text(message, parse_mode="HTML")
         finally:
             db.close()
     
+    def _cursor(self, context: ContextTypes.DEFAULT_TYPE):
+        """Cursor to start from when the command runs for /more; None for the first page."""
+        return context.chat_data.pop("cursor", None)
+
+    def _more(self, context: ContextTypes.DEFAULT_TYPE, command: str, next_cursor) -> str:
+        context.chat_data["more"] = (command, next_cursor) if next_cursor else None
+        return "➡️ /more for older emails" if next_cursor else ""
+
+    async def more_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /more: the next page of the last email list"""
+        more = context.chat_data.get("more")
+        if not more:
+            await update.message.reply_text("📭 No more emails in the last list")
+            return
+
+        command, cursor = more
+        context.chat_data["cursor"] = cursor
+        try:
+            await getattr(self, command)(update, context)
+        finally:
+            context.chat_data.pop("cursor", None)
+    
     async def sync_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /sync command"""
         await update.message.reply_text("🔄 Syncing emails from Gmail...")
         
         db = SessionLocal()
         try:
-            from app.services.email_service import fetch_and_save_emails
+            from app.services.email_service import sync_mailbox
             
             user = db.query(User).first()
             if not user or not user.google_access_token:
                 await update.message.reply_text("❌ User not authenticated with Gmail")
                 return
             
-            emails = fetch_and_save_emails(db, user, max_results=10)
+            result = sync_mailbox(db, user, max_results=10)
             
-            message = f"✅ Synced {len(emails)} new emails!"
+            message = f"✅ Synced {len(result['emails'])} new emails!"
             await update.message.reply_text(message)
         
         except Exception as e:
@@ -309,7 +337,7 @@ Type any command to get started!
                 await update.message.reply_text("❌ User not authenticated")
                 return
             
-            if not calendar_service.initialize_service(user.google_access_token, user.google_refresh_token):
+            if not calendar_service.initialize_service(user.google_access_token, user.google_refresh_token, user.id, user.token_expiry):
                 await update.message.reply_text("❌ Failed to connect to calendar")
                 return
             
@@ -354,7 +382,7 @@ Type any command to get started!
                 await update.message.reply_text("❌ User not authenticated")
                 return
             
-            if not calendar_service.initialize_service(user.google_access_token, user.google_refresh_token):
+            if not calendar_service.initialize_service(user.google_access_token, user.google_refresh_token, user.id, user.token_expiry):
                 await update.message.reply_text("❌ Failed to connect to calendar")
                 return
             
@@ -413,6 +441,7 @@ Type any command to get started!
             self.application.add_handler(CommandHandler("meeting", self.meeting_command))
             self.application.add_handler(CommandHandler("unread", self.unread_command))
             self.application.add_handler(CommandHandler("recent", self.recent_command))
+            self.application.add_handler(CommandHandler("more", self.more_command))
             self.application.add_handler(CommandHandler("sync", self.sync_command))
             self.application.add_handler(CommandHandler("today", self.today_command))
             self.application.add_handler(CommandHandler("tomorrow", self.tomorrow_command))
@@ -0,0 +1,106 @@
+"""Compare full-row email list queries with the column-projected ones.
+
+Runs against DATABASE_URL (use a local Postgres for representative numbers)
+and removes the rows and user it creates. Bytes are the summed size of the
+values each query returns, i.e. what the database sends and the ORM decodes.
+"""
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.orm import undefer
+
+from app.database import Base, SessionLocal, engine
+from app.models.models import Email, User
+from app.services.email_service import EMAIL_LIST_COLUMNS, get_user_emails_page
+from app.services.notifications.telegram_bot import LIST_COLUMNS
+
+statements = []
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def capture(conn, cursor, statement, parameters, *args):
+    statements.append((statement, parameters))
+
+
+def make_emails(user_id: int, count: int) -> list:
+    rng = random.Random(0)
+    paragraph = "Here is the latest on the launch plan, the budget and who owns which part of the rollout. "
+    return [Email(
+        user_id=user_id,
+        message_id=f"bench-{uuid.uuid4().hex}",
+        thread_id=f"thread-{index // 3}",
+        subject=f"Launch plan {index}",
+        sender="bob@example.com",
+        # Bodies of 1-20KB, as in a real mailbox with quoted replies.
+        body_text=paragraph * rng.randint(10, 220),
+        summary="Bob asks to meet tomorrow at 3pm about the launch plan.",
+        intent="meeting",
+        priority=rng.choice(["high", "medium", "low"]),
+        entities={"dates": ["tomorrow"], "times": ["3pm"], "people": ["Bob"]},
+        reply_suggestions=["Sounds good, see you at 3pm.", "Could we do 4pm instead?", "I can't make it tomorrow."],
+        is_read=rng.random() < 0.7,
+        is_processed=True,
+        received_at=datetime(2024, 1, 1) + timedelta(minutes=index)
+    ) for index in range(count)]
+
+
+def result_bytes(statement: str, parameters) -> int:
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(statement, parameters).all()
+    return sum(len(str(value)) for row in rows for value in row if value is not None)
+
+
+def with_bodies(db, user_id: int, limit: int, skip: int):
+    """What list views loaded before body_text was deferred."""
+    return db.query(Email).options(undefer(Email.body_text)).filter(Email.user_id == user_id).order_by(
+        Email.received_at.desc(), Email.id.desc()
+    ).offset(skip).limit(limit).all()
+
+
+def run(db, user_id: int, columns, pages: int, limit: int) -> tuple:
+    del statements[:]
+    cursor, started = None, time.perf_counter()
+    for page in range(pages):
+        if columns == "bodies":
+            with_bodies(db, user_id, limit, page * limit)
+        else:
+            emails, cursor = get_user_emails_page(db, user_id, limit=limit, cursor=cursor, columns=columns)
+        db.expunge_all()
+    ms = (time.perf_counter() - started) * 1000
+    return ms, sum(result_bytes(statement, parameters) for statement, parameters in list(statements))
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    pages, limit = 20, 20
+    Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    user = User(email=f"bench-{uuid.uuid4().hex[:8]}@example.com")
+    db.add(user)
+    db.commit()
+    user_id = user.id
+
+    print(f"\nEmail List Query Benchmark ({engine.dialect.name}, {size} emails, {pages} pages of {limit})")
+    print("=" * 64)
+    print(f"{'query':<30} {'ms':>10} {'bytes read':>12} {'KB/page':>9}")
+    print("-" * 64)
+
+    try:
+        db.add_all(make_emails(user_id, size))
+        db.commit()
+        db.expunge_all()
+
+        for name, columns in (("Email rows with bodies (old)", "bodies"), ("Email rows", None), ("API list columns", EMAIL_LIST_COLUMNS), ("bot list columns", LIST_COLUMNS)):
+            ms, read = run(db, user_id, columns, pages, limit)
+            print(f"{name:<30} {ms:>10.1f} {read:>12} {read / pages / 1024:>9.1f}")
+    finally:
+        db.query(Email).filter(Email.user_id == user_id).delete()
+        db.query(User).filter(User.id == user_id).delete()
+        db.commit()
+        db.close()
+    print()
@@ -0,0 +1,109 @@
+import base64
+import sys
+import time
+
+from app.services.mime_extractor import LexborHTMLParser, extract_body
+
+PARAGRAPH = "Hi Sarah, the Q3 numbers are attached. Can we review them on Thursday at 10am? Thanks, Bob. "
+
+
+def b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode("ascii")
+
+
+def text_part(mime_type: str, text: str, charset: str = "utf-8") -> dict:
+    data = text.encode(charset)
+    return {
+        "mimeType": mime_type,
+        "headers": [{"name": "Content-Type", "value": f"{mime_type}; charset={charset}"}],
+        "body": {"size": len(data), "data": b64(data)}
+    }
+
+
+def html(text: str) -> str:
+    rows = "".join(f"<tr><td style='padding:4px'><p>{text}</p></td></tr>" for _ in range(3))
+    return f"<html><head><style>td {{ color: #333; }}</style></head><body><table>{rows}</table></body></html>"
+
+
+def attachment(size: int, inline: bool) -> dict:
+    body = {"size": size, "data": b64(b"%PDF-1.7" + b"\x00" * size)} if inline else {"size": size, "attachmentId": "ANGjdJ8"}
+    return {
+        "mimeType": "application/pdf",
+        "filename": "report.pdf",
+        "headers": [{"name": "Content-Disposition", "value": "attachment; filename=report.pdf"}],
+        "body": body
+    }
+
+
+def corpus() -> dict:
+    big_text = PARAGRAPH * 20000  # ~2 MB
+    return {
+        "2 MB text/plain + html": {"mimeType": "multipart/alternative", "parts": [
+            text_part("text/plain", big_text), text_part("text/html", html(big_text))
+        ]},
+        "300 KB html-only newsletter": {"mimeType": "multipart/alternative", "parts": [
+            text_part("text/html", html(PARAGRAPH * 1000))
+        ]},
+        "5 MB inline pdf attachment": {"mimeType": "multipart/mixed", "parts": [
+            {"mimeType": "multipart/alternative", "parts": [text_part("text/plain", PARAGRAPH * 5), text_part("text/html", html(PARAGRAPH * 5))]},
+            attachment(5_000_000, inline=True)
+        ]},
+        "nested related/alternative, latin-1": {"mimeType": "multipart/mixed", "parts": [
+            {"mimeType": "multipart/related", "parts": [
+                {"mimeType": "multipart/alternative", "parts": [
+                    text_part("text/plain", "Grüße aus München. " + PARAGRAPH * 50, "iso-8859-1"),
+                    text_part("text/html", html("Grüße aus München. " + PARAGRAPH * 50), "iso-8859-1")
+                ]}
+            ]},
+            attachment(200_000, inline=False)
+        ]},
+        "single-part text/plain": text_part("text/plain", PARAGRAPH * 30),
+        "single-part text/plain, windows-1252": text_part("text/plain", "Café “menu” attached. " + PARAGRAPH * 30, "windows-1252"),
+        "attachment stored as attachmentId": {"mimeType": "multipart/mixed", "parts": [
+            {"mimeType": "text/plain", "headers": [], "body": {"size": 120000, "attachmentId": "ANGjdJ9"}},
+            text_part("text/plain", PARAGRAPH * 2)
+        ]},
+    }
+
+
+def legacy_body(payload: dict) -> str:
+    """What parse_message used to do: decode the whole first text/plain part, then slice."""
+    body = ''
+    if 'parts' in payload:
+        for part in payload['parts']:
+            if part['mimeType'] == 'text/plain':
+                body = base64.urlsafe_b64decode(part['body']['data']).decode('utf-8')
+                break
+    elif 'body' in payload:
+        body = base64.urlsafe_b64decode(payload['body']['data']).decode('utf-8')
+    return body[:500]
+
+
+def bench(fn, payload, iterations: int) -> tuple:
+    try:
+        result = fn(payload)
+    except Exception as e:
+        return None, type(e).__name__
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn(payload)
+    return (time.perf_counter() - started) / iterations * 1000, result
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    print(f"\nMIME Body Extraction Benchmark ({iterations} iterations, html converter: "
+          f"{'selectolax' if LexborHTMLParser else 'html.parser'})")
+    print("=" * 96)
+    print(f"{'message':<38} {'legacy ms':>10} {'new ms':>8}  {'legacy text':<28} new text")
+    print("-" * 96)
+
+    for name, payload in corpus().items():
+        legacy_ms, legacy_text = bench(legacy_body, payload, iterations)
+        new_ms, new_text = bench(extract_body, payload, iterations)
+
+        legacy = f"{legacy_ms:10.2f}" if legacy_ms is not None else f"{'-':>10}"
+        legacy_result = f"{len(legacy_text)} chars" if legacy_ms is not None else f"error: {legacy_text}"
+        print(f"{name:<38} {legacy} {new_ms:>8.3f}  {legacy_result:<28} {len(new_text)} chars")
+    print()
@@ -0,0 +1,56 @@
+import os
+import sys
+import time
+import uuid
+
+os.environ.setdefault("LLM_PROVIDER", "fake")
+
+from app.config import settings
+from app.services.ai.llm_service import llm_service
+from app.services.ai.email_processor import email_processor
+
+TEMPLATES = [
+    ("Sync tomorrow?", "Hi Sarah,\n\nCan we meet tomorrow at 3pm in Room 4 to go over the launch plan? Please bring the deck.\n\nThanks,\nBob"),
+    ("URGENT: checkout is down", "Hi team,\n\nCheckout has been down since 9am and customers cannot pay. Please look into this immediately.\n\nAlex"),
+    ("Following up on the contract", "Hi,\n\nJust following up on the contract I sent last week. Any update from Acme Inc?\n\nBest,\nMaria"),
+    ("Q3 report", "Hello,\n\nAttached is the Q3 report for your information. No action needed.\n\nRegards,\nFinance Team"),
+]
+
+
+def make_emails(count: int) -> list:
+    emails = []
+    for index in range(count):
+        subject, body = TEMPLATES[index % len(TEMPLATES)]
+        # Unique bodies so every email misses the LLM result cache.
+        emails.append({
+            "message_id": f"bench-{uuid.uuid4().hex}",
+            "subject": subject,
+            "body": f"{body}\n\nRef {uuid.uuid4().hex[:8]}",
+            "sender": "bench@example.com"
+        })
+    return emails
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    print(f"\nIngest Pipeline Benchmark ({settings.LLM_PROVIDER} provider)")
+    print("=" * 40)
+    print(f"emails: {count}, concurrency: {settings.AI_MAX_CONCURRENCY}, single call: {settings.AI_SINGLE_CALL_ANALYSIS}")
+    if settings.LLM_PROVIDER == "fake":
+        print(f"latency: {settings.FAKE_LLM_LATENCY_DISTRIBUTION} {settings.FAKE_LLM_LATENCY_MS}ms "
+              f"+/- {settings.FAKE_LLM_LATENCY_JITTER_MS}ms, error rate: {settings.FAKE_LLM_ERROR_RATE}")
+
+    emails = make_emails(count)
+    started = time.perf_counter()
+    results = email_processor.batch_process_emails(emails, send_notifications=False)
+    elapsed = time.perf_counter() - started
+
+    failed = sum(1 for result in results if not result.get("processed"))
+    print("-" * 40)
+    print(f"{elapsed:.2f}s total, {count / elapsed:.1f} emails/s, {failed} failed")
+
+    for operation, stats in llm_service.get_metrics().items():
+        print(f"{operation:<14} calls {stats['calls']:>5}  errors {stats['errors']:>4}  "
+              f"avg {stats['avg_latency_ms']:>7.1f}ms  tokens {stats['total_tokens']:>8}")
+    print()
@@ -0,0 +1,105 @@
+"""Compare per-email saves with the set-based save path.
+
+Runs against DATABASE_URL (use a local Postgres for representative numbers)
+and removes the rows and user it creates. AI results are precomputed so only
+persistence is measured.
+"""
+import os
+import sys
+import time
+import uuid
+
+os.environ.setdefault("LLM_PROVIDER", "fake")
+
+from sqlalchemy import event
+
+from app.database import Base, SessionLocal, engine
+from app.models.models import Email, User
+from app.services.email_service import save_email_with_ai_analysis, save_emails_batch
+
+AI_RESULTS = {
+    "processed": True,
+    "summary": "Bob asks to meet tomorrow at 3pm about the launch plan.",
+    "intent": "meeting",
+    "priority": "medium",
+    "entities": {"dates": ["tomorrow"], "times": ["3pm"], "people": ["Bob"]},
+    "reply_suggestions": None,
+    "classified_by": "heuristic"
+}
+
+counters = {"statements": 0, "commits": 0}
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def count_statement(*args):
+    counters["statements"] += 1
+
+
+@event.listens_for(engine, "commit")
+def count_commit(*args):
+    counters["commits"] += 1
+
+
+def make_emails(count: int) -> list:
+    return [{
+        "message_id": f"bench-{uuid.uuid4().hex}",
+        "thread_id": f"thread-{index}",
+        "subject": f"Launch plan {index}",
+        "sender": "bob@example.com",
+        "body": "Hi Sarah,\n\nCan we meet tomorrow at 3pm to go over the launch plan?\n\nThanks,\nBob",
+        "labels": ["INBOX", "UNREAD"]
+    } for index in range(count)]
+
+
+def legacy(db, user, emails):
+    for email_data in emails:
+        save_email_with_ai_analysis(db, user.id, email_data, ai_results=AI_RESULTS, send_notification=False)
+
+
+def set_based(db, user, emails):
+    existing = {
+        message_id for (message_id,) in db.query(Email.message_id).filter(
+            Email.message_id.in_([email_data["message_id"] for email_data in emails])
+        )
+    }
+    new_emails = [email_data for email_data in emails if email_data["message_id"] not in existing]
+    save_emails_batch(db, user.id, new_emails, {email_data["message_id"]: AI_RESULTS for email_data in new_emails})
+
+
+def run(fn, db, user, emails) -> tuple:
+    counters.update(statements=0, commits=0)
+    started = time.perf_counter()
+    fn(db, user, emails)
+    return (time.perf_counter() - started) * 1000, counters["statements"], counters["commits"]
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100, 1000]
+    Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    user = User(email=f"bench-{uuid.uuid4().hex[:8]}@example.com")
+    db.add(user)
+    db.commit()
+
+    print(f"\nEmail Persistence Benchmark ({engine.dialect.name})")
+    print("=" * 78)
+    print(f"{'case':<30} {'path':<10} {'ms':>10} {'statements':>11} {'commits':>8} {'emails/s':>10}")
+    print("-" * 78)
+
+    try:
+        for size in sizes:
+            # Half of the second run's emails are already stored, as in an overlapping sync.
+            for label, overlap in ((f"{size} new", 0), (f"{size}, half already stored", size // 2)):
+                for name, fn in (("legacy", legacy), ("set-based", set_based)):
+                    emails = make_emails(size)
+                    if overlap:
+                        set_based(db, user, emails[:overlap])
+                    ms, statements, commits = run(fn, db, user, emails)
+                    print(f"{label:<30} {name:<10} {ms:>10.1f} {statements:>11} {commits:>8} {size / ms * 1000:>10.0f}")
+    finally:
+        db.query(Email).filter(Email.user_id == user.id).delete()
+        db.delete(user)
+        db.commit()
+        db.close()
+    print()
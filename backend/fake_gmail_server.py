@@ -0,0 +1,256 @@
+"""Local stand-in for the parts of the Gmail REST API the sync code uses.
+
+Serves messages.list/get, history.list, getProfile, batch and OAuth token requests from
+an in-memory mailbox, counts requests and can inject per-message errors or
+whole-batch failures. Point the app at it with GMAIL_API_ROOT_URL.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from email.parser import BytesParser
+from urllib.parse import urlparse, parse_qs
+import base64
+import json
+import re
+import threading
+import uuid
+
+
+def _b64(text: str) -> str:
+    return base64.urlsafe_b64encode(text.encode("utf-8")).decode("ascii")
+
+
+def make_message(index: int, body_size: int = 2000, labels=None, bulk: bool = False) -> dict:
+    """A multipart/alternative message; bulk=True makes it a newsletter the heuristics can triage."""
+    if bulk:
+        text = f"This week's digest, issue {index}. View this email in your browser.\n\n" + ("Lorem ipsum dolor sit amet. " * (body_size // 28))
+        labels = labels or ["INBOX", "UNREAD", "CATEGORY_PROMOTIONS"]
+        sender = f"Weekly Digest <newsletter@news{index % 10}.example.com>"
+        extra_headers = [
+            {"name": "List-Unsubscribe", "value": f"<mailto:unsubscribe@news{index % 10}.example.com>"},
+            {"name": "Precedence", "value": "bulk"},
+        ]
+    else:
+        text = f"Hi team,\n\nThis is message {index}. Can we meet tomorrow at 3pm?\n\n" + ("Lorem ipsum dolor sit amet. " * (body_size // 28))
+        sender = f"Sender {index} <sender{index}@example.com>"
+        extra_headers = []
+    html = f"<html><body><p>{text.replace(chr(10), '<br>')}</p></body></html>"
+    return {
+        "id": f"msg{index:06d}",
+        "threadId": f"thread{index:06d}",
+        "labelIds": labels or ["INBOX", "UNREAD"],
+        "snippet": text[:100],
+        "historyId": str(1000 + index),
+        "internalDate": str(1700000000000 + index * 1000),
+        "sizeEstimate": len(text) + len(html),
+        "payload": {
+            "mimeType": "multipart/alternative",
+            "headers": [
+                {"name": "Subject", "value": f"Message {index}"},
+                {"name": "From", "value": sender},
+                {"name": "Date", "value": "Mon, 13 Nov 2023 10:00:00 +0000"},
+                {"name": "To", "value": "me@example.com"},
+            ] + extra_headers,
+            "body": {"size": 0},
+            "parts": [
+                {"partId": "0", "mimeType": "text/plain", "headers": [{"name": "Content-Type", "value": "text/plain; charset=UTF-8"}],
+                 "body": {"size": len(text), "data": _b64(text)}},
+                {"partId": "1", "mimeType": "text/html", "headers": [{"name": "Content-Type", "value": "text/html; charset=UTF-8"}],
+                 "body": {"size": len(html), "data": _b64(html)}},
+            ],
+        },
+    }
+
+
+class FakeGmail:
+    def __init__(self, messages=None):
+        self.messages = {m["id"]: m for m in (messages or [])}
+        self.order = [m["id"] for m in (messages or [])]
+        self.history = []
+        self.history_id = 5000
+        self.oldest_history_id = 0
+        self.requests = []
+        self.bytes_sent = 0
+        self.not_found = set()
+        self.rate_limited_once = set()
+        self.fail_batches = False
+        self.fail_page_tokens = set()
+        self.lock = threading.Lock()
+
+    def _record(self, history_type: str, message: dict, **extra):
+        self.history_id += 1
+        message["historyId"] = str(self.history_id)
+        item = {"message": {"id": message["id"], "threadId": message["threadId"], "labelIds": list(message["labelIds"])}, **extra}
+        self.history.append({"id": str(self.history_id), history_type: [item]})
+
+    def add_message(self, message: dict):
+        with self.lock:
+            self.messages[message["id"]] = message
+            self.order.insert(0, message["id"])
+            self._record("messagesAdded", message)
+
+    def change_labels(self, message_id: str, add=(), remove=()):
+        with self.lock:
+            message = self.messages[message_id]
+            message["labelIds"] = [label for label in message["labelIds"] if label not in remove] + list(add)
+            if add:
+                self._record("labelsAdded", message, labelIds=list(add))
+            if remove:
+                self._record("labelsRemoved", message, labelIds=list(remove))
+
+    def expire_history(self):
+        """Make every historyId handed out so far too old for history.list."""
+        with self.lock:
+            self.oldest_history_id = self.history_id + 1
+
+    def count(self, kind: str) -> int:
+        return sum(1 for request in self.requests if request == kind)
+
+    # --- API methods -------------------------------------------------------
+
+    def get_message(self, message_id: str, query: dict) -> tuple:
+        if message_id in self.not_found or message_id not in self.messages:
+            return 404, {"error": {"code": 404, "message": "Requested entity was not found."}}
+        if message_id in self.rate_limited_once:
+            self.rate_limited_once.discard(message_id)
+            return 429, {"error": {"code": 429, "message": "Too many concurrent requests for user"}}
+
+        message = json.loads(json.dumps(self.messages[message_id]))
+        format = query.get("format", ["full"])[0]
+        if format == "metadata":
+            wanted = {name.lower() for name in query.get("metadataHeaders", [])}
+            headers = [h for h in message["payload"]["headers"] if not wanted or h["name"].lower() in wanted]
+            message["payload"] = {"mimeType": message["payload"]["mimeType"], "headers": headers}
+        elif format == "minimal":
+            message.pop("payload")
+        return 200, message
+
+    def list_messages(self, query: dict) -> tuple:
+        if query.get("pageToken", [None])[0] in self.fail_page_tokens:
+            return 500, {"error": {"code": 500, "message": "Backend Error"}}
+        max_results = int(query.get("maxResults", ["100"])[0])
+        start = int(query.get("pageToken", ["0"])[0])
+        label_ids = query.get("labelIds", [])
+        ids = [i for i in self.order if all(label in self.messages[i]["labelIds"] for label in label_ids)]
+        page = ids[start:start + max_results]
+        result = {
+            "messages": [{"id": i, "threadId": self.messages[i]["threadId"]} for i in page],
+            "resultSizeEstimate": len(ids),
+        }
+        if start + max_results < len(ids):
+            result["nextPageToken"] = str(start + max_results)
+        return 200, result
+
+    def list_history(self, query: dict) -> tuple:
+        start = int(query["startHistoryId"][0])
+        if start < self.oldest_history_id:
+            return 404, {"error": {"code": 404, "message": "Requested entity was not found."}}
+
+        # historyTypes use singular names (messageAdded); records use plural keys (messagesAdded).
+        keys = {"messageAdded": "messagesAdded", "messageDeleted": "messagesDeleted",
+                "labelAdded": "labelsAdded", "labelRemoved": "labelsRemoved"}
+        wanted = [keys[t] for t in query.get("historyTypes", [])] or list(keys.values())
+        history = [h for h in self.history if int(h["id"]) > start and any(k in h for k in wanted)]
+
+        max_results = int(query.get("maxResults", ["100"])[0])
+        offset = int(query.get("pageToken", ["0"])[0])
+        result = {"history": history[offset:offset + max_results], "historyId": str(self.history_id)}
+        if offset + max_results < len(history):
+            result["nextPageToken"] = str(offset + max_results)
+        return 200, result
+
+    def profile(self) -> tuple:
+        return 200, {
+            "emailAddress": "me@example.com",
+            "messagesTotal": len(self.messages),
+            "threadsTotal": len(self.messages),
+            "historyId": str(self.history_id),
+        }
+
+    def handle(self, method: str, path: str) -> tuple:
+        url = urlparse(path)
+        query = parse_qs(url.query)
+        route = url.path
+
+        with self.lock:
+            match = re.fullmatch(r"/gmail/v1/users/me/messages/([^/]+)", route)
+            if method == "GET" and match:
+                self.requests.append("messages.get")
+                return self.get_message(match.group(1), query)
+            if method == "GET" and route == "/gmail/v1/users/me/messages":
+                self.requests.append("messages.list")
+                return self.list_messages(query)
+            if method == "GET" and route == "/gmail/v1/users/me/history":
+                self.requests.append("history.list")
+                return self.list_history(query)
+            if method == "GET" and route == "/gmail/v1/users/me/profile":
+                self.requests.append("getProfile")
+                return self.profile()
+        return 404, {"error": {"code": 404, "message": f"No route for {method} {route}"}}
+
+
+def _batch_response(fake: FakeGmail, content_type: str, body: bytes) -> tuple:
+    parsed = BytesParser().parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+    boundary = f"batch_{uuid.uuid4().hex}"
+    parts = []
+
+    for part in parsed.get_payload():
+        content_id = part.get("Content-ID", "")
+        request_line = part.get_payload(decode=False).lstrip().split("\n", 1)[0].strip()
+        method, path, _ = request_line.split(" ", 2)
+        status, payload = fake.handle(method, path)
+        reason = {200: "OK", 404: "Not Found", 429: "Too Many Requests"}.get(status, "Error")
+        parts.append(
+            f"--{boundary}\r\n"
+            f"Content-Type: application/http\r\n"
+            f"Content-ID: <response-{content_id.strip('<>')}>\r\n\r\n"
+            f"HTTP/1.1 {status} {reason}\r\n"
+            f"Content-Type: application/json; charset=UTF-8\r\n\r\n"
+            f"{json.dumps(payload)}\r\n"
+        )
+
+    return f"multipart/mixed; boundary={boundary}", ("".join(parts) + f"--{boundary}--\r\n").encode("utf-8")
+
+
+def start_fake_gmail(fake: FakeGmail) -> tuple:
+    """Serve `fake` on a free local port; returns (server, root_url)."""
+
+    class Handler(BaseHTTPRequestHandler):
+        # Keep-alive, like the real API, so clients that reuse connections benefit.
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, content_type: str, data: bytes):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            with fake.lock:
+                fake.bytes_sent += len(data)
+
+        def do_GET(self):
+            status, payload = fake.handle("GET", self.path)
+            self._send(status, "application/json; charset=UTF-8", json.dumps(payload).encode("utf-8"))
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if urlparse(self.path).path == "/token":
+                # OAuth refresh: hand out a new access token.
+                with fake.lock:
+                    fake.requests.append("token")
+                    token = f"token-{fake.count('token')}"
+                return self._send(200, "application/json", json.dumps({"access_token": token, "expires_in": 3600}).encode())
+            if not urlparse(self.path).path.startswith("/batch"):
+                return self._send(404, "application/json", b"{}")
+            with fake.lock:
+                fake.requests.append("batch")
+            if fake.fail_batches:
+                return self._send(503, "application/json", b'{"error": {"code": 503, "message": "Backend Error"}}')
+            content_type, data = _batch_response(fake, self.headers["Content-Type"], body)
+            self._send(200, content_type, data)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
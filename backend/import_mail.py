@@ -0,0 +1,48 @@
+import argparse
+import logging
+import resource
+import sys
+from app.database import SessionLocal
+from app.models.models import User
+from app.services.mail_import import import_mail
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import mbox files or directories of .eml files into a user's mailbox")
+    parser.add_argument("paths", nargs="+", help="mbox files, .eml files or directories of .eml files")
+    parser.add_argument("--user", required=True, help="email address of the user to import into")
+    parser.add_argument("--workers", type=int, help="parser processes (default IMPORT_WORKERS, 1 parses inline)")
+    parser.add_argument("--batch-size", type=int, help="messages per database commit (default IMPORT_BATCH_SIZE)")
+    parser.add_argument("--limit", type=int, help="stop after this many messages")
+    parser.add_argument("--no-ai", action="store_true", help="skip LLM analysis; only confident heuristic triage is stored")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.email == args.user).first()
+        if not user:
+            print(f"No user with email {args.user}")
+            sys.exit(1)
+
+        stats = import_mail(
+            db, user, args.paths,
+            workers=args.workers,
+            batch_size=args.batch_size,
+            analyse=not args.no_ai,
+            limit=args.limit
+        )
+    finally:
+        db.close()
+
+    print("\nImport finished:")
+    print("-" * 40)
+    for name, value in stats.items():
+        print(f"{name:<22} {value}")
+    print(f"{'peak_rss_mb':<22} {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f}")
+    print("-" * 40)
+
+
+if __name__ == "__main__":
+    main()
@@ -43,6 +43,18 @@ def show_users():
     finally:
         db.close()
 
+def rebuild_email_stats():
+    """Recount the user_email_stats counters of every user"""
+    from app.services.email_service import rebuild_email_stats as rebuild
+
+    db = SessionLocal()
+    try:
+        for user in db.query(User).all():
+            stats = rebuild(db, user.id)
+            print(f"User {user.id}: {stats['total']} emails, {stats['unread']} unread")
+    finally:
+        db.close()
+
 
 if __name__ == "__main__":
     commands = {
@@ -50,6 +62,7 @@ if __name__ == "__main__":
         "drop": drop_tables,
         "stats": show_tables,
         "users": show_users,
+        "rebuild-stats": rebuild_email_stats,
     }
     
     if len(sys.argv) < 2 or sys.argv[1] not in commands:
@@ -59,6 +72,7 @@ if __name__ == "__main__":
         print("  drop    - Drop all tables")
         print("  stats   - Show table statistics")
         print("  users   - List all users")
+        print("  rebuild-stats - Recount the user_email_stats counters")
         sys.exit(1)
     
     commands[sys.argv[1]]()
\ No newline at end of file
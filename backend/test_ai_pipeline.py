@@ -0,0 +1,196 @@
+import os
+
+os.environ.setdefault("LLM_PROVIDER", "fake")
+os.environ.setdefault("FAKE_LLM_LATENCY_MS", "0")
+os.environ.setdefault("FAKE_LLM_LATENCY_JITTER_MS", "0")
+os.environ.setdefault("FAKE_LLM_PROMPT_TOKENS", "100")
+os.environ.setdefault("FAKE_LLM_COMPLETION_TOKENS", "20")
+os.environ.setdefault("EMBEDDING_CLASSIFIER_ENABLED", "false")
+
+import asyncio
+
+from app.config import settings
+from app.services.ai.email_processor import email_processor
+from app.services.ai.fake_llm import FakeChatModel
+from app.services.ai.llm_service import llm_service
+from app.services.ai.preprocessing import clean_email_text
+
+
+def print_header(text):
+    print("\n" + "="*70)
+    print(f"  {text}")
+    print("="*70)
+
+
+class MemoryCache:
+    """Stands in for Redis behind the LLM result cache."""
+
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ttl=3600):
+        self.values[key] = value
+        return True
+
+
+def make_email(index: int, subject: str = None, body: str = None) -> dict:
+    return {
+        "message_id": f"ai{index:03d}",
+        "subject": subject or f"Project meeting {index}",
+        "sender": f"Colleague {index} <colleague{index}@example.com>",
+        "body": body or f"Hi,\n\nCan we schedule a meeting on Friday about release {index}?\n\nThanks",
+        "labels": ["INBOX"],
+        "headers": {}
+    }
+
+
+def make_newsletter(index: int) -> dict:
+    return {
+        "message_id": f"news{index:03d}",
+        "subject": f"Weekly digest {index}",
+        "sender": "Weekly Digest <newsletter@news.example.com>",
+        "body": f"This week's digest, issue {index}. View this email in your browser.",
+        "labels": ["INBOX", "CATEGORY_PROMOTIONS"],
+        "headers": {"List-Unsubscribe": "<mailto:unsubscribe@news.example.com>", "Precedence": "bulk"}
+    }
+
+
+def run(single_call: bool = True, policy: str = "lazy"):
+    settings.AI_SINGLE_CALL_ANALYSIS = single_call
+    settings.AI_REPLY_SUGGESTIONS_POLICY = policy
+    email_processor.cache.cache = MemoryCache()
+
+
+def test_single_call_analysis():
+    print_header("TEST 1: One LLM call per email, token usage from FAKE_LLM_* settings")
+    run()
+
+    result = email_processor.process_email(make_email(1), send_notification=False)
+    print(f"{result['intent']}/{result['priority']}, usage {result['llm_usage']}")
+    assert result["processed"] and result["classified_by"] == "llm"
+    assert result["intent"] == "meeting" and result["failed_sections"] == []
+    assert result["summary"] and result["summary"] != "unable to generate summary"
+    # Lazy policy: replies are generated on first access, not during analysis.
+    assert result["reply_suggestions"] is None
+    usage = result["llm_usage"]
+    assert usage["calls"] == 1 and usage["errors"] == 0
+    assert usage["prompt_tokens"] == settings.FAKE_LLM_PROMPT_TOKENS
+    assert usage["completion_tokens"] == settings.FAKE_LLM_COMPLETION_TOKENS
+
+    replies = email_processor.get_reply_suggestions(make_email(1))
+    assert replies and len(replies) == 3
+
+
+def test_fan_out_and_eager_replies():
+    print_header("TEST 2: Fan-out mode makes one call per section, eager policy adds replies")
+    run(single_call=False, policy="eager")
+
+    result = email_processor.process_email(make_email(2), send_notification=False)
+    print(f"{result['llm_usage']['calls']} calls, {len(result['reply_suggestions'])} replies")
+    assert result["failed_sections"] == [] and result["intent"] == "meeting"
+    assert result["llm_usage"]["calls"] == 4
+    assert len(result["reply_suggestions"]) == 3
+
+    run(single_call=True, policy="eager")
+    result = email_processor.process_email(make_email(3), send_notification=False)
+    assert result["llm_usage"]["calls"] == 1 and len(result["reply_suggestions"]) == 3
+
+
+def test_batch_and_cache():
+    print_header("TEST 3: Batch keeps input order, triages bulk mail and reuses cached analyses")
+    run(single_call=False)
+
+    emails = [make_email(10), make_newsletter(1), make_email(11), make_email(12)]
+    before = llm_service.get_metrics().get("intent_batch", {}).get("calls", 0)
+    with llm_service.track_usage() as usage:
+        results = email_processor.batch_process_emails(emails, send_notifications=False)
+    print(f"First run: {usage.calls} calls, classified by {[result['classified_by'] for result in results]}")
+    assert [result["message_id"] for result in results] == [email["message_id"] for email in emails]
+    assert all(result["processed"] for result in results)
+    assert results[1]["classified_by"] == "heuristic" and results[1]["reply_suggestions"] == []
+    assert [results[index]["classified_by"] for index in (0, 2, 3)] == ["llm"] * 3
+    # One shared intent request for the three emails the heuristics left to the LLM.
+    assert llm_service.get_metrics()["intent_batch"]["calls"] == before + 1
+
+    with llm_service.track_usage() as usage:
+        again = email_processor.batch_process_emails(emails, send_notifications=False)
+    print(f"Second run: {usage.calls} calls")
+    # Cached analyses of batch-classified emails leave out intent, so only the shared intent request is repeated.
+    assert usage.calls == 1
+    assert llm_service.get_metrics()["intent_batch"]["calls"] == before + 2
+    assert [result["summary"] for result in again] == [result["summary"] for result in results]
+
+
+def test_concurrent_requests_share_one_analysis():
+    print_header("TEST 4: Concurrent requests for one email share one analysis")
+    run()
+
+    async def concurrent():
+        return await asyncio.gather(*(
+            email_processor.aprocess_email(make_email(20), send_notification=False) for _ in range(5)
+        ))
+
+    with llm_service.track_usage() as usage:
+        results = asyncio.run(concurrent())
+    print(f"{len(results)} results from {usage.calls} LLM calls")
+    assert usage.calls == 1
+    assert len({result["summary"] for result in results}) == 1
+
+
+def test_failed_calls_are_not_cached():
+    print_header("TEST 5: Failed calls fall back to defaults and are not cached")
+    run()
+    llm_service.reload(FakeChatModel(latency_ms=0, latency_jitter_ms=0, error_rate=1.0))
+    try:
+        result = email_processor.process_email(make_email(30), send_notification=False)
+        print(f"failed sections {result['failed_sections']}, classified by {result['classified_by']}")
+        assert result["processed"] and result["failed_sections"]
+        assert result["classified_by"] == "default"
+        # The failed single call is retried section by section before giving up.
+        assert result["llm_usage"]["errors"] == result["llm_usage"]["calls"] == 4
+        assert email_processor.cache.cache.values == {}
+    finally:
+        llm_service.reload()
+
+    result = email_processor.process_email(make_email(30), send_notification=False)
+    assert result["failed_sections"] == [] and result["classified_by"] == "llm"
+
+
+def test_quote_headers():
+    print_header("TEST 6: Quoted history is cut at attribution lines only")
+    reply = "Thanks, Friday works.\n\n"
+    quoted = "\n> Can we meet on Friday?\n> Bob"
+
+    for header in (
+        "On Mon, Nov 13, 2023 at 10:00 AM Bob <bob@example.com> wrote:",
+        "On Mon, Nov 13, 2023 at 10:00 AM Bob <bob@example.com>\nwrote:",
+        "On 13/11/2023 10:00, Bob wrote:",
+    ):
+        assert clean_email_text(reply + header + quoted) == "Thanks, Friday works."
+
+    # Ordinary sentences that happen to start with "On" and end with "wrote:" are kept.
+    for body in (
+        "On the other hand, I agree with what\nBob wrote:\nthe draft is ready.",
+        "On 3 occasions the build broke, as\nBob wrote:\nwe need a fix.",
+    ):
+        cleaned = clean_email_text(body)
+        print(repr(cleaned))
+        assert cleaned == body
+
+
+if __name__ == "__main__":
+    print("\n" + "="*70)
+    print("  AI PIPELINE TEST")
+    print("="*70)
+
+    test_single_call_analysis()
+    test_fan_out_and_eager_replies()
+    test_batch_and_cache()
+    test_concurrent_requests_share_one_analysis()
+    test_failed_calls_are_not_cached()
+    test_quote_headers()
+
+    print("\nAll AI pipeline tests passed")
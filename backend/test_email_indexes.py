@@ -0,0 +1,156 @@
+"""EXPLAIN regression test for the inbox indexes on a synthetic mailbox.
+
+Loads ROWS emails (default one million, spread over 100 users) and checks that
+the list, filter and unread queries are answered from their composite/partial
+index, already in received_at order, without a sort or a full table scan.
+
+Runs on an in-memory sqlite database unless EXPLAIN_TEST_DATABASE_URL points at
+a scratch Postgres database. There it creates the users and email tables, refusing
+to run if they already exist, and drops them again afterwards.
+
+    python test_email_indexes.py [rows]
+"""
+import os
+import sys
+import time
+
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models.models import Email, User
+from app.services.ai.schemas import INTENTS
+from app.services.email_service import get_user_emails, get_user_emails_page
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+USERS = 100
+TABLES = [User.__table__, Email.__table__]
+
+# user_id is g % 100, so the other columns vary with g / 100 to spread them evenly over users.
+SQLITE_LOAD = """
+INSERT INTO email (user_id, message_id, thread_id, subject, sender, intent, priority, is_processed, is_read, is_important, received_at)
+WITH RECURSIVE seq(g) AS (SELECT 1 UNION ALL SELECT g + 1 FROM seq WHERE g < :rows)
+SELECT g % :users + 1, 'msg' || g, 'thread' || (g / 3), 'Subject ' || g, 'sender' || (g % 500) || '@example.com',
+       CASE g % {count} {whens} END,
+       CASE WHEN g / 100 % 10 = 0 THEN 'high' WHEN g / 100 % 10 < 5 THEN 'medium' ELSE 'low' END,
+       1, g / 100 % 5 != 0, g / 100 % 10 = 0, datetime('2024-01-01', '+' || g || ' seconds')
+FROM seq
+""".format(count=len(INTENTS), whens=" ".join(f"WHEN {index} THEN '{intent}'" for index, intent in enumerate(INTENTS)))
+
+POSTGRES_LOAD = """
+INSERT INTO email (user_id, message_id, thread_id, subject, sender, intent, priority, is_processed, is_read, is_important, received_at)
+SELECT g % :users + 1, 'msg' || g, 'thread' || (g / 3), 'Subject ' || g, 'sender' || (g % 500) || '@example.com',
+       (ARRAY[{intents}])[g % {count} + 1],
+       CASE WHEN g / 100 % 10 = 0 THEN 'high' WHEN g / 100 % 10 < 5 THEN 'medium' ELSE 'low' END,
+       true, g / 100 % 5 != 0, g / 100 % 10 = 0, timestamptz '2024-01-01' + g * interval '1 second'
+FROM generate_series(1, :rows) AS g
+""".format(count=len(INTENTS), intents=", ".join(f"'{intent}'" for intent in INTENTS))
+
+
+def print_header(text):
+    print("\n" + "="*70)
+    print(f"  {text}")
+    print("="*70)
+
+
+def setup():
+    url = os.environ.get("EXPLAIN_TEST_DATABASE_URL", "sqlite://")
+    if url.startswith("sqlite"):
+        engine = create_engine(url, connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    else:
+        engine = create_engine(url)
+
+    existing = sorted(set(inspect(engine).get_table_names()) & {table.name for table in TABLES})
+    if existing:
+        raise SystemExit(f"{engine.url!r} already has tables {existing}; use an empty scratch database")
+    Base.metadata.create_all(engine, tables=TABLES)
+
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (id, email) VALUES " + ", ".join(
+            f"({user_id}, 'user{user_id}@example.com')" for user_id in range(1, USERS + 1)
+        )))
+        conn.execute(text(POSTGRES_LOAD if engine.dialect.name == "postgresql" else SQLITE_LOAD), {"rows": ROWS, "users": USERS})
+        conn.execute(text("ANALYZE"))
+    print(f"Loaded {ROWS} emails for {USERS} users into {engine.dialect.name} in {time.perf_counter() - started:.1f}s")
+    return engine, sessionmaker(bind=engine)()
+
+
+def capture(engine, fn) -> tuple:
+    """Run fn and return the last SELECT it sent with its parameters."""
+    statements = []
+    listener = lambda conn, cursor, statement, parameters, *args: statements.append((statement, parameters))
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        started = time.perf_counter()
+        fn()
+        return statements[-1], (time.perf_counter() - started) * 1000
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+
+def explain(engine, statement: str, parameters) -> str:
+    prefix = "EXPLAIN " if engine.dialect.name == "postgresql" else "EXPLAIN QUERY PLAN "
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(prefix + statement, parameters).all()
+    # sqlite rows are (id, parent, notused, detail); Postgres returns one text column.
+    return "\n".join(str(row[-1]) for row in rows)
+
+
+def check_plan(engine, name: str, fn, index: str, seek: bool = False):
+    """Assert the query reads index, in order; with seek, that it starts at the cursor's received_at."""
+    (statement, parameters), elapsed_ms = capture(engine, fn)
+    plan = explain(engine, statement, parameters)
+    print(f"\n{name} ({elapsed_ms:.1f}ms)\n" + "\n".join(f"    {line}" for line in plan.splitlines()))
+
+    assert index in plan, f"{name}: expected {index}"
+    if engine.dialect.name == "postgresql":
+        assert "Seq Scan" not in plan and "Sort" not in plan, f"{name}: scans or sorts the table"
+        if seek:
+            assert any("Index Cond" in line and "received_at" in line for line in plan.splitlines()), f"{name}: no index range on received_at"
+    else:
+        assert "TEMP B-TREE" not in plan, f"{name}: sorts the result"
+        if seek:
+            assert "received_at<" in plan, f"{name}: no index range on received_at"
+
+
+def deep_cursor(db, user_id: int, **filters) -> str:
+    """Cursor about half way down the user's matching mail."""
+    rows = get_user_emails_page(db, user_id, limit=1_000_000, **filters)[0]
+    cursor = get_user_emails_page(db, user_id, limit=len(rows) // 2, **filters)[1]
+    assert cursor, f"no cursor for {filters}"
+    return cursor
+
+
+def test_inbox_queries_use_indexes():
+    print_header(f"TEST: Inbox queries use the composite and partial indexes ({ROWS} rows)")
+    engine, db = setup()
+    user_id = 42
+
+    check_plan(engine, "Latest emails", lambda: get_user_emails(db, user_id), "ix_email_user_id_received_at")
+    check_plan(engine, "High priority", lambda: get_user_emails(db, user_id, priority="high"), "ix_email_user_id_priority_received_at")
+    check_plan(engine, "By intent", lambda: get_user_emails(db, user_id, intent="urgent", skip=20), "ix_email_user_id_intent_received_at")
+    check_plan(engine, "Unread", lambda: get_user_emails_page(db, user_id, limit=10, unread=True), "ix_email_user_id_unread_received_at")
+
+    # Keyset pages far down the mailbox seek straight to the cursor instead of skipping rows.
+    deep = deep_cursor(db, user_id)
+    check_plan(engine, "Cursor page", lambda: get_user_emails_page(db, user_id, cursor=deep), "ix_email_user_id_received_at", seek=True)
+    deep = deep_cursor(db, user_id, priority="high")
+    check_plan(engine, "High priority cursor page", lambda: get_user_emails_page(db, user_id, priority="high", cursor=deep), "ix_email_user_id_priority_received_at", seek=True)
+    deep = deep_cursor(db, user_id, unread=True)
+    check_plan(engine, "Unread cursor page", lambda: get_user_emails_page(db, user_id, unread=True, cursor=deep), "ix_email_user_id_unread_received_at", seek=True)
+
+    db.close()
+    if engine.dialect.name == "postgresql":
+        Base.metadata.drop_all(engine, tables=TABLES)
+
+
+if __name__ == "__main__":
+    print("\n" + "="*70)
+    print("  EMAIL INDEX EXPLAIN TEST")
+    print("="*70)
+
+    test_inbox_queries_use_indexes()
+
+    print("\nAll email index tests passed")
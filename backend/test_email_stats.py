@@ -0,0 +1,198 @@
+import os
+
+os.environ.setdefault("LLM_PROVIDER", "fake")
+os.environ.setdefault("FAKE_LLM_LATENCY_MS", "0")
+
+import random
+from datetime import datetime
+
+from sqlalchemy import create_engine, event, func
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.config import settings
+from app.database import Base
+from app.models.models import Email, User, UserEmailStats
+from app.services.ai.schemas import INTENTS, PRIORITIES
+from app.services.email_service import (
+    apply_label_changes, get_email_statistics, mark_email_read, save_email_with_ai_analysis, save_emails_batch
+)
+
+# None: emails saved before they were analysed.
+INTENT_CHOICES = INTENTS + [None]
+
+
+def print_header(text):
+    print("\n" + "="*70)
+    print(f"  {text}")
+    print("="*70)
+
+
+def setup() -> tuple:
+    # A throwaway in-memory database, so the test never touches DATABASE_URL.
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    user = User(email="me@example.com")
+    other = User(email="other@example.com")
+    db.add_all([user, other])
+    db.commit()
+    return engine, db, user, other
+
+
+def make_emails(prefix: str, count: int, seed: int) -> tuple:
+    rng = random.Random(seed)
+    emails, ai_results = [], {}
+    for index in range(count):
+        message_id = f"{prefix}-{index}"
+        emails.append({
+            "message_id": message_id,
+            "subject": f"Subject {index}",
+            "sender": "bob@example.com",
+            "body": "Body",
+            "labels": ["INBOX", "UNREAD"] if rng.random() < 0.6 else ["INBOX"]
+        })
+        ai_results[message_id] = {
+            "processed": rng.random() < 0.9,
+            "intent": rng.choice(INTENT_CHOICES),
+            "priority": rng.choice(PRIORITIES),
+            "classified_by": "heuristic"
+        }
+    return emails, ai_results
+
+
+def legacy_statistics(db, user_id: int) -> dict:
+    """The five queries get_email_statistics used to run."""
+    query = db.query(Email).filter(Email.user_id == user_id)
+    intents = db.query(Email.intent, func.count(Email.id)).filter(Email.user_id == user_id).group_by(Email.intent).all()
+    return {
+        "total": query.count(),
+        "processed": query.filter(Email.is_processed == True).count(),
+        "high_priority": query.filter(Email.priority == "high").count(),
+        "unread": query.filter(Email.is_read == False).count(),
+        "by_intent": {intent: count for intent, count in intents if intent}
+    }
+
+
+def count_queries(engine, fn) -> tuple:
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        return fn(), len(statements)
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+
+def populate(db, user, other):
+    for owner, prefix, seed in ((user, "mine", 1), (other, "theirs", 2)):
+        emails, ai_results = make_emails(prefix, 300, seed)
+        save_emails_batch(db, owner.id, emails, ai_results)
+        # Some mail has been read since it was saved.
+        for email in db.query(Email).filter(Email.user_id == owner.id).limit(20).all():
+            mark_email_read(db, email)
+
+
+def test_single_query():
+    print_header("TEST 1: Statistics come from one aggregate query")
+    settings.EMAIL_STATS_COUNTERS_ENABLED = False
+    engine, db, user, other = setup()
+    populate(db, user, other)
+
+    user_id = user.id
+    stats, queries = count_queries(engine, lambda: get_email_statistics(db, user_id))
+    print(f"{stats} in {queries} query")
+    assert queries == 1
+    assert stats == legacy_statistics(db, user_id)
+
+
+def test_counters():
+    print_header("TEST 2: user_email_stats follows inserts, label changes and reads")
+    settings.EMAIL_STATS_COUNTERS_ENABLED = True
+    engine, db, user, other = setup()
+    try:
+        populate(db, user, other)
+
+        # The first save counted the emails and stored the counters.
+        assert get_email_statistics(db, user.id) == legacy_statistics(db, user.id)
+        assert db.query(UserEmailStats).count() == 2  # one per user
+
+        emails, ai_results = make_emails("later", 50, 3)
+        save_emails_batch(db, user.id, emails[:40], ai_results)
+        save_emails_batch(db, user.id, emails[:45], ai_results)  # 40 already stored
+        save_email_with_ai_analysis(db, user.id, emails[45], ai_results=ai_results["later-45"])
+        apply_label_changes(db, user.id, {"later-0": ["INBOX"], "later-1": ["INBOX", "UNREAD"], "mine-5": ["INBOX"]})
+        mark_email_read(db, db.query(Email).filter(Email.message_id == "later-2").first())
+        # Other users' changes leave this user's counters alone.
+        save_emails_batch(db, other.id, *make_emails("theirs-later", 10, 4))
+
+        user_id = user.id
+        stats, queries = count_queries(engine, lambda: get_email_statistics(db, user_id))
+        print(f"{stats} in {queries} query")
+        assert queries == 1
+        assert stats == legacy_statistics(db, user.id)
+        assert stats["total"] == 346
+        assert get_email_statistics(db, other.id) == legacy_statistics(db, other.id)
+    finally:
+        settings.EMAIL_STATS_COUNTERS_ENABLED = False
+
+
+def test_counters_created_by_writes():
+    print_header("TEST 3: The first write creates the counters; NULL is_read is not unread")
+    settings.EMAIL_STATS_COUNTERS_ENABLED = True
+    engine, db, user, other = setup()
+    try:
+        # Rows from before the counters existed, some without is_read.
+        db.add_all([
+            Email(user_id=user.id, message_id=f"legacy-{index}", is_read=None if index % 2 else False, intent="urgent",
+                  received_at=datetime(2024, 1, 1, 9, index))
+            for index in range(10)
+        ])
+        db.commit()
+
+        emails, ai_results = make_emails("new", 30, 5)
+        save_emails_batch(db, user.id, emails[:20], ai_results)
+        assert db.query(UserEmailStats).count() == 1
+        save_email_with_ai_analysis(db, user.id, emails[20], ai_results=ai_results["new-20"])
+        mark_email_read(db, db.query(Email).filter(Email.message_id == "legacy-1").first())
+        mark_email_read(db, db.query(Email).filter(Email.message_id == "legacy-2").first())
+
+        stats = get_email_statistics(db, user.id)
+        print(stats)
+        assert stats == legacy_statistics(db, user.id)
+        assert stats["total"] == 31
+    finally:
+        settings.EMAIL_STATS_COUNTERS_ENABLED = False
+
+
+def test_read_state_from_labels():
+    print_header("TEST 4: Emails without the UNREAD label are saved as read")
+    settings.EMAIL_STATS_COUNTERS_ENABLED = True
+    engine, db, user, other = setup()
+    try:
+        emails, ai_results = make_emails("labels", 4, 6)
+        for email_data, labels in zip(emails, (["INBOX"], ["INBOX", "UNREAD"], ["INBOX"], ["INBOX", "UNREAD"])):
+            email_data["labels"] = labels
+        save_emails_batch(db, user.id, emails[:3], ai_results)
+        save_email_with_ai_analysis(db, user.id, emails[3], ai_results=ai_results["labels-3"])
+
+        stats = get_email_statistics(db, user.id)
+        print(stats)
+        assert stats == legacy_statistics(db, user.id)
+        assert stats["unread"] == 2
+        assert db.query(Email).filter(Email.message_id == "labels-0").first().is_read
+    finally:
+        settings.EMAIL_STATS_COUNTERS_ENABLED = False
+
+
+if __name__ == "__main__":
+    print("\n" + "="*70)
+    print("  EMAIL STATISTICS TEST")
+    print("="*70)
+
+    test_single_query()
+    test_counters()
+    test_counters_created_by_writes()
+    test_read_state_from_labels()
+
+    print("\nAll email statistics tests passed")
@@ -0,0 +1,131 @@
+import os
+
+os.environ.setdefault("LLM_PROVIDER", "fake")
+os.environ.setdefault("FAKE_LLM_LATENCY_MS", "0")
+os.environ.setdefault("FAKE_LLM_LATENCY_JITTER_MS", "0")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from fake_gmail_server import FakeGmail, make_message, start_fake_gmail
+from app.config import settings
+from app.database import Base
+from app.models.models import Email, SyncState, User
+from app.services.ai.email_processor import email_processor
+from app.services.email_service import sync_mailbox
+
+
+def print_header(text):
+    print("\n" + "="*70)
+    print(f"  {text}")
+    print("="*70)
+
+
+def setup(count: int) -> tuple:
+    fake = FakeGmail([make_message(i) for i in range(count)])
+    _, root_url = start_fake_gmail(fake)
+    settings.GMAIL_API_ROOT_URL = root_url
+    settings.GMAIL_RETRY_BACKOFF_SECONDS = 0.01
+
+    # A throwaway in-memory database, so the test never touches DATABASE_URL.
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    user = User(email="me@example.com", google_access_token="token")
+    db.add(user)
+    db.commit()
+    return fake, db, user
+
+
+def test_first_sync_stores_cursor():
+    print_header("TEST 1: First sync is a bounded full sync that stores the historyId")
+    fake, db, user = setup(30)
+
+    result = sync_mailbox(db, user, max_results=10)
+    state = db.query(SyncState).filter(SyncState.user_id == user.id).first()
+
+    print(f"Mode: {result['mode']}, saved {len(result['emails'])}, historyId {state.history_id}")
+    assert result["mode"] == "full"
+    assert len(result["emails"]) == 10
+    assert state.history_id == str(fake.history_id)
+    assert fake.count("history.list") == 0
+
+
+def test_incremental_sync():
+    print_header("TEST 2: Later syncs fetch only new messages and apply label changes")
+    fake, db, user = setup(30)
+    sync_mailbox(db, user, max_results=10)
+
+    fake.requests.clear()
+    fake.add_message(make_message(100))
+    fake.add_message(make_message(101))
+    fake.change_labels("msg000000", remove=["UNREAD"])
+
+    result = sync_mailbox(db, user, max_results=10)
+    read = db.query(Email).filter(Email.message_id == "msg000000").first()
+
+    print(f"Mode: {result['mode']}, saved {len(result['emails'])}, label updates {result['label_updates']}")
+    print(f"HTTP requests: {sorted(set(fake.requests))}")
+    assert result["mode"] == "incremental"
+    assert [e.message_id for e in result["emails"]] == ["msg000100", "msg000101"]
+    assert result["label_updates"] == 1
+    assert read.is_read and read.labels == "INBOX"
+    assert fake.count("messages.list") == 0
+    assert fake.count("history.list") == 1
+
+    fake.requests.clear()
+    result = sync_mailbox(db, user, max_results=10)
+    print(f"No changes: saved {len(result['emails'])}, requests {fake.requests}")
+    assert result["emails"] == []
+    assert fake.requests == ["history.list"]
+
+
+def test_expired_cursor_resyncs():
+    print_header("TEST 3: An expired historyId falls back to a bounded full resync")
+    fake, db, user = setup(30)
+    settings.GMAIL_RESYNC_MAX_MESSAGES = 20
+    sync_mailbox(db, user, max_results=10)
+
+    fake.expire_history()
+    result = sync_mailbox(db, user, max_results=10)
+    state = db.query(SyncState).filter(SyncState.user_id == user.id).first()
+
+    print(f"Mode: {result['mode']}, saved {len(result['emails'])}, historyId {state.history_id}")
+    assert result["mode"] == "resync"
+    assert len(result["emails"]) == 20
+    assert db.query(Email).count() == 20
+    assert state.history_id == str(fake.history_id)
+    settings.GMAIL_RESYNC_MAX_MESSAGES = 200
+
+
+def test_failed_analysis_still_saves():
+    print_header("TEST 4: Emails whose analysis retry raises are saved unprocessed")
+    fake, db, user = setup(10)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("LLM unavailable")
+
+    # Every email misses the batch, and its individual retry raises.
+    email_processor.batch_process_emails = lambda emails, **kwargs: [{"processed": False} for _ in emails]
+    email_processor.process_email = fail
+    try:
+        result = sync_mailbox(db, user, max_results=10)
+    finally:
+        del email_processor.batch_process_emails, email_processor.process_email
+
+    print(f"Saved {len(result['emails'])}, processed {db.query(Email).filter(Email.is_processed.is_(True)).count()}")
+    assert len(result["emails"]) == 10
+    assert db.query(Email).filter(Email.is_processed.is_(False)).count() == 10
+
+
+if __name__ == "__main__":
+    print("\n" + "="*70)
+    print("  GMAIL INCREMENTAL SYNC TEST (local fake Gmail server)")
+    print("="*70)
+
+    test_first_sync_stores_cursor()
+    test_incremental_sync()
+    test_expired_cursor_resyncs()
+    test_failed_analysis_still_saves()
+
+    print("\nAll Gmail sync tests passed")
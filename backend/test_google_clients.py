@@ -0,0 +1,127 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build_from_document
+from google.oauth2.credentials import Credentials
+from fake_gmail_server import FakeGmail, make_message, start_fake_gmail
+from app.config import settings
+from app.services import google_clients as google_clients_module
+from app.services.google_clients import GoogleClientCache
+from app.services.gmail_service import get_user_profile
+
+
+def print_header(text):
+    print("\n" + "="*70)
+    print(f"  {text}")
+    print("="*70)
+
+
+def setup() -> tuple:
+    fake = FakeGmail([make_message(i) for i in range(5)])
+    _, root_url = start_fake_gmail(fake)
+    settings.GMAIL_API_ROOT_URL = root_url
+    return fake, root_url
+
+
+def test_clients_are_reused():
+    print_header("TEST 1: Repeated calls reuse one client per user and thread")
+    setup()
+    cache = GoogleClientCache()
+
+    started = time.perf_counter()
+    for _ in range(50):
+        cache.get('gmail', 'v1', "token").users().getProfile(userId='me').execute()
+    cached = time.perf_counter() - started
+
+    # What every call used to do: parse the discovery document and open a new connection.
+    started = time.perf_counter()
+    for _ in range(50):
+        document = json.loads(discovery_cache.get_static_doc('gmail', 'v1'))
+        document['rootUrl'] = settings.GMAIL_API_ROOT_URL
+        service = build_from_document(document, credentials=Credentials(token="token"))
+        service.users().getProfile(userId='me').execute()
+    uncached = time.perf_counter() - started
+
+    stats = cache.stats()
+    print(f"50 profile calls: {cached * 1000:.0f}ms cached, {uncached * 1000:.0f}ms building a service each time")
+    print(f"Stats: {stats}")
+    assert stats["misses"] == 1 and stats["builds"] == 1
+    assert cached < uncached
+
+    services = []
+    thread = threading.Thread(target=lambda: services.append(cache.get('gmail', 'v1', "token")))
+    thread.start()
+    thread.join()
+    assert services[0] is not cache.get('gmail', 'v1', "token")
+    assert cache.client('gmail', 'v1', "other-token") is not cache.client('gmail', 'v1', "token")
+
+
+def test_ttl_and_reauth():
+    print_header("TEST 2: Clients expire after the TTL and on a new sign-in")
+    setup()
+    cache = GoogleClientCache()
+    settings.GOOGLE_CLIENT_CACHE_TTL_SECONDS = 0
+
+    first = cache.client('gmail', 'v1', "token")
+    time.sleep(0.01)
+    assert cache.client('gmail', 'v1', "token") is not first
+    settings.GOOGLE_CLIENT_CACHE_TTL_SECONDS = 3600
+
+    client = cache.client('gmail', 'v1', "token", refresh_token="refresh", user_id=1)
+    assert cache.client('gmail', 'v1', "token", refresh_token="refresh", user_id=1) is client
+    assert cache.client('gmail', 'v1', "new-token", refresh_token="refresh", user_id=1) is not client
+    print(f"Stats: {cache.stats()}")
+
+
+def test_background_refresh():
+    print_header("TEST 3: Tokens close to expiry are refreshed outside the request path")
+    fake, root_url = setup()
+    google_clients_module.TOKEN_URI = f"{root_url}token"
+    settings.GOOGLE_CLIENT_ID, settings.GOOGLE_CLIENT_SECRET = "client-id", "client-secret"
+    cache = GoogleClientCache()
+
+    expiring = cache.client('gmail', 'v1', "token", refresh_token="refresh",
+                            token_expiry=datetime.utcnow() + timedelta(minutes=2))
+    fresh = cache.client('gmail', 'v1', "token-b", refresh_token="refresh-b",
+                         token_expiry=datetime.utcnow() + timedelta(hours=1))
+
+    refreshed = cache.refresh_due()
+    print(f"Refreshed {refreshed}, expiring token is now {expiring.credentials.token}")
+    assert refreshed == 1
+    assert expiring.credentials.token == "token-1"
+    assert fresh.credentials.token == "token-b"
+
+    # Requests with the old or the new token keep using the same client.
+    assert cache.client('gmail', 'v1', "token-1", refresh_token="refresh") is expiring
+    assert cache.client('gmail', 'v1', "token", refresh_token="refresh") is expiring
+
+    fake.requests.clear()
+    expiring.service.users().getProfile(userId='me').execute()
+    assert fake.requests == ["getProfile"]
+
+
+def test_gmail_service_uses_cache():
+    print_header("TEST 4: Gmail helpers go through the shared client cache")
+    setup()
+    before = google_clients_module.google_clients.stats()["builds"]
+    for _ in range(10):
+        get_user_profile("token")
+    builds = google_clients_module.google_clients.stats()["builds"] - before
+    print(f"10 get_user_profile calls built {builds} service(s)")
+    assert builds == 1
+
+
+if __name__ == "__main__":
+    print("\n" + "="*70)
+    print("  GOOGLE CLIENT CACHE TEST (local fake Gmail server)")
+    print("="*70)
+
+    test_clients_are_reused()
+    test_ttl_and_reauth()
+    test_background_refresh()
+    test_gmail_service_uses_cache()
+
+    print("\nAll Google client cache tests passed")
@@ -0,0 +1,165 @@
+import os
+
+os.environ.setdefault("LLM_PROVIDER", "fake")
+os.environ.setdefault("FAKE_LLM_LATENCY_MS", "0")
+os.environ.setdefault("FAKE_LLM_LATENCY_JITTER_MS", "0")
+
+import mailbox
+import tempfile
+from email.message import EmailMessage
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.config import settings
+from app.database import Base
+from app.models.models import Email, User
+from app.services.ai.llm_service import llm_service
+from app.services.mail_import import import_mail, iter_mbox, parse_raw_message
+
+
+def print_header(text):
+    print("\n" + "="*70)
+    print(f"  {text}")
+    print("="*70)
+
+
+def make_email(index: int, bulk: bool = False) -> EmailMessage:
+    message = EmailMessage()
+    message["Message-ID"] = f"<import{index}@example.com>"
+    message["Date"] = f"Mon, 13 Nov 2023 10:{index % 60:02d}:00 +0100"
+    message["To"] = "me@example.com"
+    if bulk:
+        message["Subject"] = f"Weekly digest {index}"
+        message["From"] = f"Weekly Digest <newsletter@news{index % 10}.example.com>"
+        message["List-Unsubscribe"] = f"<mailto:unsubscribe@news{index % 10}.example.com>"
+        message["Precedence"] = "bulk"
+        message["X-Gmail-Labels"] = "Inbox,Unread,Category Promotions"
+        text = f"This week's digest, issue {index}. View this email in your browser.\n\n"
+    else:
+        message["Subject"] = f"Message {index}"
+        message["From"] = f"Sender {index} <sender{index}@example.com>"
+        message["X-Gmail-Labels"] = "Inbox,Important"
+        text = f"Hi team,\n\nThis is message {index}. Can we meet tomorrow at 3pm?\nFrom now on, use the new room.\n"
+    message.set_content(text + "Lorem ipsum dolor sit amet. " * 50)
+    message.add_alternative(f"<html><body><p>{text}</p></body></html>", subtype="html")
+    message.add_attachment(b"%PDF-1.7" + b"\x00" * 5000, maintype="application", subtype="pdf", filename="report.pdf")
+    return message
+
+
+def write_mbox(path: str, count: int):
+    box = mailbox.mbox(path)
+    for index in range(count):
+        box.add(make_email(index, bulk=index % 2 == 0))
+    box.flush()
+    box.close()
+
+
+def setup() -> tuple:
+    # A throwaway in-memory database, so the test never touches DATABASE_URL.
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    user = User(email="me@example.com")
+    db.add(user)
+    db.commit()
+    return db, user
+
+
+def test_parse_mbox():
+    print_header("TEST 1: mbox messages are split, unquoted and parsed")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "archive.mbox")
+        write_mbox(path, 3)
+        raws = list(iter_mbox(path, settings.IMPORT_MAX_MESSAGE_BYTES))
+
+    assert len(raws) == 3
+    email_data = parse_raw_message(raws[1])
+    print(f"{email_data['message_id']}: {email_data['subject']!r}, labels {email_data['labels']}, {len(email_data['body'])} chars")
+    assert email_data["message_id"] == "import1@example.com"
+    assert email_data["labels"] == ["INBOX", "IMPORTANT"]
+    assert email_data["received_at"].isoformat() == "2023-11-13T10:01:00+01:00"
+    # mbox escapes body lines starting with "From "; the importer restores them.
+    assert "\nFrom now on" in email_data["body"] and ">From" not in email_data["body"]
+    assert "%PDF" not in email_data["body"]
+
+    bulk = parse_raw_message(raws[0])
+    assert bulk["labels"] == ["INBOX", "UNREAD", "CATEGORY_PROMOTIONS"]
+    assert bulk["headers"]["Precedence"] == "bulk"
+
+
+def test_import_dedupes_and_batches():
+    print_header("TEST 2: Import saves every message once, in batches")
+    db, user = setup()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "archive.mbox")
+        write_mbox(path, 60)
+
+        stats = import_mail(db, user, [path], workers=2, batch_size=25)
+        print(f"First import: {stats}")
+        assert stats["read"] == stats["parsed"] == stats["saved"] == 60
+        assert stats["failed"] == 0 and stats["duplicates"] == 0
+
+        again = import_mail(db, user, [path], workers=1, batch_size=25, analyse=False)
+        print(f"Second import: {again}")
+        assert again["saved"] == 0 and again["duplicates"] == 60
+
+    assert db.query(Email).filter(Email.user_id == user.id).count() == 60
+    newsletter = db.query(Email).filter(Email.message_id == "import0@example.com").first()
+    assert newsletter.classified_by == "heuristic" and newsletter.is_processed
+    assert newsletter.received_at is not None and newsletter.received_at.year == 2023
+
+
+def test_import_eml_directory():
+    print_header("TEST 3: A directory of .eml files imports without AI")
+    db, user = setup()
+    with tempfile.TemporaryDirectory() as directory:
+        for index in range(5):
+            with open(os.path.join(directory, f"{index}.eml"), "wb") as f:
+                f.write(make_email(100 + index, bulk=index < 3).as_bytes())
+
+        stats = import_mail(db, user, [directory], workers=1, analyse=False)
+        print(f"Import: {stats}")
+
+    assert stats["saved"] == 5
+    # Only the newsletters can be triaged without the LLM.
+    assert stats["unprocessed"] == 2
+    assert db.query(Email).filter(Email.is_processed.is_(False)).count() == 2
+
+
+def test_no_ai_fallback_insert():
+    print_header("TEST 4: --no-ai stays offline when the bulk insert falls back to single rows")
+    db, user = setup()
+    # Rejects one message, so the batch insert fails and each row is saved on its own.
+    db.execute(text(
+        "CREATE TRIGGER reject_message BEFORE INSERT ON email WHEN NEW.message_id = 'import204@example.com' "
+        "BEGIN SELECT RAISE(ABORT, 'rejected'); END"
+    ))
+    db.commit()
+    calls = sum(usage["calls"] for usage in llm_service.get_metrics().values())
+
+    with tempfile.TemporaryDirectory() as directory:
+        for index in range(5):
+            with open(os.path.join(directory, f"{index}.eml"), "wb") as f:
+                f.write(make_email(200 + index, bulk=index < 3).as_bytes())
+
+        stats = import_mail(db, user, [directory], workers=1, analyse=False)
+        print(f"Import: {stats}")
+
+    assert sum(usage["calls"] for usage in llm_service.get_metrics().values()) == calls
+    assert db.query(Email).count() == 4
+    assert db.query(Email).filter(Email.is_processed.is_(False)).count() == 1
+
+
+if __name__ == "__main__":
+    print("\n" + "="*70)
+    print("  MAIL IMPORT TEST")
+    print("="*70)
+
+    test_parse_mbox()
+    test_import_dedupes_and_batches()
+    test_import_eml_directory()
+    test_no_ai_fallback_insert()
+
+    print("\nAll mail import tests passed")
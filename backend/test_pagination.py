@@ -0,0 +1,143 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models.models import Email, User
+from app.services.email_service import EMAIL_LIST_COLUMNS, get_user_emails, get_user_emails_page
+
+START = datetime(2024, 1, 1, 9, 0, 0)
+
+
+def print_header(text):
+    print("\n" + "="*70)
+    print(f"  {text}")
+    print("="*70)
+
+
+def setup(count: int) -> tuple:
+    # A throwaway in-memory database, so the test never touches DATABASE_URL.
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    user = User(email="me@example.com")
+    db.add(user)
+    db.commit()
+
+    # Three emails per timestamp, so pages have to break received_at ties by id.
+    db.add_all([
+        Email(
+            user_id=user.id, message_id=f"msg{index}", subject=f"Message {index}", body_text="Body " * 200,
+            priority="high" if index % 4 == 0 else "low", is_read=index % 3 != 0,
+            received_at=START + timedelta(minutes=index // 3)
+        )
+        for index in range(count)
+    ])
+    db.commit()
+    return db, user.id
+
+
+def walk(db, user_id: int, **filters) -> list:
+    seen, cursor = [], None
+    while True:
+        emails, cursor = get_user_emails_page(db, user_id, limit=7, cursor=cursor, **filters)
+        seen.extend(email.message_id for email in emails)
+        if not cursor:
+            return seen
+
+
+def expected(db, user_id: int, **filters) -> list:
+    query = db.query(Email).filter(Email.user_id == user_id, *[getattr(Email, name) == value for name, value in filters.items()])
+    return [email.message_id for email in query.order_by(Email.received_at.desc(), Email.id.desc())]
+
+
+def test_cursor_walk():
+    print_header("TEST 1: Cursor pages cover every email exactly once")
+    db, user_id = setup(100)
+
+    for filters, compare in (({}, {}), ({"priority": "high"}, {"priority": "high"}), ({"unread": True}, {"is_read": False})):
+        seen = walk(db, user_id, **filters)
+        print(f"{filters or 'all'}: {len(seen)} emails")
+        assert seen == expected(db, user_id, **compare)
+
+    emails, cursor = get_user_emails_page(db, user_id, limit=100)
+    assert len(emails) == 100 and cursor is None
+
+
+def test_new_mail_does_not_shift_pages():
+    print_header("TEST 2: Mail arriving mid-scroll does not repeat or skip emails")
+    db, user_id = setup(30)
+
+    first, cursor = get_user_emails_page(db, user_id, limit=10)
+    db.add_all([
+        Email(user_id=user_id, message_id=f"new{index}", received_at=START + timedelta(days=1, minutes=index))
+        for index in range(5)
+    ])
+    db.commit()
+
+    rest = []
+    while cursor:
+        emails, cursor = get_user_emails_page(db, user_id, limit=10, cursor=cursor)
+        rest.extend(emails)
+
+    # Offset paging would repeat the five emails pushed from page one onto page two.
+    shifted = get_user_emails(db, user_id, skip=10, limit=10)
+    print(f"Cursor: {len(first)} + {len(rest)} emails; offset page 2 starts with {shifted[0].message_id}")
+    assert [email.message_id for email in first + rest] == expected(db, user_id)[5:]
+    assert shifted[0].message_id == first[5].message_id
+
+
+def test_offset_mode_and_bad_cursor():
+    print_header("TEST 3: Offset paging still works and bad cursors are rejected")
+    db, user_id = setup(25)
+
+    page = get_user_emails(db, user_id, skip=20, limit=10)
+    assert [email.message_id for email in page] == expected(db, user_id)[20:]
+
+    try:
+        get_user_emails_page(db, user_id, cursor="not-a-cursor")
+        assert False, "expected ValueError"
+    except ValueError as e:
+        print(f"Rejected: {e}")
+
+
+def test_list_columns():
+    print_header("TEST 4: List pages select only the list columns")
+    db, user_id = setup(30)
+    subjects = [f"Message {message_id[3:]}" for message_id in expected(db, user_id)]
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.get_bind(), "before_cursor_execute", listener)
+
+    rows, cursor = get_user_emails_page(db, user_id, limit=10, columns=(Email.subject, Email.priority))
+    seen = [row.subject for row in rows]
+    while cursor:
+        rows, cursor = get_user_emails_page(db, user_id, limit=10, cursor=cursor, columns=(Email.subject, Email.priority))
+        seen.extend(row.subject for row in rows)
+    assert seen == subjects
+
+    rows = get_user_emails_page(db, user_id, columns=EMAIL_LIST_COLUMNS)[0]
+    event.remove(db.get_bind(), "before_cursor_execute", listener)
+    print(f"{len(statements)} list queries, none reading body_text, entities or reply_suggestions")
+    assert not any(name in statement for statement in statements for name in ("body_text", "entities", "reply_suggestions"))
+
+    emails = get_user_emails(db, user_id)
+    assert [tuple(row) for row in rows] == [tuple(getattr(email, column.key) for column in EMAIL_LIST_COLUMNS) for email in emails]
+    # Email objects leave the body out too, and load it on first access for the detail view.
+    assert "body_text" not in emails[0].__dict__
+    assert emails[0].body_text == "Body " * 200
+
+
+if __name__ == "__main__":
+    print("\n" + "="*70)
+    print("  EMAIL PAGINATION TEST")
+    print("="*70)
+
+    test_cursor_walk()
+    test_new_mail_does_not_shift_pages()
+    test_offset_mode_and_bad_cursor()
+    test_list_columns()
+
+    print("\nAll pagination tests passed")
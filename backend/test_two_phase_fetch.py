@@ -0,0 +1,92 @@
+import os
+
+os.environ.setdefault("LLM_PROVIDER", "fake")
+os.environ.setdefault("FAKE_LLM_LATENCY_MS", "0")
+os.environ.setdefault("FAKE_LLM_LATENCY_JITTER_MS", "0")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from fake_gmail_server import FakeGmail, make_message, start_fake_gmail
+from app.config import settings
+from app.database import Base
+from app.models.models import Email, User
+from app.services.email_service import ensure_email_body, sync_mailbox
+
+
+def print_header(text):
+    print("\n" + "="*70)
+    print(f"  {text}")
+    print("="*70)
+
+
+def setup(count: int, bulk_ratio: float = 0.6) -> tuple:
+    # Messages 0-2 of every five are newsletters, 3-4 personal mail.
+    fake = FakeGmail([make_message(i, body_size=20000, bulk=(i % 5) / 5 < bulk_ratio) for i in range(count)])
+    _, root_url = start_fake_gmail(fake)
+    settings.GMAIL_API_ROOT_URL = root_url
+    settings.GMAIL_QUOTA_UNITS_PER_SECOND = 100000
+
+    # A throwaway in-memory database, so the test never touches DATABASE_URL.
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    user = User(email="me@example.com", google_access_token="token")
+    db.add(user)
+    db.commit()
+    return fake, db, user
+
+
+def sync(mode: str, count: int = 100) -> tuple:
+    fake, db, user = setup(count)
+    settings.GMAIL_FETCH_MODE = mode
+    result = sync_mailbox(db, user, max_results=count)
+    print(f"{mode:<10} {len(result['emails'])} emails, {result['metadata_only']} metadata only, "
+          f"{result['bytes_received'] / 1024:.0f} KiB received (server sent {fake.bytes_sent / 1024:.0f} KiB), "
+          f"{result['elapsed_ms']:.0f}ms")
+    return fake, db, result
+
+
+def test_two_phase_transfers_less():
+    print_header("TEST 1: Two-phase sync downloads bodies only for mail needing analysis")
+    _, _, full = sync("full")
+    _, db, two_phase = sync("two_phase")
+
+    assert len(full["emails"]) == len(two_phase["emails"]) == 100
+    assert full["metadata_only"] == 0
+    assert two_phase["metadata_only"] == 60
+    assert two_phase["bytes_received"] < full["bytes_received"] / 2
+    print(f"Saved {1 - two_phase['bytes_received'] / full['bytes_received']:.0%} of the bytes")
+
+    newsletter = db.query(Email).filter(Email.message_id == "msg000000").first()
+    personal = db.query(Email).filter(Email.message_id == "msg000003").first()
+    assert newsletter.body_text is None and newsletter.classified_by == "heuristic"
+    assert newsletter.summary and newsletter.reply_suggestions == []
+    assert personal.body_text and personal.classified_by != "heuristic"
+
+
+def test_body_fetched_on_open():
+    print_header("TEST 2: Opening a metadata-only email fetches its body once")
+    fake, db, _ = sync("two_phase", count=10)
+    email = db.query(Email).filter(Email.body_text.is_(None)).first()
+
+    fake.requests.clear()
+    body = ensure_email_body(db, email)
+    ensure_email_body(db, email)
+    print(f"Fetched {len(body)} characters with {fake.count('batch')} batch request(s)")
+    assert body.startswith("This week's digest")
+    assert email.body_text == body
+    assert fake.count("batch") == 1 and fake.count("messages.get") == 1
+
+
+if __name__ == "__main__":
+    print("\n" + "="*70)
+    print("  TWO-PHASE FETCH TEST (local fake Gmail server)")
+    print("="*70)
+
+    test_two_phase_transfers_less()
+    test_body_fetched_on_open()
+    settings.GMAIL_FETCH_MODE = "full"
+
+    print("\nAll two-phase fetch tests passed")